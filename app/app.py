@@ -1,9 +1,16 @@
 import os
-import cv2
-from flask import Flask, jsonify, render_template, send_from_directory
+import math
+import json
+from flask import Flask, Response, jsonify, render_template, request, send_from_directory, stream_with_context
 from app.database import Database
+from app.config import (THUMBNAIL_MAX_AGE, SPRITE_MAX_TILES, SPRITE_CACHE_MAX_BYTES,
+                        CLIP_SECONDS_BEFORE, CLIP_SECONDS_AFTER, CLIP_MAX_SECONDS, CLIP_CACHE_MAX_BYTES)
+from app.disk_cache import LRUDiskCache
+from app.thumbnails import get_or_create_thumbnail
+from app.sprites import build_result_sprite
+from app.clips import get_or_create_clip, get_clip_window, get_cached_video_fps, parse_keyframe_name
 from app.handlers.request_handler import parse_search_request
-from app.handlers.search_handler import perform_unified_search, format_search_response
+from app.handlers.search_handler import perform_unified_search, stream_unified_search, format_search_response
 
 # Initialize Flask application with static and template folders
 app = Flask(__name__, 
@@ -12,6 +19,10 @@ app = Flask(__name__,
 
 # Initialize database connection and models
 database = Database()
+
+# Disk caches for result sprites and keyframe clips
+sprite_cache = LRUDiskCache(database.sprites_path, SPRITE_CACHE_MAX_BYTES)
+clip_cache = LRUDiskCache(database.clips_path, CLIP_CACHE_MAX_BYTES)
     
 
 # Routes
@@ -52,6 +63,53 @@ def get_keyframe(keyframe_name):
     return "File not found", 404
 
 
+@app.route('/data/thumbs/<path:keyframe_name>')
+def get_thumbnail(keyframe_name):
+    """
+    Serve a small thumbnail of a keyframe for the results grid.
+    
+    Thumbnails are produced by the thumbnail_generation preprocess stage; any
+    missing thumbnail is generated on demand and cached on disk.
+    
+    Args:
+        keyframe_name (str): Keyframe filename in format "L01_V003_015190.jpg"
+    
+    Returns:
+        File: Thumbnail image file if the keyframe exists
+        str: "File not found" with 404 status if not found
+    """
+    
+    thumbnail_path = get_or_create_thumbnail(keyframe_name, database.keyframes_path, database.thumbs_path)
+    
+    if thumbnail_path:
+        return send_from_directory(os.path.dirname(thumbnail_path), os.path.basename(thumbnail_path),
+                                   max_age=THUMBNAIL_MAX_AGE)
+    
+    return "File not found", 404
+
+
+@app.route('/data/sprites/<path:sprite_name>')
+def get_sprite(sprite_name):
+    """
+    Serve a result sprite image built by /api/sprite.
+    
+    Args:
+        sprite_name (str): Sprite filename returned in the sprite manifest
+    
+    Returns:
+        File: Sprite image file if cached
+        str: "File not found" with 404 status if not found
+    """
+    
+    sprite_path = sprite_cache.get(sprite_name)
+    
+    if sprite_path and sprite_path.endswith('.webp'):
+        return send_from_directory(sprite_cache.root, os.path.basename(sprite_path),
+                                   max_age=THUMBNAIL_MAX_AGE)
+    
+    return "File not found", 404
+
+
 @app.route('/data/videos/<path:video_name>')
 def get_video(video_name):
     """
@@ -77,6 +135,81 @@ def get_video(video_name):
     return "File not found", 404
 
 
+def parse_clip_window():
+    """
+    Read the clip window from the query string, clamped to CLIP_MAX_SECONDS.
+    
+    Returns:
+        tuple or None: (before, after) in seconds; None if a value is not a finite number
+    """
+    before = request.args.get('before', CLIP_SECONDS_BEFORE, type=float)
+    after = request.args.get('after', CLIP_SECONDS_AFTER, type=float)
+    if not (math.isfinite(before) and math.isfinite(after)):
+        return None
+    return min(max(before, 0), CLIP_MAX_SECONDS), min(max(after, 0), CLIP_MAX_SECONDS)
+
+
+@app.route('/data/clips/<path:keyframe_name>')
+def get_clip(keyframe_name):
+    """
+    Serve a short clip of the source video around a keyframe.
+    
+    Clips are cut with ffmpeg stream copy on first request and kept in a
+    size-bounded LRU disk cache.
+    
+    Args:
+        keyframe_name (str): Keyframe filename in format "L01_V003_015190.jpg"
+        before (float, query): Seconds before the keyframe (default: CLIP_SECONDS_BEFORE)
+        after (float, query): Seconds after the keyframe (default: CLIP_SECONDS_AFTER)
+    
+    Returns:
+        File: MP4 clip if the source video exists, with the actual start of the
+              clip in the source video (seconds) in the X-Clip-Start header
+        str: "Invalid clip window" with 400 status if before/after are not finite
+        str: "File not found" with 404 status if not found
+    """
+    
+    window = parse_clip_window()
+    if window is None:
+        return "Invalid clip window", 400
+    
+    before, after = window
+    clip = get_or_create_clip(keyframe_name, database.videos_path, clip_cache, before, after)
+    
+    if clip:
+        response = send_from_directory(clip_cache.root, clip['clip_name'], mimetype='video/mp4')
+        response.headers['X-Clip-Start'] = f"{clip['clip_start']:.3f}"
+        return response
+    
+    return "File not found", 404
+
+
+@app.route('/data/storyboards/<path:storyboard_name>')
+def get_storyboard_file(storyboard_name):
+    """
+    Serve storyboard sprite sheets and WebVTT indexes.
+    
+    Args:
+        storyboard_name (str): Storyboard filename in format "L01_V003_storyboard_000.jpg"
+                               or "L01_V003_storyboard.vtt"
+    
+    Returns:
+        File: Storyboard file if found
+        str: "File not found" with 404 status if not found
+    """
+    
+    # Parse storyboard filename to extract lesson folder
+    storyboard_name = os.path.basename(storyboard_name)
+    lesson_folder = storyboard_name.split('_')[0]  # L01
+    folder_path = os.path.join(database.storyboards_path, lesson_folder)
+    file_path = os.path.join(folder_path, storyboard_name)
+    
+    if os.path.isfile(file_path):
+        return send_from_directory(folder_path, storyboard_name, max_age=THUMBNAIL_MAX_AGE)
+    
+    return "File not found", 404
+
+
 @app.route('/api/video-info/<path:keyframe_name>')
 def get_video_info(keyframe_name):
     """
@@ -90,34 +223,26 @@ def get_video_info(keyframe_name):
         str: "File not found" with 404 status if video not found
     """
 
-    # Parse keyframe filename: L01_V003_015190.jpg
-    parts = keyframe_name.split('_')
-    lesson = parts[0]  # L01
-    video = parts[1]   # V003
-    frame_str = parts[2].replace('.jpg', '')  # 015190
-        
-    frame_number = int(frame_str)
-    
-    # Build actual video path to read FPS
-    video_name = f"{lesson}_{video}.mp4"
-    actual_video_path = os.path.join(database.videos_path, lesson, video_name)
+    # Locate the keyframe and the default clip window around it in the source video
+    clip = get_clip_window(keyframe_name, database.videos_path, CLIP_SECONDS_BEFORE, CLIP_SECONDS_AFTER)
     
-    if os.path.isfile(actual_video_path):
-        # Read actual FPS from video file
-        cap = cv2.VideoCapture(actual_video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        cap.release()
-        
-        # Calculate timestamp from frame number and actual FPS
-        timestamp = frame_number / fps
-        
+    if clip:
+        lesson, video, frame_number = parse_keyframe_name(keyframe_name)
+        video_name = f"{lesson}_{video}.mp4"
         video_path = f"/data/videos/{video_name}"
         
+        # Short clip around the keyframe; the full video stays available for seeking further.
+        # clip_start is where the stream-copied clip actually begins (the preceding video keyframe)
+        clip_path = f"/data/clips/{os.path.basename(keyframe_name)}"
+        
         return jsonify({
             'video_path': video_path,
-            'timestamp': timestamp,
+            'timestamp': clip['timestamp'],
             'frame_number': frame_number,
-            'fps': fps
+            'fps': get_cached_video_fps(clip['video_path']),
+            'clip_path': clip_path,
+            'clip_start': clip['clip_start'],
+            'clip_end': clip['start'] + clip['duration']
         })
     
     return "File not found", 404
@@ -169,6 +294,79 @@ def get_video_keyframes(keyframe_name):
     })
 
 
+@app.route('/api/storyboard/<path:keyframe_name>')
+def get_storyboard(keyframe_name):
+    """
+    Get the storyboard of the video containing the given keyframe.
+    
+    Args:
+        keyframe_name (str): Keyframe filename in format "L01_V003_015190.jpg"
+    
+    Returns:
+        JSON: Storyboard manifest with tile interval, tile size, grid size,
+              sprite sheet URLs and WebVTT index URL
+        str: "Storyboard not found" with 404 status if the keyframe name is
+             malformed or no storyboard was built for this video
+    """
+    
+    # Parse keyframe filename: L01_V003_015190.jpg
+    parsed = parse_keyframe_name(keyframe_name)
+    if parsed is None:
+        return "Storyboard not found", 404
+    lesson, video, _ = parsed
+    
+    manifest_path = os.path.join(database.storyboards_path, lesson, f"{lesson}_{video}_storyboard.json")
+    
+    if not os.path.isfile(manifest_path):
+        return "Storyboard not found", 404
+    
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    
+    manifest['sheets'] = [f"/data/storyboards/{sheet}" for sheet in manifest['sheets']]
+    manifest['vtt'] = f"/data/storyboards/{manifest['vtt']}"
+    
+    return jsonify(manifest)
+
+
+def get_invalid_object_filters(objects):
+    """Get the object filter expressions the object index cannot evaluate."""
+    if database.object_index is None:
+        return []
+    return database.object_index.invalid_terms(objects)
+
+
+def get_invalid_layout_filters(layout):
+    """Get the layout filter expressions the box index cannot evaluate."""
+    if database.box_index is None:
+        return []
+    return database.box_index.invalid_terms(layout)
+
+
+def get_invalid_tag_filters(tags):
+    """Get the tag filters that are not zero-shot tag labels."""
+    if database.tag_index is None:
+        return []
+    return database.tag_index.invalid_terms(tags)
+
+
+def get_filter_error(search_params):
+    """Get the error message for invalid object, layout or tag filters, None if all are valid."""
+    invalid_objects = get_invalid_object_filters(search_params['objects'])
+    if invalid_objects:
+        return f"Invalid object filters: {', '.join(invalid_objects)}"
+    
+    invalid_layout = get_invalid_layout_filters(search_params['layout'])
+    if invalid_layout:
+        return f"Invalid layout filters: {', '.join(invalid_layout)}"
+    
+    invalid_tags = get_invalid_tag_filters(search_params['tags'])
+    if invalid_tags:
+        return f"Invalid tag filters: {', '.join(invalid_tags)}"
+    
+    return None
+
+
 @app.route('/api/search', methods=['POST'])
 def search():
     """
@@ -179,8 +377,16 @@ def search():
         query (str, optional): Text description of image to search
         ocr_text (str, optional): OCR text to search in images  
         models (str): JSON array of models to use for search
-        objects (str, optional): JSON array of objects to filter by
+        objects (str, optional): JSON array of object filters, ANDed; each is a class
+                                 ("person"), a negation ("!dog"), a count ("person>=3")
+                                 or alternatives ("car|bus")
+        layout (str, optional): JSON array of layout filters, ANDed; each is a class or
+                                "text", an optional region and an optional size
+                                ("person@left", "car:large", "text@top")
+        tags (str, optional): JSON array of zero-shot scene or object tags, ANDed
+                              ("news studio", "street")
         topK (int): Maximum number of results to return
+        caption_mode (str, optional): Caption search mode (dense, sparse, rrf, colbert)
     
     Returns:
         JSON: Search results with paths, scores, and filenames
@@ -189,6 +395,10 @@ def search():
     # Parse request data
     uploaded_image, search_params = parse_search_request()
     
+    filter_error = get_filter_error(search_params)
+    if filter_error:
+        return jsonify({'error': filter_error}), 400
+    
     # Perform unified search
     paths, scores = perform_unified_search(uploaded_image, search_params, database)
     
@@ -198,6 +408,80 @@ def search():
 
 
 
+@app.route('/api/sprite', methods=['POST'])
+def get_result_sprite():
+    """
+    Build one sprite image for a page of results.
+    
+    Args (POST JSON):
+        keyframes (list): Keyframe filenames in format "L01_V003_015190.jpg"
+    
+    Returns:
+        JSON: Sprite manifest with the sprite URL, tile size, grid size and
+              the offset of every keyframe tile
+        JSON: Error with 400 status if the keyframe list is invalid
+    """
+    
+    data = request.get_json(silent=True) or {}
+    keyframes = data.get('keyframes')
+    
+    if not isinstance(keyframes, list) or not keyframes:
+        return jsonify({'error': 'keyframes must be a non-empty list'}), 400
+    
+    if len(keyframes) > SPRITE_MAX_TILES:
+        return jsonify({'error': f'At most {SPRITE_MAX_TILES} keyframes per sprite'}), 400
+    
+    manifest = build_result_sprite(keyframes, database, sprite_cache)
+    return jsonify(manifest)
+
+
+@app.route('/api/search/stream', methods=['POST'])
+def search_stream():
+    """
+    Streaming variant of /api/search.
+    
+    Emits newline-delimited JSON (NDJSON): first the ranking from the fast
+    FAISS text/image searches, then an updated fused ranking each time a
+    slower source (captions, OCR) finishes. Result lines have the same
+    fields as the /api/search response plus `type` ("results"), `stage`
+    and `final`. A failing source emits `{"type": "error", "source", "message"}`
+    and the other sources continue; an error that ends the search early
+    also carries `"final": true`.
+    
+    Args (POST FormData):
+        Same as /api/search
+    
+    Returns:
+        Response: application/x-ndjson stream of search results
+    """
+    
+    # Parse request data before streaming starts
+    uploaded_image, search_params = parse_search_request()
+    
+    filter_error = get_filter_error(search_params)
+    if filter_error:
+        return jsonify({'error': filter_error}), 400
+    
+    def generate():
+        try:
+            for stage, paths, scores, final, errors in stream_unified_search(uploaded_image, search_params, database):
+                for error in errors:
+                    yield json.dumps({'type': 'error', **error}) + '\n'
+                
+                response_data = format_search_response(paths, scores, uploaded_image, search_params, database)
+                response_data['type'] = 'results'
+                response_data['stage'] = stage
+                response_data['final'] = final
+                yield json.dumps(response_data) + '\n'
+        except Exception as e:
+            # The 200 status is already sent, so the failure has to be reported in the stream
+            print(f"Search stream failed: {str(e)}")
+            yield json.dumps({'type': 'error', 'source': 'search', 'message': str(e), 'final': True}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/api/models', methods=['GET'])
 def list_models():
     """
@@ -213,11 +497,12 @@ def list_models():
 @app.route('/api/objects', methods=['GET'])
 def list_objects():
     """
-    Get list of available object classes for filtering.
+    Get list of available object classes and scene tags for filtering.
     
     Returns:
-        JSON: Dictionary containing list of available object classes
+        JSON: Dictionary containing lists of available object classes and scene tags
     """
     return jsonify({
-        'objects': database.objects
+        'objects': database.objects,
+        'scenes': database.scenes
     })
\ No newline at end of file
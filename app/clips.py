@@ -0,0 +1,156 @@
+import os
+import json
+import threading
+import subprocess
+from functools import lru_cache
+from preprocess.utils import get_video_fps
+from preprocess.subvideo_extraction import extract_subvideo_clip
+from app.config import FFMPEG_BIN, FFPROBE_BIN
+
+# Striped locks so concurrent requests for the same clip run ffmpeg once; a
+# fixed pool keeps memory bounded whatever clip names clients ask for
+CLIP_LOCK_STRIPES = 64
+_clip_locks = [threading.Lock() for _ in range(CLIP_LOCK_STRIPES)]
+
+
+@lru_cache(maxsize=4096)
+def get_cached_video_fps(video_path):
+    """Get the FPS of a video, opening each video file only once."""
+    return get_video_fps(video_path)
+
+
+def _get_clip_lock(clip_name):
+    return _clip_locks[hash(clip_name) % CLIP_LOCK_STRIPES]
+
+
+def parse_keyframe_name(keyframe_name):
+    """
+    Split a keyframe filename "L01_V003_015190.jpg" into lesson, video and frame number.
+
+    Returns:
+        tuple or None: (lesson, video, frame_number); None if the name is malformed
+    """
+    parts = os.path.basename(keyframe_name).split('_')
+    if len(parts) != 3:
+        return None
+    frame_str = os.path.splitext(parts[2])[0]
+    if not frame_str.isdigit():
+        return None
+    return parts[0], parts[1], int(frame_str)
+
+
+@lru_cache(maxsize=4096)
+def get_stream_copy_start(video_path, start):
+    """
+    Time of the last video keyframe at or before `start`: ffmpeg stream copy
+    cannot cut between keyframes, so a clip requested from `start` begins there.
+    Falls back to `start` if ffprobe is unavailable or finds no keyframe.
+    """
+    if start <= 0:
+        return 0.0
+
+    try:
+        output = subprocess.run(
+            [FFPROBE_BIN, "-v", "error", "-select_streams", "v:0",
+             "-read_intervals", f"{start}%{start}",
+             "-show_entries", "packet=pts_time,flags", "-of", "json", video_path],
+            capture_output=True, text=True, check=True
+        ).stdout
+        packets = json.loads(output).get("packets", [])
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return start
+
+    keyframe_times = [float(packet["pts_time"]) for packet in packets
+                      if "K" in packet.get("flags", "") and packet.get("pts_time", "N/A") != "N/A"]
+    keyframe_times = [time for time in keyframe_times if time <= start]
+    return max(keyframe_times) if keyframe_times else start
+
+
+def get_clip_window(keyframe_name, videos_path, seconds_before, seconds_after):
+    """
+    Locate the clip around a keyframe in its source video.
+
+    Args:
+        keyframe_name (str): Keyframe filename in format "L01_V003_015190.jpg"
+        videos_path (str): Root folder of source videos (<root>/L01/L01_V003.mp4)
+        seconds_before (float): Seconds of video to keep before the keyframe
+        seconds_after (float): Seconds of video to keep after the keyframe
+
+    Returns:
+        dict or None: Source video path, keyframe timestamp, clip name, requested
+                      start/duration, actual start of the stream-copied clip and
+                      offset of the keyframe inside the clip; None if the name is
+                      malformed or the source video is missing
+    """
+    parsed = parse_keyframe_name(keyframe_name)
+    if parsed is None:
+        return None
+    lesson, video, frame_number = parsed
+
+    video_path = os.path.join(videos_path, lesson, f"{lesson}_{video}.mp4")
+    if not os.path.isfile(video_path):
+        return None
+
+    fps = get_cached_video_fps(video_path)
+    if not fps:
+        return None
+
+    timestamp = frame_number / fps
+    start = max(0.0, timestamp - seconds_before)
+    duration = (timestamp - start) + seconds_after
+    clip_start = get_stream_copy_start(video_path, start)
+
+    return {
+        'video_path': video_path,
+        'timestamp': timestamp,
+        'clip_name': f"{lesson}_{video}_{int(start * 1000):09d}_{int(duration * 1000):06d}.mp4",
+        'start': start,
+        'duration': duration,
+        'clip_start': clip_start,
+        'offset': timestamp - clip_start
+    }
+
+
+def get_or_create_clip(keyframe_name, videos_path, clip_cache, seconds_before, seconds_after):
+    """
+    Get a short clip around a keyframe, cutting it from the source video with
+    ffmpeg stream copy (no re-encode) on a cache miss.
+
+    Stream copy starts the clip at the video keyframe preceding the requested
+    start; `clip_start` is that actual start and `offset` the position of the
+    hit inside the clip.
+
+    Args:
+        keyframe_name (str): Keyframe filename in format "L01_V003_015190.jpg"
+        videos_path (str): Root folder of source videos (<root>/L01/L01_V003.mp4)
+        clip_cache (LRUDiskCache): Cache holding extracted clips
+        seconds_before (float): Seconds of video to keep before the keyframe
+        seconds_after (float): Seconds of video to keep after the keyframe
+
+    Returns:
+        dict or None: Clip window (see get_clip_window) and clip path; None if
+                      the keyframe name is malformed or the source video is missing
+    """
+    clip_info = get_clip_window(keyframe_name, videos_path, seconds_before, seconds_after)
+    if clip_info is None:
+        return None
+    clip_name = clip_info['clip_name']
+
+    clip_path = clip_cache.get(clip_name)
+    if clip_path:
+        return {**clip_info, 'path': clip_path}
+
+    with _get_clip_lock(clip_name):
+        # Another request may have produced the clip while we waited
+        clip_path = clip_cache.get(clip_name)
+        if not clip_path:
+            temp_path = clip_cache.temp_path(clip_name)
+            try:
+                extract_subvideo_clip(clip_info['video_path'], temp_path, clip_info['start'],
+                                      clip_info['start'] + clip_info['duration'], FFMPEG_BIN)
+                clip_path = clip_cache.put(clip_name, temp_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    return {**clip_info, 'path': clip_path}
@@ -13,9 +13,36 @@ KEYFRAMES_FOLDER = os.path.join(DATABASE_FOLDER, "keyframes")
 SHOTS_FOLDER = os.path.join(DATABASE_FOLDER, "shots")
 VIDEOS_FOLDER = os.path.join(DATABASE_FOLDER, "videos")
 EMBEDDING_FOLDER = os.path.join(DATABASE_FOLDER, "embeddings")
+THUMBS_FOLDER = os.path.join(DATABASE_FOLDER, "thumbs")
+SPRITES_FOLDER = os.path.join(DATABASE_FOLDER, "cache", "sprites")
+STORYBOARDS_FOLDER = os.path.join(DATABASE_FOLDER, "storyboards")
+CLIPS_FOLDER = os.path.join(DATABASE_FOLDER, "cache", "clips")
 
 # Database files
 MAPPING_JSON = os.path.join(DATABASE_FOLDER, "id2path.json")
+OBJECT_INDEX_FILE = os.path.join(DATABASE_FOLDER, "object_index.npz")
+BOX_INDEX_FILE = os.path.join(DATABASE_FOLDER, "box_index.npz")
+TAG_INDEX_FILE = os.path.join(DATABASE_FOLDER, "tag_index.npz")
+
+# Thumbnail settings for the result grid
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 75
+THUMBNAIL_MAX_AGE = 7 * 24 * 3600  # Browser cache lifetime in seconds
+
+# Result sprite settings (one image per page of results)
+SPRITE_TILE_SIZE = (180, 180)
+SPRITE_QUALITY = 70
+SPRITE_MAX_TILES = 500
+SPRITE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Short clips around a keyframe (ffmpeg stream copy, no re-encode)
+FFMPEG_BIN = "ffmpeg"
+FFPROBE_BIN = "ffprobe"
+CLIP_SECONDS_BEFORE = 3
+CLIP_SECONDS_AFTER = 7
+CLIP_MAX_SECONDS = 60
+CLIP_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
 
 # Available embedding models configuration
 EMBEDDING_MODELS = {
@@ -36,9 +63,48 @@ EMBEDDING_MODELS = {
 # Available object classes for filtering
 OBJECTS = ["car", "person", "dog", "cat", "bird", "fish", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe", "lion", "tiger", "monkey", "snake", "rabbit", "squirrel", "fox", "wolf", "deer"]
 
+# Scene labels for zero-shot tagging (build_tag_index)
+SCENES = ["news studio", "street", "city", "countryside", "forest", "beach", "sea", "river", "mountain", "farm", "market", "stadium", "classroom", "hospital", "factory", "office", "meeting room", "flood", "fire", "night"]
+
+# Zero-shot tagging: prompt templates averaged per label and minimum SigLIP match probability of a tag
+TAG_PROMPT_TEMPLATES = ["a photo of a {}.", "a news video frame of a {}.", "a blurry photo of a {}.", "a photo of the {}."]
+TAG_SCORE_THRESHOLD = 0.1
+
+# Resolve object filters with the zero-shot tags when there is no object index (approximate,
+# unlike detections); when False they fall back to the detections in Elasticsearch only
+OBJECT_FILTER_TAG_FALLBACK = False
+
 # Qdrant collection names
 CAPTIONS_COLLECTION = "captions"
 
+# Largest id filter sent to Qdrant as a point id list; larger filters are applied to the results instead
+QDRANT_FILTER_MAX_IDS = 10000
+
+# Elasticsearch (OCR and detection results); index names are the aliases used by preprocess
+ES_HOST = "http://localhost:9200"
+OCR_INDEX = "ocr"
+DETECTION_INDEX = "groundingdino"
+
+# Caption search backend: "qdrant" (server) or "embedded" (in-process index built by build_caption_index)
+CAPTION_BACKEND = "qdrant"
+CAPTION_INDEX_FOLDER = os.path.join(DATABASE_FOLDER, "caption_index")
+
+# Caption encoder (BGE-M3) and number of cached query encodings
+CAPTION_ENCODER_MODEL = "BAAI/bge-m3"
+CAPTION_QUERY_CACHE_SIZE = 1024
+
+# Caption search modes, from cheapest to most accurate; interactive queries use the default
+CAPTION_SEARCH_MODES = ["dense", "sparse", "rrf", "colbert"]
+CAPTION_SEARCH_MODE = "rrf"
+
+# BGE-M3 outputs each caption search mode encodes for the query
+CAPTION_QUERY_OUTPUTS = {
+    "dense": ("dense",),
+    "sparse": ("sparse",),
+    "rrf": ("dense", "sparse"),
+    "colbert": ("dense", "sparse", "colbert")
+}
+
 
 
 
@@ -1,4 +1,5 @@
 import os
+import json
 from faiss_index import Faiss
 from app.config import *
 from qdrant import Qdrant
@@ -21,12 +22,114 @@ class Database:
         self.shots_path = os.path.abspath(SHOTS_FOLDER)
         self.videos_path = os.path.abspath(VIDEOS_FOLDER)
         self.embeddings_path = os.path.abspath(EMBEDDING_FOLDER)
+        self.thumbs_path = os.path.abspath(THUMBS_FOLDER)
+        self.sprites_path = os.path.abspath(SPRITES_FOLDER)
+        self.storyboards_path = os.path.abspath(STORYBOARDS_FOLDER)
+        self.clips_path = os.path.abspath(CLIPS_FOLDER)
+        self.caption_index_path = os.path.abspath(CAPTION_INDEX_FOLDER)
         self.mapping_json = os.path.abspath(MAPPING_JSON)
+        self.object_index_file = os.path.abspath(OBJECT_INDEX_FILE)
+        self.box_index_file = os.path.abspath(BOX_INDEX_FILE)
+        self.tag_index_file = os.path.abspath(TAG_INDEX_FILE)
+        
+        # Keyframe name -> id / id -> path, shared by all search sources
+        self.keyframe_ids, self.id2path = self.load_keyframe_catalog()
         
         # Load embedding models and available object classes
         self.embedding_models = self.load_embedding_models()
-        self.qdrant_captions = Qdrant()
+        self.caption_index = self.load_caption_index()
+        self.elasticsearch = self.connect_elasticsearch()
         self.objects = OBJECTS
+        self.object_index = self.load_object_index()
+        self.box_index = self.load_box_index()
+        self.tag_index = self.load_tag_index()
+        self.scenes = self.tag_index.labels_of_kind("scene") if self.tag_index is not None else []
+        
+    def load_keyframe_catalog(self):
+        """
+        Load the keyframe mapping used by the FAISS indices.
+        
+        Returns:
+            tuple: (keyframe_ids, id2path) - keyframe filename -> id and id -> path
+        """
+        with open(self.mapping_json, 'r', encoding='utf-8') as f:
+            items = json.load(f).get("items", [])
+        
+        keyframe_ids = {os.path.basename(item["path"]): item["id"] for item in items}
+        id2path = {item["id"]: item["path"] for item in items}
+        return keyframe_ids, id2path
+        
+    def load_object_index(self):
+        """
+        Load the in-memory object index built by build_object_index.
+        
+        Returns:
+            ObjectIndex or None: Index, or None if it has not been built
+        """
+        if not os.path.isfile(self.object_index_file):
+            print(f"Object index not found at {self.object_index_file}, object filters use Elasticsearch")
+            return None
+        
+        from database.object_index import ObjectIndex
+        return ObjectIndex(self.object_index_file)
+        
+    def load_box_index(self):
+        """
+        Load the detection/OCR box index built by build_box_index.
+        
+        Returns:
+            BoxIndex or None: Index, or None if it has not been built
+        """
+        if not os.path.isfile(self.box_index_file):
+            print(f"Box index not found at {self.box_index_file}, layout filters are disabled")
+            return None
+        
+        from database.box_index import BoxIndex
+        return BoxIndex(self.box_index_file)
+        
+    def load_tag_index(self):
+        """
+        Load the zero-shot object and scene tags built by build_tag_index.
+        
+        Returns:
+            TagIndex or None: Index, or None if it has not been built or was
+                              not built with a SigLIP model
+        """
+        if not os.path.isfile(self.tag_index_file):
+            print(f"Tag index not found at {self.tag_index_file}, scene filters are disabled")
+            return None
+        
+        from database.tag_index import TagIndex
+        try:
+            return TagIndex(self.tag_index_file)
+        except ValueError as e:
+            print(f"{e}; scene filters are disabled")
+            return None
+        
+    def connect_elasticsearch(self):
+        """
+        Connect to Elasticsearch for OCR and detection search.
+        
+        Returns:
+            MyElasticsearch or None: Client, or None if the server is unreachable
+        """
+        from database.my_elasticsearch import MyElasticsearch
+        elasticsearch = MyElasticsearch(ES_HOST)
+        return elasticsearch if elasticsearch.connect() else None
+        
+    def load_caption_index(self):
+        """
+        Load the configured caption search backend. Both backends expose the
+        same `search(search_query, collection_name, limit, mode=...)` method.
+        
+        Returns:
+            Qdrant or CaptionIndex: Caption search handler
+        """
+        if CAPTION_BACKEND == "embedded":
+            from database.caption_index import CaptionIndex
+            return CaptionIndex(self.caption_index_path)
+        
+        return Qdrant()
         
     def load_embedding_models(self):
         """
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class LRUDiskCache:
+    """
+    Size-bounded disk cache with least-recently-used eviction.
+
+    Files live directly under `root`. Usage order is kept in memory and seeded
+    from file modification times on startup, so the cache survives restarts.
+    """
+
+    def __init__(self, root, max_bytes):
+        """
+        Initialize the cache and index the files already on disk.
+
+        Args:
+            root (str): Cache directory
+            max_bytes (int): Maximum total size of cached files in bytes
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # filename -> size, oldest first
+        self.total_bytes = 0
+
+        os.makedirs(root, exist_ok=True)
+        self._load_entries()
+
+    def _load_entries(self):
+        """Index existing files, least recently used first."""
+        files = []
+        for filename in os.listdir(self.root):
+            path = os.path.join(self.root, filename)
+            if os.path.isfile(path) and '.tmp' not in filename:
+                stat = os.stat(path)
+                files.append((stat.st_mtime, filename, stat.st_size))
+
+        for _, filename, size in sorted(files):
+            self.entries[filename] = size
+            self.total_bytes += size
+
+    def path(self, filename):
+        """Get the absolute path of a cache entry (it may not exist yet)."""
+        return os.path.join(self.root, os.path.basename(filename))
+
+    def temp_path(self, filename):
+        """
+        Get a unique temporary path to write an entry before `put`. The
+        original extension is kept so that writers can infer the file format.
+        """
+        base, extension = os.path.splitext(self.path(filename))
+        return f"{base}.{os.getpid()}-{threading.get_ident()}.tmp{extension}"
+
+    def get(self, filename):
+        """
+        Look up an entry and mark it as recently used.
+
+        Args:
+            filename (str): Entry name
+
+        Returns:
+            str or None: Entry path if cached, None otherwise
+        """
+        filename = os.path.basename(filename)
+        path = self.path(filename)
+        with self.lock:
+            if filename not in self.entries:
+                return None
+            if not os.path.isfile(path):
+                self.total_bytes -= self.entries.pop(filename)
+                return None
+            self.entries.move_to_end(filename)
+
+        # Persist the usage order for the next startup
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def put(self, filename, temp_path):
+        """
+        Move a fully written temporary file into the cache and evict the
+        least recently used entries if the cache grows past its limit.
+
+        Args:
+            filename (str): Entry name
+            temp_path (str): Path of the written file, usually from `temp_path`
+
+        Returns:
+            str: Entry path
+        """
+        filename = os.path.basename(filename)
+        path = self.path(filename)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+
+        with self.lock:
+            if filename in self.entries:
+                self.total_bytes -= self.entries.pop(filename)
+            self.entries[filename] = size
+            self.total_bytes += size
+            self._evict()
+
+        return path
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits. Caller holds the lock."""
+        # Never evict the entry that was just added
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            filename, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.path(filename))
+            except OSError:
+                pass
@@ -3,6 +3,7 @@ from io import BytesIO
 from PIL import Image
 from flask import request
 from app.translate import translate_text
+from app.config import CAPTION_SEARCH_MODES, CAPTION_SEARCH_MODE
 import asyncio
 
 def parse_image_upload():
@@ -38,13 +39,23 @@ def parse_search_params():
     # Parse JSON arrays
     models = json.loads(request.form.get('models', '[]'))
     objects = json.loads(request.form.get('objects', '[]'))
+    layout = json.loads(request.form.get('layout', '[]'))
+    tags = json.loads(request.form.get('tags', '[]'))
+    
+    # Caption search mode, cheap by default; evaluation runs can ask for 'colbert'
+    caption_mode = request.form.get('caption_mode', CAPTION_SEARCH_MODE)
+    if caption_mode not in CAPTION_SEARCH_MODES:
+        caption_mode = CAPTION_SEARCH_MODE
     
     return {
         'query': query,
         'ocr_text': ocr,
         'models': models,
         'objects': objects,
-        'topK': topK
+        'layout': layout,
+        'tags': tags,
+        'topK': topK,
+        'caption_mode': caption_mode
     }
 
 
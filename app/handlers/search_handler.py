@@ -1,8 +1,10 @@
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from app.rerank import rrf
-from app.config import CAPTIONS_COLLECTION
+from app.config import (CAPTIONS_COLLECTION, CAPTION_SEARCH_MODE, OCR_INDEX, DETECTION_INDEX, TAG_SCORE_THRESHOLD,
+                        OBJECT_FILTER_TAG_FALLBACK)
 
-def perform_text_search(query, models, database, topK):
+def perform_text_search(query, models, database, topK, allowed_ids=None):
     """Perform text-based search using specified models."""
     if not query:
         return {}
@@ -10,13 +12,13 @@ def perform_text_search(query, models, database, topK):
     text_results = {}
     for model in models:
         faiss_handler = database.embedding_models[f'{model}']
-        _, _, paths = faiss_handler.text_search(query=query, top_k=topK)
+        _, _, paths = faiss_handler.text_search(query=query, top_k=topK, allowed_ids=allowed_ids)
         text_results[f'{model}_text'] = paths
     
     return text_results
 
 
-def perform_image_search(uploaded_image, models, database, topK):
+def perform_image_search(uploaded_image, models, database, topK, allowed_ids=None):
     """Perform image-based search using specified models."""
     if not uploaded_image:
         return {}
@@ -24,72 +26,234 @@ def perform_image_search(uploaded_image, models, database, topK):
     image_results = {}
     for model in models:
         faiss_handler = database.embedding_models[f'{model}']
-        _, _, paths = faiss_handler.image_search(query_image=uploaded_image, top_k=topK)
+        _, _, paths = faiss_handler.image_search(query_image=uploaded_image, top_k=topK, allowed_ids=allowed_ids)
         image_results[f'{model}_image'] = paths
     
     return image_results
 
-def perform_caption_search(query, database, topK):
-    """Perform caption-based search using Qdrant."""
+def perform_caption_search(query, database, topK, mode=CAPTION_SEARCH_MODE, allowed_ids=None):
+    """Perform caption-based search (Qdrant or embedded index) with the given search mode."""
     if not query:
         return {}
     
     caption_results = {}
     
-    # Perform search using Qdrant
-    _, _, paths = database.qdrant_captions.search(search_query=query, collection_name=CAPTIONS_COLLECTION, limit=topK, prefetch_limit=topK*3)
+    # Perform search using the configured caption backend
+    _, _, paths = database.caption_index.search(search_query=query, collection_name=CAPTIONS_COLLECTION, limit=topK,
+                                                mode=mode, allowed_ids=allowed_ids)
     
     # Return results in the same format as text/image search
     caption_results['captions'] = paths
     
     return caption_results
 
-def perform_ocr_search(ocr_text, models, database, topK):
-    """Perform OCR-based search (TODO: implement when available)."""
-    # TODO: Implement OCR text search logic here
-    return {}
+def perform_ocr_search(ocr_text, models, database, topK, allowed_ids=None):
+    """Perform OCR text search in Elasticsearch, ranked by the best matching text line."""
+    if not ocr_text or database.elasticsearch is None:
+        return {}
+    
+    hits = database.elasticsearch.search_nested_text(ocr_text, index_name=OCR_INDEX, size=topK)
+    allowed = set(allowed_ids) if allowed_ids is not None else None
+    
+    # Map keyframe names to the same paths the other sources return, so rrf can fuse them
+    paths = []
+    for hit in hits:
+        point_id = database.keyframe_ids.get(hit["_source"]["keyframe"])
+        if point_id is not None and (allowed is None or point_id in allowed):
+            paths.append(database.id2path[point_id])
+    
+    return {'ocr': paths}
 
 
 def perform_object_filtering(objects, database):
-    """Perform object-based filtering (TODO: implement when available)."""
-    # TODO: Implement object filtering logic here
-    return {}
+    """
+    Resolve the selected object filters to the ids of matching keyframes,
+    using the in-memory object index when available and Elasticsearch
+    otherwise. The zero-shot tags (plain class names only) replace
+    Elasticsearch only when OBJECT_FILTER_TAG_FALLBACK is enabled.
+    
+    Returns:
+        list or None: Sorted keyframe ids, None when no object is selected
+    """
+    if not objects:
+        return None
+    
+    if database.object_index is not None:
+        return database.object_index.filter_ids(objects).tolist()
+    
+    tags_usable = database.tag_index is not None and not database.tag_index.invalid_terms(objects)
+    if OBJECT_FILTER_TAG_FALLBACK and tags_usable:
+        print("Object index is not available, object filter uses zero-shot tags")
+        return database.tag_index.filter_ids(objects, TAG_SCORE_THRESHOLD).tolist()
+    
+    if database.elasticsearch is None:
+        print("Elasticsearch is not available, object filter ignored")
+        return None
+    
+    # Elasticsearch only supports plain class names (all required)
+    keyframes = database.elasticsearch.get_keyframes_with_objects(objects, index_name=DETECTION_INDEX)
+    return sorted({database.keyframe_ids[name] for name in keyframes if name in database.keyframe_ids})
 
 
-def perform_unified_search(uploaded_image, search_params, database):
-    """Perform unified search combining all search types."""
+def perform_layout_filtering(layout, database):
+    """
+    Resolve the layout filters ("person@left", "car:large", "text@top") to
+    the ids of matching keyframes using the in-memory box index.
+    
+    Returns:
+        list or None: Sorted keyframe ids, None when no layout filter is given
+    """
+    if not layout:
+        return None
+    
+    if database.box_index is None:
+        print("Box index is not available, layout filter ignored")
+        return None
+    
+    return database.box_index.filter_ids(layout).tolist()
+
+
+def perform_tag_filtering(tags, database):
+    """
+    Resolve the zero-shot scene or object tags to the ids of tagged keyframes.
+    
+    Returns:
+        list or None: Sorted keyframe ids, None when no tag is given
+    """
+    if not tags:
+        return None
+    
+    if database.tag_index is None:
+        print("Tag index is not available, tag filter ignored")
+        return None
+    
+    return database.tag_index.filter_ids(tags, TAG_SCORE_THRESHOLD).tolist()
+
+
+def intersect_filter_ids(allowed_ids, ids):
+    """Intersect two filter results, where None means unfiltered."""
+    if ids is None:
+        return allowed_ids
+    if allowed_ids is None:
+        return ids
+    return sorted(set(allowed_ids).intersection(ids))
+
+
+def compute_object_facets(paths, database):
+    """
+    Count the object classes over a result set from the in-memory object index.
+    
+    Returns:
+        dict: Class name -> number of result keyframes containing it, empty
+              when the object index is not loaded
+    """
+    if database.object_index is None or not paths:
+        return {}
+    
+    ids = [database.keyframe_ids[name] for name in map(os.path.basename, paths) if name in database.keyframe_ids]
+    return database.object_index.facets(ids)
+
+
+def run_search_source(source, search, errors, *args):
+    """
+    Run one search source, recording its failure in `errors` instead of
+    aborting the other sources.
+    
+    Returns:
+        dict: Results of the source, empty if it failed
+    """
+    try:
+        return search(*args)
+    except Exception as e:
+        print(f"{source} search failed: {str(e)}")
+        errors.append({'source': source, 'message': str(e)})
+        return {}
+
+
+def stream_unified_search(uploaded_image, search_params, database):
+    """
+    Perform unified search, yielding a fused ranking as soon as the fast
+    FAISS sources are done and an updated ranking after each slower source
+    (captions, OCR) finishes. Slow sources run in parallel with the FAISS
+    searches. Selected objects, layout and tag filters restrict every source
+    to the keyframes that match them instead of being fused as another ranked list.
+    
+    A failing source does not stop the others: its error is reported with
+    the next update and the ranking is fused from the remaining sources.
+    
+    Yields:
+        tuple: (stage, paths, scores, final, errors) - stage name, fused results,
+               whether this is the last update and the {'source', 'message'}
+               errors of sources that failed since the previous update
+    """
     query = search_params['query']
     ocr_text = search_params['ocr_text']
     models = search_params['models']
     objects = search_params['objects']
+    layout = search_params.get('layout', [])
+    tags = search_params.get('tags', [])
     topK = search_params['topK']
+    caption_mode = search_params.get('caption_mode', CAPTION_SEARCH_MODE)
     
-    # Collect results from different search types
-    all_search_results = {}
-    
-    # 1. Text-based search
-    text_results = perform_text_search(query, models, database, topK)
-    all_search_results.update(text_results)
+    # Resolve the object, layout and tag filters before searching, so they apply inside each index
+    allowed_ids = perform_object_filtering(objects, database)
+    allowed_ids = intersect_filter_ids(allowed_ids, perform_layout_filtering(layout, database))
+    allowed_ids = intersect_filter_ids(allowed_ids, perform_tag_filtering(tags, database))
     
-    # 2. Caption-based search
-    caption_results = perform_caption_search(query, database, topK)
-    all_search_results.update(caption_results)
+    # Filters only: the matching keyframes are the result
+    if not query and not uploaded_image and not ocr_text:
+        paths = [database.id2path[idx] for idx in (allowed_ids or [])[:topK]]
+        paths, scores = rrf({'objects': paths}, k_rrf=60)
+        yield 'objects', paths, scores, True, []
+        return
     
-    # 3. Image-based search
-    image_results = perform_image_search(uploaded_image, models, database, topK)
-    all_search_results.update(image_results)
-    
-    # 4. OCR-based search
-    ocr_results = perform_ocr_search(ocr_text, models, database, topK)
-    all_search_results.update(ocr_results)
-    
-    # 5. Object filtering
-    object_results = perform_object_filtering(objects, database)
-    all_search_results.update(object_results)
+    # Collect results from different search types, and failures of sources not reported yet
+    all_search_results = {}
+    errors = []
+    reported = 0
     
-    # Fuse all results using Reciprocal Rank Fusion
-    paths, scores = rrf(all_search_results, k_rrf=60)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Start slow sources first so they overlap with the FAISS searches
+        slow_futures = {
+            executor.submit(run_search_source, 'captions', perform_caption_search, errors,
+                            query, database, topK, caption_mode, allowed_ids): 'captions',
+            executor.submit(run_search_source, 'ocr', perform_ocr_search, errors,
+                            ocr_text, models, database, topK, allowed_ids): 'ocr'
+        }
+        
+        # 1. Text-based search and 2. Image-based search (FAISS, usually milliseconds)
+        all_search_results.update(run_search_source('text', perform_text_search, errors,
+                                                    query, models, database, topK, allowed_ids))
+        all_search_results.update(run_search_source('image', perform_image_search, errors,
+                                                    uploaded_image, models, database, topK, allowed_ids))
+        
+        if all_search_results:
+            paths, scores = rrf(all_search_results, k_rrf=60)
+            new_errors, reported = errors[reported:], len(errors)
+            yield 'faiss', paths, scores, False, new_errors
         
+        # 3. Caption and 4. OCR sources, fused as each one finishes
+        pending = len(slow_futures)
+        for future in as_completed(slow_futures):
+            pending -= 1
+            results = future.result()
+            if not results and pending > 0:
+                continue
+            
+            all_search_results.update(results)
+            
+            # Fuse all results using Reciprocal Rank Fusion
+            paths, scores = rrf(all_search_results, k_rrf=60)
+            new_errors, reported = errors[reported:], len(errors)
+            yield slow_futures[future], paths, scores, pending == 0, new_errors
+
+
+def perform_unified_search(uploaded_image, search_params, database):
+    """Perform unified search combining all search types."""
+    paths, scores = [], []
+    for _, paths, scores, _, _ in stream_unified_search(uploaded_image, search_params, database):
+        pass
+    
     return paths, scores
 
 
@@ -99,12 +263,15 @@ def format_search_response(paths, scores, uploaded_image, search_params, databas
         'paths': [r.replace(database.database_path, '', 1) for r in paths],
         'scores': scores,
         'filenames': [os.path.basename(r) for r in paths],
+        'facets': compute_object_facets(paths, database),
         'search_info': {
             'text_query': bool(search_params['query']),
             'caption_query': bool(search_params['query']),
             'image_query': bool(uploaded_image),
             'ocr_query': bool(search_params['ocr_text']),
             'object_filters': len(search_params['objects']),
+            'layout_filters': len(search_params.get('layout', [])),
+            'tag_filters': len(search_params.get('tags', [])),
             'models_used': search_params['models']
         }
     } 
\ No newline at end of file
@@ -22,4 +22,14 @@ def rrf(list_paths, k_rrf=60):
     sorted_items = sorted(rrf_scores.items(), key=lambda x: x[1], reverse=True)
     fused_paths = [p for p, _ in sorted_items]
     fused_scores = [s for _, s in sorted_items]
-    return fused_paths, fused_scores
\ No newline at end of file
+    return fused_paths, fused_scores
+
+
+def get_prefetch_limit(limit, mode):
+    """
+    Adaptive candidate pool size per retriever before fusion or rerank: the
+    ColBERT rerank benefits from a larger pool than plain RRF fusion, bounded
+    so small queries stay cheap and large ones do not explode.
+    """
+    factor = 3 if mode == "colbert" else 2
+    return min(max(limit * factor, 50), 1000)
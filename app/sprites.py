@@ -0,0 +1,93 @@
+import os
+import json
+import math
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from app.thumbnails import get_or_create_thumbnail
+from app.config import SPRITE_TILE_SIZE, SPRITE_QUALITY, THUMBNAIL_FORMAT
+
+
+def get_sprite_key(keyframe_names):
+    """Build a stable cache key for an ordered list of keyframes and the tile settings."""
+    content = "\n".join(keyframe_names) + f"\n{SPRITE_TILE_SIZE}\n{SPRITE_QUALITY}\n{THUMBNAIL_FORMAT}"
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def build_result_sprite(keyframe_names, database, sprite_cache):
+    """
+    Get the sprite image and offset manifest for a list of result keyframes.
+
+    Tiles are cut from cached thumbnails (created on demand when missing) and
+    packed row by row into a single WebP image, so the results grid can be
+    painted with one manifest request and one image request.
+
+    Args:
+        keyframe_names (list): Keyframe filenames in format "L01_V003_015190.jpg"
+        database (Database): Database with keyframe and thumbnail paths
+        sprite_cache (LRUDiskCache): Cache holding built sprites and manifests
+
+    Returns:
+        dict: Manifest with sprite URL, grid size and per-keyframe tile offsets
+    """
+    keyframe_names = [os.path.basename(name) for name in keyframe_names]
+    key = get_sprite_key(keyframe_names)
+    sprite_name = f"{key}.webp"
+    manifest_name = f"{key}.json"
+
+    # Serve from cache when both the image and its manifest are present
+    sprite_path = sprite_cache.get(sprite_name)
+    manifest_path = sprite_cache.get(manifest_name)
+    if sprite_path and manifest_path:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    # Resolve thumbnails in parallel; PIL releases the GIL while decoding/resizing
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        thumbnail_paths = list(executor.map(
+            lambda name: get_or_create_thumbnail(name, database.keyframes_path, database.thumbs_path),
+            keyframe_names
+        ))
+
+    available = [(name, path) for name, path in zip(keyframe_names, thumbnail_paths) if path]
+    missing = [name for name, path in zip(keyframe_names, thumbnail_paths) if not path]
+
+    tile_width, tile_height = SPRITE_TILE_SIZE
+    columns = max(1, min(len(available), math.ceil(math.sqrt(len(available)))))
+    rows = max(1, math.ceil(len(available) / columns))
+
+    sprite = Image.new('RGB', (columns * tile_width, rows * tile_height), (245, 245, 245))
+    tiles = {}
+    for index, (name, path) in enumerate(available):
+        column = index % columns
+        row = index // columns
+        x = column * tile_width
+        y = row * tile_height
+
+        with Image.open(path) as thumbnail:
+            # Same center crop as the grid's `object-fit: cover`
+            tile = ImageOps.fit(thumbnail.convert('RGB'), SPRITE_TILE_SIZE, Image.LANCZOS)
+        sprite.paste(tile, (x, y))
+
+        tiles[name] = {'x': x, 'y': y, 'column': column, 'row': row}
+
+    manifest = {
+        'sprite': f"/data/sprites/{sprite_name}",
+        'tile_width': tile_width,
+        'tile_height': tile_height,
+        'columns': columns,
+        'rows': rows,
+        'tiles': tiles,
+        'missing': missing
+    }
+
+    sprite_tmp = sprite_cache.temp_path(sprite_name)
+    sprite.save(sprite_tmp, format='WEBP', quality=SPRITE_QUALITY, method=4)
+    sprite_cache.put(sprite_name, sprite_tmp)
+
+    manifest_tmp = sprite_cache.temp_path(manifest_name)
+    with open(manifest_tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    sprite_cache.put(manifest_name, manifest_tmp)
+
+    return manifest
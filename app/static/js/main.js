@@ -12,7 +12,9 @@
 window.AppData = {
     availableModels: [],
     availableObjects: [],
-    selectedObjects: []
+    availableScenes: [],
+    selectedObjects: [],
+    objectFacets: {}
 };
 
 // Main DOM elements
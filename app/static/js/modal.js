@@ -16,13 +16,20 @@ window.ModalModule = (function() {
         modalOverlay: document.querySelector('.modal-overlay'),
         modalPrevBtn: document.getElementById('modalPrevBtn'),
         modalNextBtn: document.getElementById('modalNextBtn'),
-        keyframeThumbnails: document.getElementById('keyframeThumbnails')
+        keyframeThumbnails: document.getElementById('keyframeThumbnails'),
+        storyboardSection: document.getElementById('storyboardSection'),
+        storyboardPreview: document.getElementById('storyboardPreview'),
+        storyboardScrubber: document.getElementById('storyboardScrubber')
     };
     
     // State variables
     let currentKeyframes = [];
     let currentKeyframeIndex = -1;
     let currentScore = null;
+    let currentStoryboard = null;
+    let isScrubbing = false;
+    let currentVideoInfo = null;
+    let isPlayingClip = false;
     
     // Private methods
     function setupEventListeners() {
@@ -42,6 +49,11 @@ window.ModalModule = (function() {
             elements.modalNextBtn.addEventListener('click', navigateToNextKeyframe);
         }
         
+        if (elements.storyboardScrubber) {
+            elements.storyboardScrubber.addEventListener('input', handleScrubberInput);
+            elements.storyboardScrubber.addEventListener('change', handleScrubberChange);
+        }
+        
         document.addEventListener('keydown', function(e) {
             if (elements.modal && elements.modal.style.display === 'block') {
                 switch(e.key) {
@@ -148,7 +160,7 @@ window.ModalModule = (function() {
             
             // Create image element
             const img = document.createElement('img');
-            img.src = keyframe.path;
+            img.src = `/data/thumbs/${keyframe.filename}`;
             img.alt = `Keyframe ${keyframe.frame_number}`;
             
             // Handle image loading errors
@@ -221,6 +233,107 @@ window.ModalModule = (function() {
         renderKeyframeThumbnails();
     }
     
+    function loadStoryboard(filename) {
+        currentStoryboard = null;
+        if (elements.storyboardSection) {
+            elements.storyboardSection.style.display = 'none';
+        }
+        
+        fetch(`/api/storyboard/${filename}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(storyboard => {
+                currentStoryboard = storyboard;
+                if (elements.storyboardScrubber) {
+                    elements.storyboardScrubber.max = Math.floor(storyboard.duration);
+                    elements.storyboardScrubber.value = 0;
+                }
+                if (elements.storyboardSection) {
+                    elements.storyboardSection.style.display = 'block';
+                }
+            })
+            .catch(() => {
+                // No storyboard for this video: the scrubber stays hidden
+                currentStoryboard = null;
+            });
+    }
+    
+    function showStoryboardTile(seconds) {
+        if (!currentStoryboard || !elements.storyboardPreview) return;
+        
+        const sb = currentStoryboard;
+        const tilesPerSheet = sb.columns * sb.rows;
+        const index = Math.min(sb.count - 1, Math.floor(seconds / sb.interval));
+        const sheet = sb.sheets[Math.floor(index / tilesPerSheet)];
+        const position = index % tilesPerSheet;
+        const x = (position % sb.columns) * sb.tile_width;
+        const y = Math.floor(position / sb.columns) * sb.tile_height;
+        
+        const preview = elements.storyboardPreview;
+        preview.style.width = `${sb.tile_width}px`;
+        preview.style.height = `${sb.tile_height}px`;
+        preview.style.backgroundImage = `url('${sheet}')`;
+        preview.style.backgroundPosition = `-${x}px -${y}px`;
+        preview.style.left = `${sb.duration > 0 ? (seconds / sb.duration) * 100 : 0}%`;
+        preview.style.display = 'block';
+    }
+    
+    function handleScrubberInput(e) {
+        isScrubbing = true;
+        showStoryboardTile(parseFloat(e.target.value));
+    }
+    
+    function handleScrubberChange(e) {
+        isScrubbing = false;
+        if (elements.storyboardPreview) {
+            elements.storyboardPreview.style.display = 'none';
+        }
+        seekVideo(parseFloat(e.target.value));
+    }
+    
+    function playVideoSource(videoElement, src, startTime, isClip) {
+        isPlayingClip = isClip;
+        videoElement.src = src;
+        
+        // Seek to specific timestamp when video loads
+        videoElement.addEventListener('loadeddata', function() {
+            this.currentTime = Math.max(0, startTime);
+        }, { once: true });
+        
+        // If the clip cannot be produced, fall back to the full video
+        videoElement.onerror = function() {
+            if (isPlayingClip && currentVideoInfo) {
+                playVideoSource(this, currentVideoInfo.video_path, currentVideoInfo.timestamp, false);
+            }
+        };
+    }
+    
+    function seekVideo(seconds) {
+        const videoElement = document.getElementById('modalVideo');
+        if (!videoElement || videoElement.style.display === 'none' || !currentVideoInfo) return;
+        
+        if (!isPlayingClip) {
+            videoElement.currentTime = seconds;
+        } else if (seconds >= currentVideoInfo.clip_start && seconds <= currentVideoInfo.clip_end) {
+            videoElement.currentTime = seconds - currentVideoInfo.clip_start;
+        } else {
+            // Outside the clip: switch to the full video
+            playVideoSource(videoElement, currentVideoInfo.video_path, seconds, false);
+        }
+    }
+    
+    function syncScrubber() {
+        // Follow playback unless the user is dragging the scrubber
+        if (!isScrubbing && currentStoryboard && elements.storyboardScrubber) {
+            const offset = isPlayingClip && currentVideoInfo ? currentVideoInfo.clip_start : 0;
+            elements.storyboardScrubber.value = Math.floor(this.currentTime + offset);
+        }
+    }
+    
     function loadModalContent(imagePath, filename, path, score) {
         // Get video information from API
         fetch(`/api/video-info/${filename}`)
@@ -242,16 +355,19 @@ window.ModalModule = (function() {
                     videoElement.style.maxWidth = '100%';
                     videoElement.style.maxHeight = '50vh';
                     videoElement.style.objectFit = 'contain';
+                    videoElement.addEventListener('timeupdate', syncScrubber);
                     elements.modalImage.parentElement.appendChild(videoElement);
                 }
                 
                 videoElement.style.display = 'block';
-                videoElement.src = videoInfo.video_path;
+                currentVideoInfo = videoInfo;
                 
-                // Seek to specific timestamp when video loads
-                videoElement.addEventListener('loadeddata', function() {
-                    this.currentTime = videoInfo.timestamp;
-                }, { once: true });
+                // Play a short clip around the keyframe instead of streaming the whole video
+                if (videoInfo.clip_path) {
+                    playVideoSource(videoElement, videoInfo.clip_path, videoInfo.timestamp - videoInfo.clip_start, true);
+                } else {
+                    playVideoSource(videoElement, videoInfo.video_path, videoInfo.timestamp, false);
+                }
                 
             })
             .catch(error => {
@@ -323,6 +439,9 @@ window.ModalModule = (function() {
         // Load modal content for current keyframe
         loadModalContent(imagePath, filename, path, score);
         
+        // Load the storyboard of this video for fast scrubbing
+        loadStoryboard(filename);
+        
         // Show modal
         elements.modal.style.display = 'block';
         document.body.style.overflow = 'hidden';
@@ -352,9 +471,12 @@ window.ModalModule = (function() {
         const videoElement = document.getElementById('modalVideo');
         if (videoElement) {
             videoElement.pause();
+            videoElement.onerror = null;
             videoElement.src = '';
             videoElement.style.display = 'none';
         }
+        currentVideoInfo = null;
+        isPlayingClip = false;
         
         // Reset navigation state
         currentKeyframes = [];
@@ -381,6 +503,16 @@ window.ModalModule = (function() {
         if (elements.keyframeThumbnails) {
             elements.keyframeThumbnails.innerHTML = '';
         }
+        
+        // Reset storyboard
+        currentStoryboard = null;
+        isScrubbing = false;
+        if (elements.storyboardSection) {
+            elements.storyboardSection.style.display = 'none';
+        }
+        if (elements.storyboardPreview) {
+            elements.storyboardPreview.style.display = 'none';
+        }
     }
     
     // Public interface
@@ -27,7 +27,9 @@ window.ObjectsModule = (function() {
                 return response.json();
             })
             .then(data => {
-                window.AppData.availableObjects = data.objects || data || [];
+                // Scene tags are picked from the same list as objects
+                window.AppData.availableScenes = data.scenes || [];
+                window.AppData.availableObjects = [...(data.objects || data || []), ...window.AppData.availableScenes];
                 filteredObjects = [...window.AppData.availableObjects];
             })
             .catch(error => {
@@ -99,9 +101,12 @@ window.ObjectsModule = (function() {
             case 'Enter':
                 e.preventDefault();
                 if (currentHighlighted >= 0 && items[currentHighlighted]) {
-                    selectObject(items[currentHighlighted].textContent);
+                    selectObject(items[currentHighlighted].dataset.object);
+                } else {
+                    // Filter expressions over the available objects, e.g. "person>=3", "!dog", "car|bus",
+                    // or layout expressions, e.g. "person@left", "text@top"
+                    selectObject(elements.objectInput.value.trim().toLowerCase());
                 }
-                // Only allow selecting from the available list, no custom objects
                 break;
                 
             case 'Escape':
@@ -114,7 +119,7 @@ window.ObjectsModule = (function() {
                 e.preventDefault();
                 // Only select if there's a highlighted item, no custom objects
                 if (currentHighlighted >= 0 && items[currentHighlighted]) {
-                    selectObject(items[currentHighlighted].textContent);
+                    selectObject(items[currentHighlighted].dataset.object);
                 }
                 break;
         }
@@ -194,10 +199,25 @@ window.ObjectsModule = (function() {
             return;
         }
         
-        filteredObjects.forEach(object => {
+        // Objects occurring in the current results first, most frequent first
+        const facets = window.AppData.objectFacets || {};
+        const objects = [...filteredObjects].sort((a, b) => (facets[b] || 0) - (facets[a] || 0));
+        
+        objects.forEach(object => {
             const item = document.createElement('div');
             item.className = 'object-item';
-            item.textContent = object;
+            item.dataset.object = object;
+            
+            const name = document.createElement('span');
+            name.textContent = object;
+            item.appendChild(name);
+            
+            if (facets[object]) {
+                const count = document.createElement('span');
+                count.className = 'object-count';
+                count.textContent = facets[object];
+                item.appendChild(count);
+            }
             
             if (window.AppData.selectedObjects.includes(object)) {
                 item.classList.add('selected');
@@ -212,10 +232,30 @@ window.ObjectsModule = (function() {
         });
     }
     
+    function isObjectClass(name) {
+        return window.AppData.availableObjects.includes(name) && !window.AppData.availableScenes.includes(name);
+    }
+    
+    function isObjectExpression(text) {
+        // Each alternative: optional "!", an available object and an optional count predicate
+        return text.split('|').every(alternative => {
+            const match = alternative.trim().match(/^(!)?\s*([a-z][a-z ]*?)\s*(?:(>=|<=|>|<|=)\s*(\d+))?$/);
+            return match && isObjectClass(match[2]);
+        });
+    }
+    
+    function isLayoutExpression(text) {
+        // An available object or "text", then an optional region and size, e.g. "person@left", "car:large"
+        const match = text.match(/^([a-z][a-z ]*?)\s*(?:@\s*([a-z-]+))?\s*(?::\s*(small|medium|large))?$/);
+        return match && (match[2] || match[3]) &&
+               (match[1] === 'text' || isObjectClass(match[1]));
+    }
+    
     function selectObject(objectName) {
         if (!objectName || 
             window.AppData.selectedObjects.includes(objectName) ||
-            !window.AppData.availableObjects.includes(objectName)) {
+            !(window.AppData.availableObjects.includes(objectName) || isObjectExpression(objectName) ||
+              isLayoutExpression(objectName))) {
             return;
         }
         
@@ -274,6 +314,14 @@ window.ObjectsModule = (function() {
             updateTagsDisplay();
         },
         
+        updateFacets: function(facets) {
+            // Per-object counts over the current results, shown in the dropdown
+            window.AppData.objectFacets = facets || {};
+            if (isDropdownVisible) {
+                updateDropdown();
+            }
+        },
+        
         reloadObjects: loadObjects,
         updateDisplay: updateTagsDisplay
     };
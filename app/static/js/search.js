@@ -9,6 +9,9 @@ window.SearchModule = (function() {
     let isSearching = false;
     let currentController = null;
     
+    // Must match SPRITE_MAX_TILES in app/config.py
+    const SPRITE_MAX_TILES = 500;
+    
     // Private methods
     
     function getSelectedModels() {
@@ -22,8 +25,21 @@ window.SearchModule = (function() {
         if (query) formData.append('query', query);
         if (ocrText) formData.append('ocr_text', ocrText);
         formData.append('models', JSON.stringify(selectedModels));
-        if (selectedObjects.length > 0) {
-            formData.append('objects', JSON.stringify(selectedObjects));
+        // Layout filters ("person@left", "car:large") go to the box index, scenes to the
+        // zero-shot tags and the rest to the object index
+        const isLayout = object => /[@:]/.test(object);
+        const isScene = object => window.AppData.availableScenes.includes(object);
+        const objectFilters = selectedObjects.filter(object => !isLayout(object) && !isScene(object));
+        const layoutFilters = selectedObjects.filter(isLayout);
+        const tagFilters = selectedObjects.filter(isScene);
+        if (objectFilters.length > 0) {
+            formData.append('objects', JSON.stringify(objectFilters));
+        }
+        if (layoutFilters.length > 0) {
+            formData.append('layout', JSON.stringify(layoutFilters));
+        }
+        if (tagFilters.length > 0) {
+            formData.append('tags', JSON.stringify(tagFilters));
         }
         formData.append('topK', topK.toString());
         if (uploadedFile) {
@@ -102,10 +118,10 @@ window.SearchModule = (function() {
         }
     }
     
-    function validateSearchInputWithImage(query, ocrText, uploadedFile, selectedModels, topK) {
-        // Check if at least query, OCR text, or image is provided
-        if (!query && !ocrText && !uploadedFile) {
-            alert('Please enter search text or upload an image');
+    function validateSearchInputWithImage(query, ocrText, uploadedFile, selectedModels, topK, selectedObjects = []) {
+        // Check if at least query, OCR text, image or an object filter is provided
+        if (!query && !ocrText && !uploadedFile && selectedObjects.length === 0) {
+            alert('Please enter search text, upload an image or select objects');
             return false;
         }
         
@@ -144,7 +160,7 @@ window.SearchModule = (function() {
         const uploadedFile = fileInput && fileInput.files[0];
         
         // Validate input
-        if (!validateSearchInputWithImage(query, ocrText, uploadedFile, selectedModels, topK)) {
+        if (!validateSearchInputWithImage(query, ocrText, uploadedFile, selectedModels, topK, selectedObjects)) {
             return;
         }
         
@@ -161,7 +177,7 @@ window.SearchModule = (function() {
         const timeoutId = setTimeout(() => currentController.abort(), 30000);
         
         // Always POST with FormData - simple and consistent
-        const fetchUrl = '/api/search';
+        const fetchUrl = '/api/search/stream';
         const fetchOptions = {
             method: 'POST',
             body: buildSearchFormData(query, ocrText, selectedModels, selectedObjects, topK, uploadedFile),
@@ -174,30 +190,53 @@ window.SearchModule = (function() {
             imageSearch: !!uploadedFile 
         };
         
-        // Send unified POST request to /api/search
+        // Send unified POST request; results arrive in stages (fast FAISS first, fused after)
         fetch(fetchUrl, fetchOptions)
         .then(async response => {
-            clearTimeout(timeoutId);
-            
             const contentType = response.headers.get('content-type');
-            if (!contentType || !contentType.includes('application/json')) {
+            if (!response.ok || !contentType || !contentType.includes('application/x-ndjson')) {
+                clearTimeout(timeoutId);
                 const text = await response.text();
-                throw new Error(`Server returned unknown error (${response.status}): ${text.substring(0, 200)}`);
+                let errorMessage = `Server returned unknown error (${response.status}): ${text.substring(0, 200)}`;
+                try {
+                    const data = JSON.parse(text);
+                    errorMessage = data.error || data.detail || data.message || errorMessage;
+                } catch (e) {
+                    // Not JSON, keep the raw text
+                }
+                throw new Error(errorMessage);
             }
             
-            const data = await response.json();
+            let received = 0;
+            const sourceErrors = [];
+            await readSearchStream(response, data => {
+                if (data.type === 'error') {
+                    // A source failed; the others keep streaming, so show a warning next to the results
+                    sourceErrors.push(data);
+                    if (received > 0) {
+                        showSourceErrors(sourceErrors);
+                    }
+                    return;
+                }
+                
+                received++;
+                // Keep the previous screen until the first non-empty stage arrives
+                if (data.final || (data.paths && data.paths.length > 0)) {
+                    displayResults(data, searchParams);
+                    showSourceErrors(sourceErrors);
+                }
+            });
+            clearTimeout(timeoutId);
             
-            if (!response.ok) {
-                const errorMessage = data.error || data.detail || data.message || `HTTP Error: ${response.status}`;
-                throw new Error(errorMessage);
+            if (received === 0) {
+                if (sourceErrors.length > 0) {
+                    throw new Error(formatSourceErrors(sourceErrors));
+                }
+                displayResults(null, searchParams);
             }
-            
-            return data;
-        })
-        .then(data => {
-            displayResults(data, searchParams);
         })
         .catch(error => {
+            clearTimeout(timeoutId);
             if (error.name !== 'AbortError') {
                 handleSearchError(error);
             }
@@ -208,7 +247,53 @@ window.SearchModule = (function() {
         });
     }
     
+    function formatSourceErrors(sourceErrors) {
+        return sourceErrors.map(error => `${error.source}: ${error.message}`).join('\n');
+    }
+    
+    function showSourceErrors(sourceErrors) {
+        if (sourceErrors.length === 0) {
+            return;
+        }
+        
+        const resultsDiv = window.AppElements.resultsDiv;
+        let warning = resultsDiv.querySelector('.source-errors');
+        if (!warning) {
+            warning = document.createElement('div');
+            warning.className = 'source-errors';
+            warning.style.cssText = 'color: #856404; padding: 10px 15px; margin: 15px 0; border: 1px solid #ffeeba; background-color: #fff3cd; border-radius: 4px; white-space: pre-wrap;';
+            resultsDiv.prepend(warning);
+        }
+        warning.textContent = `Some sources failed, results may be incomplete:\n${formatSourceErrors(sourceErrors)}`;
+    }
+    
+    async function readSearchStream(response, onData) {
+        // Parse newline-delimited JSON as chunks arrive
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onData(JSON.parse(line)));
+        }
+        
+        buffer += decoder.decode();
+        if (buffer.trim()) {
+            onData(JSON.parse(buffer));
+        }
+    }
+    
     function displayResults(data, searchParams = {}) {
+        if (window.ObjectsModule) {
+            window.ObjectsModule.updateFacets(data && data.facets);
+        }
+        
         if (!data || !data.paths || data.paths.length === 0) {
             displayNoResults(searchParams);
             return;
@@ -216,6 +301,76 @@ window.SearchModule = (function() {
         
         const html = buildResultsHTML(data, searchParams);
         window.AppElements.resultsDiv.innerHTML = html;
+        
+        const filenames = data.paths.map((path, index) => 
+            data.filenames && data.filenames[index] ? data.filenames[index] : path.split('/').pop()
+        );
+        loadResultSprites(filenames);
+    }
+    
+    function getResultContainers(filenames) {
+        const wanted = new Set(filenames);
+        return Array.from(window.AppElements.resultsDiv.querySelectorAll('.image-container[data-filename]'))
+                    .filter(container => wanted.has(container.dataset.filename));
+    }
+    
+    function showThumbnail(container) {
+        // Fallback: load the individual thumbnail for this result
+        const img = container.querySelector('img');
+        if (img && !img.getAttribute('src')) {
+            img.src = img.dataset.src;
+            img.style.display = 'block';
+        }
+    }
+    
+    function applySprite(manifest, filenames) {
+        const columns = manifest.columns;
+        const rows = manifest.rows;
+        
+        getResultContainers(filenames).forEach(container => {
+            const tile = manifest.tiles[container.dataset.filename];
+            if (!tile) {
+                showThumbnail(container);
+                return;
+            }
+            
+            // Percentage offsets keep tiles aligned at any rendered grid size
+            const posX = columns > 1 ? (tile.column / (columns - 1)) * 100 : 0;
+            const posY = rows > 1 ? (tile.row / (rows - 1)) * 100 : 0;
+            container.style.backgroundImage = `url('${manifest.sprite}')`;
+            container.style.backgroundSize = `${columns * 100}% ${rows * 100}%`;
+            container.style.backgroundPosition = `${posX}% ${posY}%`;
+        });
+    }
+    
+    function loadResultSprites(filenames) {
+        // One manifest request and one image request per chunk of results
+        for (let start = 0; start < filenames.length; start += SPRITE_MAX_TILES) {
+            const chunk = filenames.slice(start, start + SPRITE_MAX_TILES);
+            
+            fetch('/api/sprite', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ keyframes: chunk })
+            })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! status: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(manifest => new Promise((resolve, reject) => {
+                const spriteImage = new Image();
+                spriteImage.onload = () => resolve(manifest);
+                spriteImage.onerror = () => reject(new Error('Unable to load sprite image'));
+                spriteImage.src = manifest.sprite;
+            }))
+            .then(manifest => applySprite(manifest, chunk))
+            .catch(error => {
+                console.error('Error loading result sprite:', error);
+                getResultContainers(chunk).forEach(showThumbnail);
+            });
+        }
     }
     
     function displayNoResults(searchParams) {
@@ -259,22 +414,26 @@ window.SearchModule = (function() {
                 : path.split('/').pop();
                 
             let imagePath;
+            let thumbPath;
             try {
                 imagePath = `/data/keyframes/${filename}`;
+                thumbPath = `/data/thumbs/${filename}`;
             } catch (e) {
                 imagePath = '/static/images/no-image.png';
+                thumbPath = imagePath;
             }
             
             html += `
                 <div class="image-item" style="border: 1px solid #ddd; border-radius: 4px; overflow: hidden; display: flex; flex-direction: column; height: 100%;">
-                    <div class="image-container" style="position: relative; padding-top: 100%;">
+                    <div class="image-container" data-filename="${filename}" 
+                        style="position: relative; padding-top: 100%; background-color: #f5f5f5; background-repeat: no-repeat; cursor: pointer;"
+                        onclick="window.ModalModule.openImageModal('${imagePath}', '${filename}', '${path}', '${score}')">
                         <img 
-                            src="${imagePath}" 
+                            data-src="${thumbPath}" 
                             alt="Result ${index + 1}"
                             onerror="this.onerror=null; this.src='/static/images/no-image.png'"
                             loading="lazy"
-                            style="position: absolute; top: 0; left: 0; width: 100%; height: 100%; object-fit: cover; cursor: pointer;"
-                            onclick="window.ModalModule.openImageModal('${imagePath}', '${filename}', '${path}', '${score}')"
+                            style="position: absolute; top: 0; left: 0; width: 100%; height: 100%; object-fit: cover; display: none;"
                         >
                     </div>
                     <div class="image-info" style="padding: 8px; font-size: 12px; background: #f8f9fa; border-top: 1px solid #eee; flex-grow: 1; display: flex; flex-direction: column; justify-content: center;">
@@ -0,0 +1,36 @@
+import os
+from preprocess.thumbnail_generation import create_thumbnail, get_thumbnail_name
+from app.config import THUMBNAIL_SIZE, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY
+
+
+def get_or_create_thumbnail(keyframe_name, keyframes_path, thumbs_path):
+    """
+    Get the thumbnail of a keyframe, creating it on demand if the preprocess
+    stage has not produced it yet. Created thumbnails are kept on disk so
+    later requests are served directly.
+
+    Args:
+        keyframe_name (str): Keyframe filename in format "L01_V003_015190.jpg"
+        keyframes_path (str): Root folder of full-resolution keyframes
+        thumbs_path (str): Root folder of the thumbnail cache
+
+    Returns:
+        str or None: Thumbnail path, or None if the keyframe does not exist
+    """
+    keyframe_name = os.path.basename(keyframe_name)
+    parts = keyframe_name.split('_')
+    if len(parts) < 3:
+        return None
+
+    lesson_folder = parts[0]  # L01
+    video_folder = parts[1]   # V003
+    thumbnail_path = os.path.join(thumbs_path, lesson_folder, video_folder,
+                                  get_thumbnail_name(keyframe_name, THUMBNAIL_FORMAT))
+    if os.path.isfile(thumbnail_path):
+        return thumbnail_path
+
+    keyframe_path = os.path.join(keyframes_path, lesson_folder, video_folder, keyframe_name)
+    if not os.path.isfile(keyframe_path):
+        return None
+
+    return create_thumbnail(keyframe_path, thumbnail_path, THUMBNAIL_SIZE, THUMBNAIL_FORMAT, THUMBNAIL_QUALITY)
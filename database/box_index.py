@@ -0,0 +1,229 @@
+import os
+import re
+import glob
+import json
+import numpy as np
+from tqdm import tqdm
+from database.object_index import match_object_classes
+
+# Coarse spatial grid: every box is bucketed by the cell of its center
+GRID_SIZE = 3
+
+# Pseudo class of OCR text lines
+TEXT_CLASS = "text"
+
+# OCR runs on keyframes resized to this size (see preprocess/ocr.py)
+OCR_FRAME_SIZE = (1280, 720)
+
+# Named regions as normalized (x1, y1, x2, y2); a box is in a region when its center is
+_COLUMNS = {"left": (0, 1 / 3), "center": (1 / 3, 2 / 3), "right": (2 / 3, 1)}
+_ROWS = {"top": (0, 1 / 3), "middle": (1 / 3, 2 / 3), "bottom": (2 / 3, 1)}
+REGIONS = {
+    **{name: (x1, 0, x2, 1) for name, (x1, x2) in _COLUMNS.items()},
+    **{name: (0, y1, 1, y2) for name, (y1, y2) in _ROWS.items()},
+    **{f"{row}-{column}": (x1, y1, x2, y2)
+       for row, (y1, y2) in _ROWS.items() for column, (x1, x2) in _COLUMNS.items()}
+}
+
+# Box sizes as [min, max) fraction of the frame area
+SIZES = {"small": (0, 0.02), "medium": (0.02, 0.15), "large": (0.15, 1.01)}
+
+# A layout term: class, optional region and optional size, e.g. "person@left", "car:large", "text@top"
+TERM_PATTERN = re.compile(r"^\s*([a-z][a-z ]*?)\s*(?:@\s*([a-z-]+))?\s*(?::\s*([a-z]+))?\s*$")
+
+
+def detection_box_to_xyxy(box):
+    """Convert a GroundingDINO box (normalized cx, cy, w, h) to normalized x1, y1, x2, y2."""
+    cx, cy, w, h = box
+    return cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2
+
+
+def ocr_box_to_xyxy(points, frame_size=OCR_FRAME_SIZE):
+    """Convert an OCR quadrilateral (pixel corner points) to normalized x1, y1, x2, y2."""
+    points = np.asarray(points, dtype=np.float32)
+    width, height = frame_size
+    x1, y1 = points.min(axis=0)
+    x2, y2 = points.max(axis=0)
+    return x1 / width, y1 / height, x2 / width, y2 / height
+
+
+class BoxIndex:
+    """
+    Columnar store of detection and OCR boxes with a coarse spatial grid.
+
+    Boxes are kept as flat NumPy columns (keyframe id, normalized x1, y1,
+    x2, y2) sorted by class and by the grid cell of the box center, with a
+    CSR-style pointer array over (class, cell). A layout query only scans
+    the cells its region overlaps, then checks the exact center and size.
+
+    Query grammar, one term per entry (terms are ANDed):
+        person@left       a person in the left third
+        car:large         a car covering at least 15% of the frame
+        text@top          an OCR text line in the top third
+        person@top-right:small
+    """
+
+    def __init__(self, index_file):
+        data = np.load(index_file)
+        self.classes = [str(name) for name in data["classes"]]
+        self.class_ids = {name: i for i, name in enumerate(self.classes)}
+        self.keyframes = data["keyframes"]
+        self.boxes = data["boxes"]
+        self.indptr = data["indptr"]
+        self.size = int(data["size"])
+
+    def parse_term(self, term):
+        """Parse one layout term. Returns (class_id, region, size)."""
+        match = TERM_PATTERN.match(term.lower())
+        if not match:
+            raise ValueError(f"Invalid layout filter: {term}")
+        name, region, size = match.groups()
+        if name not in self.class_ids or (region and region not in REGIONS) or (size and size not in SIZES):
+            raise ValueError(f"Invalid layout filter: {term}")
+        return self.class_ids[name], REGIONS[region] if region else None, SIZES[size] if size else None
+
+    def invalid_terms(self, terms):
+        """Get the layout terms that cannot be parsed."""
+        invalid = []
+        for term in terms:
+            try:
+                self.parse_term(term)
+            except ValueError:
+                invalid.append(term)
+        return invalid
+
+    def candidate_rows(self, class_id, region):
+        """Rows of the boxes of a class whose center cell overlaps the region."""
+        if region is None:
+            cells = range(GRID_SIZE * GRID_SIZE)
+        else:
+            x1, y1, x2, y2 = region
+            columns = range(int(x1 * GRID_SIZE), min(int(np.ceil(x2 * GRID_SIZE)), GRID_SIZE))
+            rows = range(int(y1 * GRID_SIZE), min(int(np.ceil(y2 * GRID_SIZE)), GRID_SIZE))
+            cells = [row * GRID_SIZE + column for row in rows for column in columns]
+
+        base = class_id * GRID_SIZE * GRID_SIZE
+        return np.concatenate([np.arange(self.indptr[base + cell], self.indptr[base + cell + 1]) for cell in cells]
+                              or [np.empty(0, dtype=np.int64)])
+
+    def term_mask(self, term):
+        """Boolean mask over keyframe ids of the keyframes matching one layout term."""
+        class_id, region, size = self.parse_term(term)
+        rows = self.candidate_rows(class_id, region)
+        boxes = self.boxes[rows]
+
+        keep = np.ones(len(rows), dtype=bool)
+        if region is not None:
+            cx = (boxes[:, 0] + boxes[:, 2]) / 2
+            cy = (boxes[:, 1] + boxes[:, 3]) / 2
+            keep &= (cx >= region[0]) & (cx < region[2]) & (cy >= region[1]) & (cy < region[3])
+        if size is not None:
+            area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+            keep &= (area >= size[0]) & (area < size[1])
+
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.keyframes[rows[keep]]] = True
+        return mask
+
+    def filter_ids(self, terms):
+        """
+        Get the ids of the keyframes matching all layout terms.
+
+        Returns:
+            np.ndarray: Sorted keyframe ids
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for term in terms:
+            mask &= self.term_mask(term)
+        return np.flatnonzero(mask)
+
+
+def build_box_index(detection_dir, ocr_dir, mapping_json, classes, output_file, score_threshold=0.35):
+    """
+    Build the box index from the *_detection.json files of object_detection
+    and the JSON files of ocr.
+
+    Args:
+        detection_dir (str): Directory searched recursively for *_detection.json
+        ocr_dir (str): Directory searched recursively for OCR JSON files, None to skip text boxes
+        mapping_json (str): Keyframe mapping (id2path.json) defining keyframe ids
+        classes (list): Object class names
+        output_file (str): Output .npz file
+        score_threshold (float): Minimum detection score to keep a box
+
+    Returns:
+        dict: Status and message
+    """
+    with open(mapping_json, 'r', encoding='utf-8') as f:
+        items = json.load(f).get("items", [])
+    keyframe_ids = {os.path.basename(item["path"]): item["id"] for item in items}
+    size = max(keyframe_ids.values()) + 1 if keyframe_ids else 0
+
+    all_classes = list(classes) + [TEXT_CLASS]
+    text_class_id = len(classes)
+    keyframe_column, class_column, box_rows = [], [], []
+    unresolved = 0
+
+    detection_files = glob.glob(os.path.join(detection_dir, "**", "*_detection.json"), recursive=True)
+    if not detection_files:
+        return {"status": "error", "message": f"Không tìm thấy file detection nào trong {detection_dir}"}
+
+    for json_file in tqdm(detection_files, desc="Đang đọc box detection"):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            detections = json.load(f)
+
+        for entry in detections:
+            keyframe_id = keyframe_ids.get(entry.get("keyframe", ""))
+            if keyframe_id is None:
+                unresolved += 1
+                continue
+
+            for obj in entry.get("objects", []):
+                if obj.get("score", 0) < score_threshold or len(obj.get("box", [])) != 4:
+                    continue
+                box = detection_box_to_xyxy(obj["box"])
+                for name in match_object_classes(obj.get("object", ""), classes):
+                    keyframe_column.append(keyframe_id)
+                    class_column.append(classes.index(name))
+                    box_rows.append(box)
+
+    ocr_files = glob.glob(os.path.join(ocr_dir, "**", "*.json"), recursive=True) if ocr_dir else []
+    for json_file in tqdm(ocr_files, desc="Đang đọc box OCR"):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            ocr_results = json.load(f)
+
+        for entry in ocr_results:
+            keyframe_id = keyframe_ids.get(entry.get("image", ""))
+            if keyframe_id is None:
+                unresolved += 1
+                continue
+
+            for line in entry.get("results", []):
+                if len(line.get("box", [])) != 4:
+                    continue
+                keyframe_column.append(keyframe_id)
+                class_column.append(text_class_id)
+                box_rows.append(ocr_box_to_xyxy(line["box"]))
+
+    keyframes = np.asarray(keyframe_column, dtype=np.int32)
+    class_column = np.asarray(class_column, dtype=np.int64)
+    boxes = np.clip(np.asarray(box_rows, dtype=np.float32).reshape(-1, 4), 0, 1)
+
+    # Bucket by (class, cell of the box center) and sort so every bucket is a contiguous range
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    cells = (np.minimum((cy * GRID_SIZE).astype(np.int64), GRID_SIZE - 1) * GRID_SIZE
+             + np.minimum((cx * GRID_SIZE).astype(np.int64), GRID_SIZE - 1))
+    buckets = class_column * GRID_SIZE * GRID_SIZE + cells
+    order = np.argsort(buckets, kind="stable")
+    indptr = np.zeros(len(all_classes) * GRID_SIZE * GRID_SIZE + 1, dtype=np.int64)
+    np.cumsum(np.bincount(buckets, minlength=len(indptr) - 1), out=indptr[1:])
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    np.savez_compressed(output_file, classes=np.array(all_classes), keyframes=keyframes[order],
+                        boxes=boxes[order], indptr=indptr, size=size)
+
+    message = f"Đã xây dựng box index với {len(keyframes)} box trên {size} keyframes tại {output_file}"
+    if unresolved:
+        message += f" ({unresolved} keyframe không có trong mapping)"
+    return {"status": "success", "message": message}
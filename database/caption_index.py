@@ -0,0 +1,180 @@
+import os
+import json
+import faiss
+import numpy as np
+from app.rerank import rrf, get_prefetch_limit
+from app.config import MAPPING_JSON, CAPTION_ENCODER_MODEL, CAPTION_QUERY_CACHE_SIZE, CAPTION_QUERY_OUTPUTS
+
+
+class CaptionIndex:
+    """
+    In-process caption index: BGE-M3 dense vectors in a FAISS inner-product
+    index and lexical weights in a term -> captions inverted index stored as
+    CSR arrays. Exposes the same `search` interface as `Qdrant`, so it can
+    replace the Qdrant server for caption search.
+
+    Files in index_dir:
+        dense.index   FAISS IndexFlatIP over normalized dense vectors
+        sparse.npz    indptr (terms + 1), docs and weights of the inverted index
+        ids.npy       Point id (id2path key) of every caption, in index order
+        keyframes.npy Keyframe name of every caption, checked against MAPPING_JSON on load
+    """
+
+    def __init__(self, index_dir, model=None):
+        self.index_dir = index_dir
+        self._model = model
+        self.id2path = self.load_mapping(MAPPING_JSON)
+
+        self.dense_index = faiss.read_index(os.path.join(index_dir, "dense.index"))
+        sparse = np.load(os.path.join(index_dir, "sparse.npz"))
+        self.indptr = sparse["indptr"]
+        self.docs = sparse["docs"]
+        self.weights = sparse["weights"]
+        self.ids = np.load(os.path.join(index_dir, "ids.npy"))
+        keyframes_file = os.path.join(index_dir, "keyframes.npy")
+        if not os.path.exists(keyframes_file):
+            raise FileNotFoundError(f"{keyframes_file} is missing; rebuild the caption index with build_caption_index")
+        self.check_mapping(np.load(keyframes_file))
+
+    @property
+    def model(self):
+        """Shared BGE-M3 encoder, loaded on first use"""
+        if self._model is None:
+            from models.bge_m3 import BGEM3Encoder
+            self._model = BGEM3Encoder(CAPTION_ENCODER_MODEL, use_fp16=True, cache_size=CAPTION_QUERY_CACHE_SIZE)
+        return self._model
+
+    def load_mapping(self, mapping_json):
+        """Load id2path mapping from JSON file"""
+        with open(mapping_json, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        items = data.get("items", [])
+        return {item["id"]: item["path"] for item in items}
+
+    def check_mapping(self, keyframes):
+        """Fail when the point ids of the index do not name the same keyframes in the loaded mapping."""
+        mismatched = [int(idx) for idx, keyframe in zip(self.ids.tolist(), keyframes.tolist())
+                      if os.path.basename(self.id2path.get(int(idx), "")) != keyframe]
+        if mismatched:
+            raise ValueError(f"Caption index {self.index_dir} was built against a different mapping than "
+                             f"{MAPPING_JSON} ({len(mismatched)} point ids differ, e.g. {mismatched[:5]}); "
+                             f"rebuild it with build_caption_index")
+
+    def dense_search(self, dense_vector, limit, allowed_rows=None):
+        """Top captions by dense inner product, optionally only among allowed_rows. Returns (rows, scores)."""
+        params = None
+        if allowed_rows is not None:
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(len(allowed_rows), faiss.swig_ptr(allowed_rows)))
+            limit = min(limit, len(allowed_rows))
+        scores, rows = self.dense_index.search(dense_vector.reshape(1, -1).astype(np.float32), limit, params=params)
+        keep = rows[0] >= 0
+        return rows[0][keep], scores[0][keep]
+
+    def sparse_search(self, sparse_vector, limit, allowed_rows=None):
+        """Top captions by lexical dot product, optionally only among allowed_rows. Returns (rows, scores)."""
+        indices, values = sparse_vector
+        # Terms never seen at build time have no postings
+        known = indices < len(self.indptr) - 1
+        indices, values = indices[known], values[known]
+        if len(indices) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Gather the posting lists of all query terms and accumulate in one pass
+        starts = self.indptr[indices]
+        lengths = self.indptr[indices + 1] - starts
+        offsets = lengths.cumsum() - lengths
+        positions = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+        scores = np.bincount(self.docs[positions],
+                             weights=self.weights[positions] * np.repeat(values, lengths),
+                             minlength=len(self.ids))
+
+        candidates = np.flatnonzero(scores)
+        if allowed_rows is not None:
+            candidates = np.intersect1d(candidates, allowed_rows, assume_unique=True)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return candidates, scores[candidates].astype(np.float32)
+
+    def search(self, search_query, collection_name=None, limit=100, prefetch_limit=None, mode="rrf", allowed_ids=None):
+        """
+        Search captions.
+
+        Args:
+            search_query (str): Query text
+            collection_name (str): Unused, kept for interface compatibility with Qdrant
+            limit (int): Number of results
+            prefetch_limit (int): Candidates per retriever before fusion, adaptive when None
+            mode (str): 'dense', 'sparse' or 'rrf' (fusion of both); 'colbert' is not
+                        stored in this index and falls back to 'rrf'
+            allowed_ids (iterable): Only return these point ids; None searches everything
+
+        Returns:
+            tuple: (scores, indices, paths)
+        """
+        if mode not in ("dense", "sparse", "rrf", "colbert"):
+            raise ValueError(f"Unknown caption search mode: {mode}")
+
+        allowed_rows = None
+        if allowed_ids is not None:
+            allowed_rows = np.flatnonzero(np.isin(self.ids, np.asarray(list(allowed_ids), dtype=np.int64)))
+            if len(allowed_rows) == 0:
+                return [], [], []
+
+        # 'colbert' falls back to 'rrf', which needs no ColBERT vectors
+        outputs = CAPTION_QUERY_OUTPUTS["rrf" if mode == "colbert" else mode]
+        query_outputs = self.model.encode_query(search_query, outputs)
+
+        if mode == "dense":
+            rows, scores = self.dense_search(query_outputs["dense"], limit, allowed_rows)
+            scores = scores.tolist()
+        elif mode == "sparse":
+            rows, scores = self.sparse_search(query_outputs["sparse"], limit, allowed_rows)
+            scores = scores.tolist()
+        else:
+            if prefetch_limit is None:
+                prefetch_limit = get_prefetch_limit(limit, "rrf")
+            dense_rows, _ = self.dense_search(query_outputs["dense"], prefetch_limit, allowed_rows)
+            sparse_rows, _ = self.sparse_search(query_outputs["sparse"], prefetch_limit, allowed_rows)
+            rows, scores = rrf({"dense": dense_rows.tolist(), "sparse": sparse_rows.tolist()}, k_rrf=60)
+            rows, scores = np.asarray(rows[:limit], dtype=np.int64), scores[:limit]
+
+        indices = self.ids[rows].tolist()
+        paths = [self.id2path[int(idx)] for idx in indices]
+
+        return scores, indices, paths
+
+
+def build_caption_index(dense_vectors, sparse_vectors, point_ids, keyframes, index_dir):
+    """
+    Write a CaptionIndex to index_dir.
+
+    Args:
+        dense_vectors (np.ndarray): (captions, dim) normalized dense vectors
+        sparse_vectors (list): (indices, values) arrays per caption
+        point_ids (list): Point id of every caption
+        keyframes (list): Keyframe name of every caption
+        index_dir (str): Output directory
+    """
+    os.makedirs(index_dir, exist_ok=True)
+
+    dense_vectors = np.ascontiguousarray(dense_vectors, dtype=np.float32)
+    dense_index = faiss.IndexFlatIP(dense_vectors.shape[1])
+    dense_index.add(dense_vectors)
+    faiss.write_index(dense_index, os.path.join(index_dir, "dense.index"))
+
+    # Build the inverted index: postings sorted by term, then caption
+    lengths = np.array([len(indices) for indices, _ in sparse_vectors], dtype=np.int64)
+    terms = np.concatenate([indices for indices, _ in sparse_vectors]) if lengths.sum() else np.empty(0, dtype=np.int64)
+    weights = np.concatenate([values for _, values in sparse_vectors]) if lengths.sum() else np.empty(0, dtype=np.float32)
+    docs = np.repeat(np.arange(len(sparse_vectors), dtype=np.int32), lengths)
+
+    order = np.lexsort((docs, terms))
+    terms, docs, weights = terms[order], docs[order], weights[order].astype(np.float32)
+    vocabulary_size = int(terms.max()) + 1 if len(terms) else 0
+    indptr = np.zeros(vocabulary_size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(terms, minlength=vocabulary_size), out=indptr[1:])
+
+    np.savez(os.path.join(index_dir, "sparse.npz"), indptr=indptr, docs=docs, weights=weights)
+    np.save(os.path.join(index_dir, "ids.npy"), np.asarray(point_ids, dtype=np.int64))
+    np.save(os.path.join(index_dir, "keyframes.npy"), np.asarray(keyframes, dtype=str))
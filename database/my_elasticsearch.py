@@ -1,9 +1,12 @@
 import os
 import json
-import sys
 import glob
+import time
+from contextlib import contextmanager
 from tqdm import tqdm
 from elasticsearch import Elasticsearch
+from elasticsearch.helpers import parallel_bulk, scan
+from app.config import OCR_INDEX, DETECTION_INDEX
 
 
 class MyElasticsearch:
@@ -64,7 +67,111 @@ class MyElasticsearch:
             return True
         return False
     
-    def create_detection_index(self, index_name="groundingdino"):
+    def get_index_versions(self, alias):
+        """
+        Liệt kê các phiên bản index của alias ({alias}_v{n})
+        
+        Args:
+            alias (str): Tên alias
+            
+        Returns:
+            list: Danh sách (version, index_name) sắp xếp tăng dần theo version
+        """
+        versions = []
+        prefix = f"{alias}_v"
+        for name in self.es.indices.get(index=f"{prefix}*"):
+            suffix = name[len(prefix):]
+            if suffix.isdigit():
+                versions.append((int(suffix), name))
+        return sorted(versions)
+    
+    def get_alias_indices(self, alias):
+        """
+        Lấy các index mà alias đang trỏ tới
+        
+        Args:
+            alias (str): Tên alias
+            
+        Returns:
+            list: Danh sách tên index
+        """
+        if not self.es.indices.exists_alias(name=alias):
+            return []
+        return list(self.es.indices.get_alias(name=alias).keys())
+    
+    def new_index_version(self, alias):
+        """
+        Tạo tên cho phiên bản index tiếp theo của alias
+        
+        Args:
+            alias (str): Tên alias
+            
+        Returns:
+            str: Tên index mới, ví dụ groundingdino_v3
+        """
+        versions = self.get_index_versions(alias)
+        next_version = versions[-1][0] + 1 if versions else 1
+        return f"{alias}_v{next_version}"
+    
+    def swap_alias(self, alias, index_name):
+        """
+        Chuyển alias sang index mới trong một thao tác nguyên tử. Index mà alias
+        đang trỏ tới được giữ lại để rollback, các phiên bản cũ hơn bị xóa.
+        Nếu đã có index thật trùng tên alias (dữ liệu cũ trước khi dùng alias),
+        index đó được xóa trong cùng thao tác
+        
+        Args:
+            alias (str): Tên alias
+            index_name (str): Index mới
+        """
+        previous = self.get_alias_indices(alias)
+        actions = [{"remove": {"index": name, "alias": alias}} for name in previous]
+        if self.index_exists(alias) and not self.es.indices.exists_alias(name=alias):
+            print(f"Chuyển index {alias} cũ sang dạng alias")
+            actions.append({"remove_index": {"index": alias}})
+        actions.append({"add": {"index": index_name, "alias": alias}})
+        
+        self.es.indices.update_aliases(body={"actions": actions})
+        print(f"Alias {alias} -> {index_name}")
+        
+        for _, name in self.get_index_versions(alias):
+            if name != index_name and name not in previous:
+                self.delete_index(name)
+    
+    def rollback_alias(self, alias):
+        """
+        Chuyển alias về phiên bản index liền trước phiên bản hiện tại
+        
+        Args:
+            alias (str): Tên alias
+            
+        Returns:
+            dict: Trạng thái của việc rollback
+        """
+        try:
+            if not self.es:
+                if not self.connect():
+                    return {"status": "error", "message": "Không thể kết nối đến Elasticsearch"}
+            
+            current = self.get_alias_indices(alias)
+            versions = self.get_index_versions(alias)
+            current_versions = [version for version, name in versions if name in current]
+            if not current_versions:
+                return {"status": "error", "message": f"Alias {alias} không trỏ tới phiên bản index nào"}
+            
+            previous = [name for version, name in versions if version < min(current_versions)]
+            if not previous:
+                return {"status": "error", "message": f"Không có phiên bản cũ nào của {alias} để rollback"}
+            
+            actions = [{"remove": {"index": name, "alias": alias}} for name in current]
+            actions.append({"add": {"index": previous[-1], "alias": alias}})
+            self.es.indices.update_aliases(body={"actions": actions})
+            return {"status": "success", "message": f"Đã rollback alias {alias} -> {previous[-1]}"}
+        
+        except Exception as e:
+            return {"status": "error", "message": f"Lỗi: {str(e)}"}
+    
+    def create_detection_index(self, index_name=DETECTION_INDEX):
         """
         Tạo index cho dữ liệu detection với mapping phù hợp
         
@@ -105,7 +212,7 @@ class MyElasticsearch:
         self.es.indices.create(index=index_name, body=mapping)
         print(f"Đã tạo index {index_name} với mapping cho detection")
     
-    def create_ocr_index(self, index_name="ocr_results"):
+    def create_ocr_index(self, index_name=OCR_INDEX):
         """
         Tạo index cho dữ liệu OCR với mapping phù hợp
         
@@ -117,6 +224,29 @@ class MyElasticsearch:
             self.delete_index(index_name)
         
         mapping = {
+            "settings": {
+                "analysis": {
+                    "filter": {
+                        "ocr_edge_ngram": {
+                            "type": "edge_ngram",
+                            "min_gram": 2,
+                            "max_gram": 15
+                        }
+                    },
+                    "analyzer": {
+                        # Lowercase and strip Vietnamese accents so "Hà Nội" matches "ha noi"
+                        "ocr_folded": {
+                            "tokenizer": "standard",
+                            "filter": ["lowercase", "asciifolding"]
+                        },
+                        # Index word prefixes so partial words match without wildcard queries
+                        "ocr_prefix": {
+                            "tokenizer": "standard",
+                            "filter": ["lowercase", "asciifolding", "ocr_edge_ngram"]
+                        }
+                    }
+                }
+            },
             "mappings": {
                 "properties": {
                     "video_name": {"type": "keyword"},
@@ -125,7 +255,17 @@ class MyElasticsearch:
                     "text_results": {
                         "type": "nested",
                         "properties": {
-                            "text": {"type": "text"},
+                            "text": {
+                                "type": "text",
+                                "analyzer": "ocr_folded",
+                                "fields": {
+                                    "prefix": {
+                                        "type": "text",
+                                        "analyzer": "ocr_prefix",
+                                        "search_analyzer": "ocr_folded"
+                                    }
+                                }
+                            },
                             "confidence": {"type": "float"},
                             "box": {
                                 "properties": {
@@ -182,6 +322,88 @@ class MyElasticsearch:
             print(f"Lỗi khi lưu document: {str(e)}")
             return None
     
+    @contextmanager
+    def bulk_load_settings(self, index_name):
+        """
+        Tắt refresh và replica của index trong lúc nạp dữ liệu hàng loạt,
+        sau đó khôi phục lại cấu hình cũ và refresh index
+        
+        Args:
+            index_name (str): Tên của index
+        """
+        settings = self.es.indices.get_settings(index=index_name)[index_name]["settings"]["index"]
+        previous = {
+            "refresh_interval": settings.get("refresh_interval", "1s"),
+            "number_of_replicas": settings.get("number_of_replicas", "1")
+        }
+        
+        self.es.indices.put_settings(index=index_name, body={"index": {"refresh_interval": "-1", "number_of_replicas": 0}})
+        try:
+            yield
+        finally:
+            self.es.indices.put_settings(index=index_name, body={"index": previous})
+            self.es.indices.refresh(index=index_name)
+    
+    def bulk_index(self, actions, chunk_size=500, thread_count=4, max_retries=5, initial_backoff=2):
+        """
+        Lưu documents theo lô bằng parallel_bulk. Các document bị từ chối do
+        quá tải (HTTP 429) được gửi lại với thời gian chờ tăng dần
+        
+        Args:
+            actions (iterable): Các action dạng {"_index", "_id", "_source"}
+            chunk_size (int): Số document trong mỗi request bulk
+            thread_count (int): Số luồng gửi request song song
+            max_retries (int): Số lần thử lại tối đa cho document bị từ chối
+            initial_backoff (float): Thời gian chờ (giây) trước lần thử lại đầu tiên
+            
+        Returns:
+            tuple: (indexed, failed) - Số document đã lưu và số document lỗi
+        """
+        indexed = 0
+        failed = 0
+        # Send documents in rounds so retries only need to keep one round in memory
+        round_size = chunk_size * thread_count * 4
+        
+        batch = []
+        for action in actions:
+            batch.append(action)
+            if len(batch) >= round_size:
+                ok, errors = self._bulk_round(batch, chunk_size, thread_count, max_retries, initial_backoff)
+                indexed, failed = indexed + ok, failed + errors
+                batch = []
+        
+        if batch:
+            ok, errors = self._bulk_round(batch, chunk_size, thread_count, max_retries, initial_backoff)
+            indexed, failed = indexed + ok, failed + errors
+        
+        return indexed, failed
+    
+    def _bulk_round(self, actions, chunk_size, thread_count, max_retries, initial_backoff):
+        pending = {action["_id"]: action for action in actions}
+        indexed = 0
+        failed = 0
+        
+        for attempt in range(max_retries + 1):
+            rejected = {}
+            for ok, item in parallel_bulk(self.es, pending.values(), chunk_size=chunk_size, thread_count=thread_count,
+                                          raise_on_error=False, raise_on_exception=False):
+                result = next(iter(item.values()))
+                if ok:
+                    indexed += 1
+                elif result.get("status") == 429 and attempt < max_retries:
+                    rejected[result["_id"]] = pending[result["_id"]]
+                else:
+                    failed += 1
+                    print(f"Lỗi khi lưu document {result.get('_id')}: {result.get('error')}")
+            
+            if not rejected:
+                break
+            
+            time.sleep(initial_backoff * (2 ** attempt))
+            pending = rejected
+        
+        return indexed, failed
+    
     def format_detection_data(self, video_name, keyframe, caption, objects):
         """
         Format dữ liệu detection để lưu vào Elasticsearch
@@ -287,13 +509,148 @@ class MyElasticsearch:
         doc_id = f"{video_name}_{keyframe}"
         return doc_id, doc
     
-    def index_detection_results(self, detection_dir, index_name="groundingdino"):
+    def iter_detection_actions(self, json_files, index_name):
+        """
+        Đọc các file kết quả detection và tạo action cho bulk API
+        
+        Args:
+            json_files (list): Danh sách file *_detection.json
+            index_name (str): Tên của index
+            
+        Yields:
+            dict: Action {"_index", "_id", "_source"}
+        """
+        for json_file in tqdm(json_files, desc="Đang lưu vào Elasticsearch"):
+            try:
+                with open(json_file, "r", encoding="utf-8") as f:
+                    detections = json.load(f)
+            except Exception as e:
+                print(f"Lỗi khi xử lý file {json_file}: {str(e)}")
+                continue
+            
+            video_name = os.path.basename(json_file).replace("_detection.json", "")
+            for entry in detections:
+                keyframe = entry.get("keyframe", "")
+                caption = entry.get("caption", "")
+                objects = entry.get("objects", [])
+                
+                doc_id, doc = self.format_detection_data(video_name, keyframe, caption, objects)
+                yield {"_index": index_name, "_id": doc_id, "_source": doc}
+    
+    def iter_ocr_actions(self, json_files, index_name):
+        """
+        Đọc các file kết quả OCR và tạo action cho bulk API
+        
+        Args:
+            json_files (list): Danh sách file *_ocr.json
+            index_name (str): Tên của index
+            
+        Yields:
+            dict: Action {"_index", "_id", "_source"}
+        """
+        for json_file in tqdm(json_files, desc="Đang lưu vào Elasticsearch"):
+            try:
+                with open(json_file, "r", encoding="utf-8") as f:
+                    ocr_results = json.load(f)
+            except Exception as e:
+                print(f"Lỗi khi xử lý file {json_file}: {str(e)}")
+                continue
+            
+            video_name = os.path.basename(json_file).replace("_ocr.json", "")
+            for entry in ocr_results:
+                keyframe = entry.get("image", "")
+                text_results = entry.get("results", [])
+                
+                doc_id, doc = self.format_ocr_data(video_name, keyframe, text_results)
+                yield {"_index": index_name, "_id": doc_id, "_source": doc}
+    
+    def bulk_load(self, index_name, actions, chunk_size=500, thread_count=4, max_failed=0):
+        """
+        Nạp hàng loạt documents vào index và báo cáo tốc độ
+        
+        Args:
+            index_name (str): Tên của index
+            actions (iterable): Các action cho bulk API
+            chunk_size (int): Số document trong mỗi request bulk
+            thread_count (int): Số luồng gửi request song song
+            max_failed (int): Số document lỗi tối đa để vẫn coi là nạp thành công
+            
+        Returns:
+            dict: Trạng thái của việc lưu kết quả
+        """
+        start_time = time.perf_counter()
+        with self.bulk_load_settings(index_name):
+            total_indexed, total_failed = self.bulk_index(actions, chunk_size, thread_count)
+        elapsed = time.perf_counter() - start_time
+        
+        if total_indexed == 0:
+            return {"status": "error", "message": "Không có dữ liệu nào được lưu vào Elasticsearch"}
+        if total_failed > max_failed:
+            return {"status": "error", "message": f"Nạp chưa hoàn tất: {total_failed} document lỗi "
+                                                  f"(tối đa {max_failed}), {total_indexed} document đã lưu"}
+        
+        return {"status": "success", "message": f"Đã lưu thành công {total_indexed} keyframes vào Elasticsearch "
+                                                f"({total_failed} lỗi, {total_indexed / max(elapsed, 1e-9):.1f} docs/s)"}
+    
+    def publish_index_version(self, alias, index_name, result):
+        """
+        Chuyển alias sang index vừa nạp nếu nạp hoàn tất, ngược lại xóa index đó
+        và giữ nguyên alias
+        
+        Args:
+            alias (str): Tên alias
+            index_name (str): Index vừa nạp
+            result (dict): Kết quả của bulk_load
+            
+        Returns:
+            dict: Kết quả sau khi cập nhật alias
+        """
+        if result["status"] != "success":
+            self.delete_index(index_name)
+            return {"status": "error", "message": f"{result['message']}; alias {alias} không thay đổi"}
+        
+        self.swap_alias(alias, index_name)
+        return {"status": "success", "message": f"{result['message']}, alias {alias} -> {index_name}"}
+    
+    def load_index_version(self, alias, create_index, actions_of, chunk_size=500, thread_count=4, max_failed=0):
+        """
+        Tạo phiên bản index mới, nạp dữ liệu và chuyển alias. Nếu có lỗi trong
+        lúc tạo hoặc nạp, phiên bản mới bị xóa để không để lại index mồ côi.
+        
+        Args:
+            alias (str): Tên alias
+            create_index (callable): Hàm tạo index với mapping, nhận tên index
+            actions_of (callable): Hàm tạo các action cho bulk API, nhận tên index
+            chunk_size (int): Số document trong mỗi request bulk
+            thread_count (int): Số luồng gửi request song song
+            max_failed (int): Số document lỗi tối đa để vẫn chuyển alias
+            
+        Returns:
+            dict: Trạng thái của việc lưu kết quả
+        """
+        # Load into a new version; the alias keeps serving the current one until the swap
+        versioned_index = self.new_index_version(alias)
+        try:
+            create_index(versioned_index)
+            result = self.bulk_load(versioned_index, actions_of(versioned_index), chunk_size, thread_count, max_failed)
+            return self.publish_index_version(alias, versioned_index, result)
+        except Exception as e:
+            try:
+                self.delete_index(versioned_index)
+            except Exception as cleanup_error:
+                print(f"Không thể xóa index {versioned_index}: {str(cleanup_error)}")
+            return {"status": "error", "message": f"Lỗi khi nạp {versioned_index}: {str(e)}; alias {alias} không thay đổi"}
+    
+    def index_detection_results(self, detection_dir, index_name=DETECTION_INDEX, chunk_size=500, thread_count=4, max_failed=0):
         """
         Lưu kết quả detection vào Elasticsearch
         
         Args:
             detection_dir (str): Đường dẫn đến thư mục chứa kết quả detection
             index_name (str): Tên của index
+            chunk_size (int): Số document trong mỗi request bulk
+            thread_count (int): Số luồng gửi request song song
+            max_failed (int): Số document lỗi tối đa để vẫn chuyển alias
             
         Returns:
             dict: Trạng thái của việc lưu kết quả
@@ -303,8 +660,6 @@ class MyElasticsearch:
                 if not self.connect():
                     return {"status": "error", "message": "Không thể kết nối đến Elasticsearch"}
             
-            self.create_detection_index(index_name)
-            
             if not os.path.exists(detection_dir):
                 return {"status": "error", "message": f"Thư mục không tồn tại: {detection_dir}"}
             
@@ -314,45 +669,23 @@ class MyElasticsearch:
             if len(json_files) == 0:
                 return {"status": "error", "message": f"Không tìm thấy file JSON nào trong {detection_dir}"}
             
-            total_indexed = 0
-            
-            for json_file in tqdm(json_files, desc="Đang lưu vào Elasticsearch"):
-                try:
-                    print(f"Đang xử lý file: {json_file}")
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        detections = json.load(f)
-                    
-                    video_file = os.path.basename(json_file)
-                    video_name = video_file.replace("_detection.json", "")
-                    print(f"Tên file: {video_file}, video_name sau xử lý: {video_name}")
-                    
-                    for entry in detections:
-                        keyframe = entry.get("keyframe", "")
-                        caption = entry.get("caption", "")
-                        objects = entry.get("objects", [])
-                        
-                        doc_id, doc = self.format_detection_data(video_name, keyframe, caption, objects)
-                        self.index_document(index_name, doc_id, doc)
-                        total_indexed += 1
-                        
-                except Exception as e:
-                    print(f"Lỗi khi xử lý file {json_file}: {str(e)}")
-            
-            if total_indexed > 0:
-                return {"status": "success", "message": f"Đã lưu thành công {total_indexed} keyframes vào Elasticsearch"}
-            else:
-                return {"status": "error", "message": "Không có dữ liệu nào được lưu vào Elasticsearch"}
+            return self.load_index_version(index_name, self.create_detection_index,
+                                           lambda versioned_index: self.iter_detection_actions(json_files, versioned_index),
+                                           chunk_size, thread_count, max_failed)
         
         except Exception as e:
             return {"status": "error", "message": f"Lỗi: {str(e)}"}
     
-    def index_ocr_results(self, ocr_dir, index_name="ocr_results"):
+    def index_ocr_results(self, ocr_dir, index_name=OCR_INDEX, chunk_size=500, thread_count=4, max_failed=0):
         """
         Lưu kết quả OCR vào Elasticsearch
         
         Args:
             ocr_dir (str): Đường dẫn đến thư mục chứa kết quả OCR
             index_name (str): Tên của index
+            chunk_size (int): Số document trong mỗi request bulk
+            thread_count (int): Số luồng gửi request song song
+            max_failed (int): Số document lỗi tối đa để vẫn chuyển alias
             
         Returns:
             dict: Trạng thái của việc lưu kết quả
@@ -362,8 +695,6 @@ class MyElasticsearch:
                 if not self.connect():
                     return {"status": "error", "message": "Không thể kết nối đến Elasticsearch"}
             
-            self.create_ocr_index(index_name)
-            
             if not os.path.exists(ocr_dir):
                 return {"status": "error", "message": f"Thư mục không tồn tại: {ocr_dir}"}
             
@@ -373,33 +704,9 @@ class MyElasticsearch:
             if len(json_files) == 0:
                 return {"status": "error", "message": f"Không tìm thấy file JSON nào trong {ocr_dir}"}
             
-            total_indexed = 0
-            
-            for json_file in tqdm(json_files, desc="Đang lưu vào Elasticsearch"):
-                try:
-                    print(f"Đang xử lý file: {json_file}")
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        ocr_results = json.load(f)
-                    
-                    video_file = os.path.basename(json_file)
-                    video_name = video_file.replace("_ocr.json", "")
-                    print(f"Tên file: {video_file}, video_name sau xử lý: {video_name}")
-                    
-                    for entry in ocr_results:
-                        keyframe = entry.get("image", "")
-                        text_results = entry.get("results", [])
-                        
-                        doc_id, doc = self.format_ocr_data(video_name, keyframe, text_results)
-                        self.index_document(index_name, doc_id, doc)
-                        total_indexed += 1
-                        
-                except Exception as e:
-                    print(f"Lỗi khi xử lý file {json_file}: {str(e)}")
-            
-            if total_indexed > 0:
-                return {"status": "success", "message": f"Đã lưu thành công {total_indexed} keyframes vào Elasticsearch"}
-            else:
-                return {"status": "error", "message": "Không có dữ liệu nào được lưu vào Elasticsearch"}
+            return self.load_index_version(index_name, self.create_ocr_index,
+                                           lambda versioned_index: self.iter_ocr_actions(json_files, versioned_index),
+                                           chunk_size, thread_count, max_failed)
         
         except Exception as e:
             return {"status": "error", "message": f"Lỗi: {str(e)}"}
@@ -461,7 +768,7 @@ class MyElasticsearch:
             print(f"Lỗi khi tìm kiếm: {str(e)}")
             return []
     
-    def search_nested_objects(self, object_name, index_name="groundingdino", size=10):
+    def search_nested_objects(self, object_name, index_name=DETECTION_INDEX, size=10):
         """
         Tìm kiếm theo tên đối tượng trong các object được phát hiện
         
@@ -494,9 +801,40 @@ class MyElasticsearch:
             print(f"Lỗi khi tìm kiếm: {str(e)}")
             return []
     
-    def search_nested_text(self, text, index_name="ocr_results", size=10):
+    def get_keyframes_with_objects(self, objects, index_name=DETECTION_INDEX):
         """
-        Tìm kiếm theo text trong kết quả OCR
+        Lấy tất cả keyframe có chứa mọi đối tượng trong danh sách
+        
+        Args:
+            objects (list): Danh sách tên đối tượng
+            index_name (str): Tên của index
+            
+        Returns:
+            list: Danh sách tên keyframe
+        """
+        try:
+            search_query = {
+                "_source": ["keyframe"],
+                "query": {
+                    "bool": {
+                        "filter": [
+                            {"nested": {"path": "objects", "query": {"term": {"objects.object": object_name}}}}
+                            for object_name in objects
+                        ]
+                    }
+                }
+            }
+            
+            return [hit["_source"]["keyframe"] for hit in scan(self.es, query=search_query, index=index_name, size=5000)]
+        except Exception as e:
+            print(f"Lỗi khi tìm kiếm: {str(e)}")
+            return []
+    
+    def search_nested_text(self, text, index_name=OCR_INDEX, size=10):
+        """
+        Tìm kiếm theo text trong kết quả OCR. Mỗi keyframe được chấm điểm theo
+        dòng text khớp nhất (score_mode max); khớp nguyên từ được ưu tiên hơn
+        khớp tiền tố (edge n-gram)
         
         Args:
             text (str): Text cần tìm
@@ -504,18 +842,28 @@ class MyElasticsearch:
             size (int): Số lượng kết quả tối đa
             
         Returns:
-            list: Danh sách các kết quả tìm kiếm
+            list: Danh sách các kết quả tìm kiếm, mỗi kết quả có inner_hits
+                  là các dòng text khớp
         """
         try:
             search_query = {
                 "size": size,
+                "_source": ["video_name", "keyframe", "keyframe_path"],
                 "query": {
                     "nested": {
                         "path": "text_results",
+                        "score_mode": "max",
                         "query": {
-                            "match": {
-                                "text_results.text": text
+                            "bool": {
+                                "should": [
+                                    {"match": {"text_results.text": {"query": text, "boost": 2}}},
+                                    {"match": {"text_results.text.prefix": {"query": text}}}
+                                ]
                             }
+                        },
+                        "inner_hits": {
+                            "size": 3,
+                            "_source": ["text_results.text", "text_results.confidence"]
                         }
                     }
                 }
@@ -526,16 +874,3 @@ class MyElasticsearch:
         except Exception as e:
             print(f"Lỗi khi tìm kiếm: {str(e)}")
             return []
-
-
-def ensure_elasticsearch_dependencies():
-    """
-    Đảm bảo thư viện elasticsearch đã được cài đặt
-    """
-    try:
-        import elasticsearch
-    except ImportError:
-        print("Thư viện elasticsearch chưa được cài đặt. Đang cài đặt...")
-        import subprocess
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "elasticsearch"])
-        print("Đã cài đặt elasticsearch")
@@ -46,7 +46,35 @@ class Faiss:
         faiss.write_index(idx, embeddings_path)
 
     
-    def text_search(self, query, top_k=5, return_scores=True):
+    def search_embedding(self, query_embedding, top_k=5, allowed_ids=None):
+        """
+        Search the index, optionally restricted to a set of ids.
+        
+        Args:
+            query_embedding (np.ndarray): Query vector of shape (1, dim)
+            top_k (int): Number of results
+            allowed_ids (iterable): Only return these ids; None searches everything
+        
+        Returns:
+            tuple: (scores, indices) of the valid results
+        """
+        params = None
+        if allowed_ids is not None:
+            allowed_ids = np.asarray(allowed_ids, dtype=np.int64)
+            if len(allowed_ids) == 0:
+                return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+            
+            # The selector keeps a pointer to allowed_ids, which stays alive until the search returns
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(len(allowed_ids), faiss.swig_ptr(allowed_ids)))
+            top_k = min(top_k, len(allowed_ids))
+        
+        scores, indices = self.embeddings.search(query_embedding, top_k, params=params)
+        
+        # Fewer matches than top_k are padded with -1
+        valid = indices[0] >= 0
+        return scores[0][valid], indices[0][valid]
+    
+    def text_search(self, query, top_k=5, return_scores=True, allowed_ids=None):
         # Encode the query
         query_embedding = self.model.encode_text(query)
         
@@ -54,17 +82,17 @@ class Faiss:
         query_embedding = query_embedding.reshape(1, -1).astype(np.float32)
         
         # Search the index
-        scores, indices = self.embeddings.search(query_embedding, top_k)
+        scores, indices = self.search_embedding(query_embedding, top_k, allowed_ids)
         
         # Get the image paths for the results
-        paths = [self.id2path[int(idx)] for idx in indices[0]]
+        paths = [self.id2path[int(idx)] for idx in indices]
         
         if return_scores:
-            return scores[0].tolist(), indices[0].tolist(), paths
+            return scores.tolist(), indices.tolist(), paths
         else:
             return paths
     
-    def image_search(self, query_image, top_k=5, return_scores=True):   
+    def image_search(self, query_image, top_k=5, return_scores=True, allowed_ids=None):   
         # Load the image if a path was provided
         if isinstance(query_image, str):
             query_image = Image.open(query_image).convert('RGB')
@@ -76,12 +104,12 @@ class Faiss:
         query_embedding = query_embedding.reshape(1, -1).astype(np.float32)
         
         # Search the index
-        scores, indices = self.embeddings.search(query_embedding, top_k)
+        scores, indices = self.search_embedding(query_embedding, top_k, allowed_ids)
         
         # Get the image paths for the results
-        paths = [self.id2path[int(idx)] for idx in indices[0]]
+        paths = [self.id2path[int(idx)] for idx in indices]
         
         if return_scores:
-            return scores[0].tolist(), indices[0].tolist(), paths
+            return scores.tolist(), indices.tolist(), paths
         else:
             return paths
\ No newline at end of file
@@ -1,15 +1,77 @@
 from qdrant_client import QdrantClient, models
-from FlagEmbedding import BGEM3FlagModel
 import json
 import os
-from app.config import MAPPING_JSON
+import numpy as np
+from app.rerank import get_prefetch_limit
+from app.config import (MAPPING_JSON, CAPTION_ENCODER_MODEL, CAPTION_QUERY_CACHE_SIZE, CAPTION_QUERY_OUTPUTS,
+                        QDRANT_FILTER_MAX_IDS)
+
+
+def pool_colbert_vectors(colbert_vectors, pool_size, iterations=10):
+    """
+    Compress the ColBERT token vectors of one text to at most pool_size
+    vectors with spherical k-means (centroids initialized on evenly spaced
+    tokens, so the result is deterministic).
+    
+    Args:
+        colbert_vectors (np.ndarray): Token vectors of shape (tokens, dim)
+        pool_size (int): Number of vectors to keep
+        iterations (int): k-means iterations
+    
+    Returns:
+        np.ndarray: Pooled vectors of shape (min(tokens, pool_size), dim)
+    """
+    vectors = np.asarray(colbert_vectors, dtype=np.float32)
+    if pool_size <= 0 or len(vectors) <= pool_size:
+        return vectors
+    
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    centroids = vectors[np.linspace(0, len(vectors) - 1, pool_size).round().astype(int)].copy()
+    
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=pool_size)
+        
+        # Keep the previous centroid for clusters that lost all their tokens
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    
+    return centroids
+
+
+def get_quantization_config(quantization):
+    """Build the Qdrant quantization config for 'int8', 'binary' or None"""
+    if quantization == "int8":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                always_ram=True
+            )
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    return None
+
 
 class Qdrant:
-    def __init__(self, host="localhost", port=6333, model=BGEM3FlagModel('BAAI/bge-m3', use_fp16=True)):
+    def __init__(self, host="localhost", port=6333, model=None):
         self.client = QdrantClient(host=host, port=port)
-        self.model = model
+        self._model = model
         self.id2path = self.load_mapping(MAPPING_JSON)
         
+    @property
+    def model(self):
+        """Shared BGE-M3 encoder, loaded on first use"""
+        if self._model is None:
+            from models.bge_m3 import BGEM3Encoder
+            self._model = BGEM3Encoder(CAPTION_ENCODER_MODEL, use_fp16=True, cache_size=CAPTION_QUERY_CACHE_SIZE)
+        return self._model
+        
     def load_mapping(self, mapping_json):
         """Load id2path mapping from JSON file"""
         with open(mapping_json, 'r', encoding='utf-8') as f:
@@ -25,37 +87,34 @@ class Qdrant:
         return self.client.collection_exists(collection_name)
         
     def create_sparse_vector(self, sparse_data):
-        """Convert BGE-M3 sparse output to Qdrant sparse vector format"""
-        sparse_indices = []
-        sparse_values = []
-        
-        for key, value in sparse_data.items():
-            # Only process positive values
-            if float(value) > 0:
-                # Handle string keys
-                if isinstance(key, str):
-                    if key.isdigit():
-                        key = int(key)
-                    else:
-                        continue
-                    
-                sparse_indices.append(key)
-                sparse_values.append(float(value))
+        """Convert BGE-M3 sparse output ((indices, values) arrays or lexical weights dict) to Qdrant format"""
+        if isinstance(sparse_data, dict):
+            from models.bge_m3 import lexical_weights_to_arrays
+            sparse_data = lexical_weights_to_arrays(sparse_data)
         
+        sparse_indices, sparse_values = sparse_data
         return models.SparseVector(
-            indices=sparse_indices,
-            values=sparse_values
+            indices=sparse_indices.tolist(),
+            values=sparse_values.tolist()
         )
         
     def generate_embeddings(self, text):
-        return self.model.encode(
-            [text], 
-            return_dense=True,
-            return_sparse=True,
-            return_colbert_vecs=True
-        )
+        return self.model.encode([text])
+        
+    def generate_embeddings_batch(self, texts, batch_size=32):
+        """Encode many texts in one BGE-M3 call, batch_size texts per forward pass"""
+        return self.model.encode(texts, batch_size=batch_size)
+        
+    def create_qdrant_collection(self, collection_name, colbert_quantization=None, colbert_on_disk=False):
+        """
+        Create the captions collection.
         
-    def create_qdrant_collection(self, collection_name):
+        Args:
+            collection_name (str): Collection name
+            colbert_quantization (str): None, 'int8' or 'binary' quantization of the
+                                        ColBERT multivectors (originals are kept for rescoring)
+            colbert_on_disk (bool): Keep the original ColBERT multivectors on disk
+        """
         self.client.create_collection(
             collection_name=collection_name,
         vectors_config={
@@ -69,6 +128,8 @@ class Qdrant:
                 multivector_config=models.MultiVectorConfig(
                     comparator=models.MultiVectorComparator.MAX_SIM
                 ),
+                quantization_config=get_quantization_config(colbert_quantization),
+                on_disk=colbert_on_disk
             )
         },
         sparse_vectors_config={
@@ -80,76 +141,162 @@ class Qdrant:
         },
     )
     
+    def build_point(self, embedding):
+        """Build a Qdrant point from one caption embedding"""
+        return models.PointStruct(
+            id=embedding["point_id"],
+            payload={
+                "keyframe": embedding["keyframe"],
+                "caption": embedding["caption"]
+            },
+            vector={
+                "dense": embedding["dense_vector"],
+                "colbert": embedding["colbert_vectors"],
+                # Convert sparse weights to Qdrant format
+                "sparse": self.create_sparse_vector(embedding["sparse_weights"])
+            }
+        )
+    
     def insert_to_qdrant(self, embeddings, collection_name):
-        for embedding in embeddings:
-            point_id = embedding["point_id"]
-            keyframe = embedding["keyframe"]
-            caption = embedding["caption"]
-            dense_vector = embedding["dense_vector"]
-            colbert_vectors = embedding["colbert_vectors"]
-            sparse_data = embedding["sparse_weights"]
-
-            # Convert sparse weights to Qdrant format
-            qdrant_sparse = self.create_sparse_vector(sparse_data)
-            
-            # Insert into Qdrant
-            self.client.upsert(
-                collection_name=collection_name,
-                points=[
-                    models.PointStruct(
-                        id=point_id,
-                        payload={
-                            "keyframe": keyframe,
-                            "caption": caption
-                        },
-                        vector={
-                            "dense": dense_vector,
-                            "colbert": colbert_vectors,
-                            "sparse": qdrant_sparse
-                        }
-                    )
-                ]
-            )
+        # Insert all points in a single request
+        self.client.upsert(
+            collection_name=collection_name,
+            points=[self.build_point(embedding) for embedding in embeddings]
+        )
         
-    def search(self, search_query, collection_name, limit=100, prefetch_limit=300):
-        # Generate embeddings for the query
-        query_outputs = self.model.encode(
-            [search_query],
-            return_dense=True,
-            return_sparse=True,
-            return_colbert_vecs=True
+    def upload_points(self, points, collection_name, batch_size=256, parallel=1):
+        """
+        Upload an iterable of points in chunks of batch_size, using parallel
+        worker processes. The iterable is consumed lazily, so points can be
+        produced by a generator while earlier chunks are being sent.
+        """
+        self.client.upload_points(
+            collection_name=collection_name,
+            points=points,
+            batch_size=batch_size,
+            parallel=parallel,
+            max_retries=3,
+            wait=True
         )
         
-        dense_vec = query_outputs["dense_vecs"][0]
-        sparse_vec = query_outputs["lexical_weights"][0]
-        colbert_vec = query_outputs["colbert_vecs"][0]
-        
-        # Convert sparse vector to Qdrant format
-        qdrant_sparse = self.create_sparse_vector(sparse_vec)
-        
-        # Set up prefetch for hybrid search
-        prefetch = [
-            models.Prefetch(
-                query=qdrant_sparse,
-                using="sparse",
-                limit=prefetch_limit),
-            models.Prefetch(
-                query=dense_vec,
-                using="dense",
-                limit=prefetch_limit)
-        ]
-        
-        # Perform reranking with ColBERT
-        results = self.client.query_points(
+    def set_indexing_threshold(self, collection_name, indexing_threshold):
+        """
+        Update the HNSW indexing threshold of a collection (0 disables indexing).
+        
+        Returns:
+            int: Previous indexing threshold
+        """
+        info = self.client.get_collection(collection_name)
+        previous = info.config.optimizer_config.indexing_threshold
+        self.client.update_collection(
+            collection_name=collection_name,
+            optimizer_config=models.OptimizersConfigDiff(indexing_threshold=indexing_threshold)
+        )
+        return previous
+        
+    def search(self, search_query, collection_name, limit=100, prefetch_limit=None, mode="colbert", allowed_ids=None):
+        """
+        Search captions.
+        
+        Args:
+            search_query (str): Query text
+            collection_name (str): Collection name
+            limit (int): Number of results
+            prefetch_limit (int): Candidates per prefetch, adaptive when None
+            mode (str): 'dense' or 'sparse' (single vector search), 'rrf' (server-side
+                        RRF fusion of dense and sparse) or 'colbert' (dense + sparse
+                        prefetch reranked with ColBERT MAX_SIM)
+            allowed_ids (iterable): Only return these point ids; None searches everything.
+                                    Up to QDRANT_FILTER_MAX_IDS ids are sent to Qdrant as a
+                                    filter; larger sets filter an enlarged candidate list
+        
+        Returns:
+            tuple: (scores, indices, paths)
+        """
+        if mode not in ("dense", "sparse", "rrf", "colbert"):
+            raise ValueError(f"Unknown caption search mode: {mode}")
+        
+        # Only the outputs this mode needs, cached per query text
+        query_outputs = self.model.encode_query(search_query, CAPTION_QUERY_OUTPUTS[mode])
+        
+        if allowed_ids is None:
+            results = self.query(query_outputs, collection_name, limit, prefetch_limit, mode)
+        else:
+            allowed_ids = {int(idx) for idx in allowed_ids}
+            if not allowed_ids:
+                return [], [], []
+            
+            if len(allowed_ids) <= QDRANT_FILTER_MAX_IDS:
+                # Restrict every stage of the search to the allowed points
+                query_filter = models.Filter(must=[models.HasIdCondition(has_id=sorted(allowed_ids))])
+                results = self.query(query_outputs, collection_name, limit, prefetch_limit, mode, query_filter)
+            else:
+                results = self.query_post_filtered(query_outputs, collection_name, limit, prefetch_limit, mode,
+                                                   allowed_ids)
+        
+        indices = [point.id for point in results]
+        scores = [point.score for point in results]
+        paths = [self.id2path[int(idx)] for idx in indices]
+    
+        return scores, indices, paths
+    
+    def query_post_filtered(self, query_outputs, collection_name, limit, prefetch_limit, mode, allowed_ids):
+        """
+        Search without a server-side filter and keep the allowed points, for id
+        sets too large to send with every request. The candidate list starts at
+        the size expected to hold `limit` allowed points and doubles until it
+        does or covers the whole collection. Fused ('rrf', 'colbert') scores are
+        computed over unfiltered prefetches, so the order can differ slightly
+        from a filtered search.
+        """
+        total = max(len(self.id2path), 1)
+        candidate_limit = min(max(limit * total // len(allowed_ids), limit), total)
+        while True:
+            if prefetch_limit is not None:
+                prefetch = max(prefetch_limit, candidate_limit)
+            else:
+                prefetch = None
+            results = self.query(query_outputs, collection_name, candidate_limit, prefetch, mode)
+            kept = [point for point in results if point.id in allowed_ids]
+            if len(kept) >= limit or len(results) < candidate_limit or candidate_limit >= total:
+                return kept[:limit]
+            candidate_limit = min(candidate_limit * 2, total)
+    
+    def query(self, query_outputs, collection_name, limit, prefetch_limit, mode, query_filter=None):
+        """Run one caption query from the BGE-M3 outputs of the query text"""
+        if prefetch_limit is None:
+            prefetch_limit = get_prefetch_limit(limit, mode)
+        
+        if mode == "dense":
+            query, using, prefetch = query_outputs["dense"], "dense", None
+        elif mode == "sparse":
+            query, using, prefetch = self.create_sparse_vector(query_outputs["sparse"]), "sparse", None
+        else:
+            # Set up prefetch for hybrid search
+            prefetch = [
+                models.Prefetch(
+                    query=self.create_sparse_vector(query_outputs["sparse"]),
+                    using="sparse",
+                    filter=query_filter,
+                    limit=prefetch_limit),
+                models.Prefetch(
+                    query=query_outputs["dense"],
+                    using="dense",
+                    filter=query_filter,
+                    limit=prefetch_limit)
+            ]
+            if mode == "rrf":
+                query, using = models.FusionQuery(fusion=models.Fusion.RRF), None
+            else:
+                # Perform reranking with ColBERT
+                query, using = query_outputs["colbert"], "colbert"
+        
+        return self.client.query_points(
             collection_name,
             prefetch=prefetch,
-            query=colbert_vec,
-            using="colbert",
+            query=query,
+            using=using,
+            query_filter=query_filter,
             with_payload=True,
             limit=limit,
-        )["results"]["points"]
-        
-        indices, scores = zip(*[(point.id, point.score) for point in results])                   
-        paths = [self.id2path[int(idx)] for idx in indices]
-    
-        return scores, indices, paths
\ No newline at end of file
+        ).points
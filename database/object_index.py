@@ -0,0 +1,181 @@
+import os
+import re
+import glob
+import json
+import numpy as np
+from tqdm import tqdm
+
+# A filter term: optional "!", a class name and an optional count predicate, e.g. "person>=3"
+TERM_PATTERN = re.compile(r"^\s*(!|not\s+)?\s*([a-z][a-z ]*?)\s*(?:(>=|<=|>|<|=)\s*(\d+))?\s*$")
+
+
+def match_object_classes(label, classes):
+    """
+    Get the object classes mentioned in a free-text GroundingDINO label
+    ("a red car", "two dogs").
+
+    Args:
+        label (str): Detected phrase
+        classes (list): Object class names
+
+    Returns:
+        list: Matching class names
+    """
+    words = set(re.findall(r"[a-z]+", label.lower()))
+    # Accept simple plurals ("dogs", "people" is not handled)
+    words |= {word[:-1] for word in words if word.endswith("s")}
+    return [name for name in classes if name in words]
+
+
+class ObjectIndex:
+    """
+    In-memory index of detected objects over keyframe ids.
+
+    For every class it keeps a packed bitset (np.packbits, one bit per keyframe
+    id) of the keyframes containing it, plus a keyframe x class count matrix
+    for count predicates. Boolean filters evaluate with bitwise ops on the
+    packed arrays, without a network hop.
+
+    Filter grammar, one term per selected entry (terms are ANDed):
+        person          keyframes containing a person
+        !dog            keyframes without a dog
+        person>=3       count predicate (>=, <=, >, <, =)
+        car|bus         any of the alternatives
+    """
+
+    def __init__(self, index_file):
+        data = np.load(index_file)
+        self.classes = [str(name) for name in data["classes"]]
+        self.class_ids = {name: i for i, name in enumerate(self.classes)}
+        self.counts = data["counts"]
+        self.bitsets = data["bitsets"]
+        self.size = self.counts.shape[0]
+
+    def parse_term(self, term):
+        """Parse one alternative of a filter term. Returns (negate, class_id, operator, value)."""
+        match = TERM_PATTERN.match(term.lower())
+        if not match or match.group(2) not in self.class_ids:
+            raise ValueError(f"Invalid object filter: {term}")
+        negate, name, operator, value = match.groups()
+        return bool(negate), self.class_ids[name], operator, int(value) if value is not None else None
+
+    def invalid_terms(self, terms):
+        """Get the filter terms that cannot be parsed."""
+        invalid = []
+        for term in terms:
+            try:
+                for alternative in term.split("|"):
+                    self.parse_term(alternative)
+            except ValueError:
+                invalid.append(term)
+        return invalid
+
+    def term_bitset(self, term):
+        """Packed bitset of the keyframes matching one filter term."""
+        bitset = np.zeros_like(self.bitsets[0])
+        for alternative in term.split("|"):
+            negate, class_id, operator, value = self.parse_term(alternative)
+
+            if operator is None:
+                bits = self.bitsets[class_id]
+            else:
+                column = self.counts[:, class_id]
+                condition = {
+                    ">=": column >= value,
+                    "<=": column <= value,
+                    ">": column > value,
+                    "<": column < value,
+                    "=": column == value
+                }[operator]
+                bits = np.packbits(condition)
+
+            bitset |= ~bits if negate else bits
+        return bitset
+
+    def evaluate(self, terms):
+        """
+        Evaluate a list of filter terms (ANDed).
+
+        Returns:
+            np.ndarray: Packed bitset over keyframe ids
+        """
+        bitset = np.full_like(self.bitsets[0], 0xFF)
+        for term in terms:
+            bitset &= self.term_bitset(term)
+        return bitset
+
+    def filter_ids(self, terms):
+        """
+        Get the ids of the keyframes matching all filter terms.
+
+        Returns:
+            np.ndarray: Sorted keyframe ids
+        """
+        return np.flatnonzero(np.unpackbits(self.evaluate(terms), count=self.size))
+
+    def facets(self, ids):
+        """
+        Count, for every class, how many of the given keyframes contain it.
+
+        Args:
+            ids (array-like): Keyframe ids, e.g. the fused result set
+
+        Returns:
+            dict: Class name -> number of keyframes, only classes that occur
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        ids = ids[(ids >= 0) & (ids < self.size)]
+        counts = np.count_nonzero(self.counts[ids], axis=0)
+        return {self.classes[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+
+
+def build_object_index(detection_dir, mapping_json, classes, output_file, score_threshold=0.35):
+    """
+    Build the object index from the *_detection.json files of object_detection.
+
+    Args:
+        detection_dir (str): Directory searched recursively for *_detection.json
+        mapping_json (str): Keyframe mapping (id2path.json) defining keyframe ids
+        classes (list): Object class names
+        output_file (str): Output .npz file
+        score_threshold (float): Minimum detection score to count an object
+
+    Returns:
+        dict: Status and message
+    """
+    with open(mapping_json, 'r', encoding='utf-8') as f:
+        items = json.load(f).get("items", [])
+    keyframe_ids = {os.path.basename(item["path"]): item["id"] for item in items}
+    size = max(keyframe_ids.values()) + 1 if keyframe_ids else 0
+
+    counts = np.zeros((size, len(classes)), dtype=np.uint16)
+    json_files = glob.glob(os.path.join(detection_dir, "**", "*_detection.json"), recursive=True)
+    if not json_files:
+        return {"status": "error", "message": f"Không tìm thấy file detection nào trong {detection_dir}"}
+
+    unresolved = 0
+    for json_file in tqdm(json_files, desc="Đang xây dựng object index"):
+        with open(json_file, 'r', encoding='utf-8') as f:
+            detections = json.load(f)
+
+        for entry in detections:
+            keyframe_id = keyframe_ids.get(entry.get("keyframe", ""))
+            if keyframe_id is None:
+                unresolved += 1
+                continue
+
+            for obj in entry.get("objects", []):
+                if obj.get("score", 0) < score_threshold:
+                    continue
+                for name in match_object_classes(obj.get("object", ""), classes):
+                    counts[keyframe_id, classes.index(name)] += 1
+
+    bitsets = np.packbits(counts > 0, axis=0).T.copy()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    np.savez_compressed(output_file, classes=np.array(classes), counts=counts, bitsets=bitsets)
+
+    message = f"Đã xây dựng object index cho {size} keyframes, {len(classes)} lớp tại {output_file}"
+    if unresolved:
+        message += f" ({unresolved} keyframe không có trong mapping)"
+    return {"status": "success", "message": message}
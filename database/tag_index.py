@@ -0,0 +1,93 @@
+import os
+import faiss
+import numpy as np
+from tqdm import tqdm
+
+
+class TagIndex:
+    """
+    Zero-shot object and scene tags of every keyframe.
+
+    Scores are the SigLIP image-text match probability of each keyframe
+    embedding against a prompt-ensembled label embedding, stored as a
+    keyframe x label float16 matrix. A keyframe has a tag when its score
+    reaches the threshold.
+    """
+
+    def __init__(self, index_file):
+        data = np.load(index_file)
+        if "logit_scale" not in data or "logit_bias" not in data:
+            raise ValueError(f"{index_file} has no SigLIP logit scale/bias, its scores are not match "
+                             f"probabilities; rebuild it with build_tag_index and a SigLIP model")
+        self.logit_scale = float(data["logit_scale"])
+        self.logit_bias = float(data["logit_bias"])
+        self.labels = [str(label) for label in data["labels"]]
+        self.kinds = [str(kind) for kind in data["kinds"]]
+        self.label_ids = {label: i for i, label in enumerate(self.labels)}
+        self.scores = data["scores"]
+        self.size = self.scores.shape[0]
+
+    def labels_of_kind(self, kind):
+        """Get the labels of one kind ('object' or 'scene')."""
+        return [label for label, label_kind in zip(self.labels, self.kinds) if label_kind == kind]
+
+    def invalid_terms(self, terms):
+        """Get the terms that are not tag labels."""
+        return [term for term in terms if term not in self.label_ids]
+
+    def filter_ids(self, terms, threshold):
+        """
+        Get the ids of the keyframes tagged with all labels.
+
+        Returns:
+            np.ndarray: Sorted keyframe ids
+        """
+        columns = [self.label_ids[term] for term in terms]
+        return np.flatnonzero((self.scores[:, columns] >= threshold).all(axis=1))
+
+
+def build_tag_index(embeddings_file, model, objects, scenes, templates, output_file, chunk_size=65536):
+    """
+    Score every keyframe embedding of a FAISS index against the object and
+    scene labels.
+
+    Args:
+        embeddings_file (str): FAISS index written by save_embedding_faiss
+        model (OpenCLIP): The SigLIP model that produced the embeddings
+        objects (list): Object labels
+        scenes (list): Scene labels
+        templates (list): Prompt templates with one "{}" for the label
+        output_file (str): Output .npz file
+        chunk_size (int): Keyframe embeddings scored per matrix multiply
+
+    Returns:
+        dict: Status and message
+    """
+    # Tag scores are match probabilities, which need the SigLIP logit scale and bias
+    scale, bias = model.get_logit_scale_bias()
+    if bias is None:
+        return {"status": "error", "message": "Model không có logit bias (không phải SigLIP), không thể tính xác suất cho tag"}
+
+    index = faiss.read_index(embeddings_file)
+    if index.ntotal == 0:
+        return {"status": "error", "message": f"Không có embedding nào trong {embeddings_file}"}
+
+    labels = list(objects) + list(scenes)
+    kinds = ["object"] * len(objects) + ["scene"] * len(scenes)
+
+    # Prompt ensembling: average the normalized embeddings of all templates per label
+    prompts = [template.format(label) for label in labels for template in templates]
+    label_features = model.encode_texts(prompts).reshape(len(labels), len(templates), -1).mean(axis=1)
+    label_features /= np.linalg.norm(label_features, axis=1, keepdims=True)
+
+    scores = np.empty((index.ntotal, len(labels)), dtype=np.float16)
+    for start in tqdm(range(0, index.ntotal, chunk_size), desc="Đang gắn tag"):
+        count = min(chunk_size, index.ntotal - start)
+        similarities = index.reconstruct_n(start, count) @ label_features.T
+        scores[start:start + count] = 1 / (1 + np.exp(-(scale * similarities + bias)))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    np.savez_compressed(output_file, labels=np.array(labels), kinds=np.array(kinds), scores=scores,
+                        logit_scale=np.float32(scale), logit_bias=np.float32(bias))
+
+    return {"status": "success", "message": f"Đã gắn {len(labels)} tag cho {index.ntotal} keyframes tại {output_file}"}
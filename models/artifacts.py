@@ -0,0 +1,164 @@
+import os
+import json
+import hashlib
+import urllib.request
+
+# Directory holding model artifacts and their manifest; copy it as a whole to offline workers
+ARTIFACT_DIR = os.environ.get("MODEL_ARTIFACT_DIR", "weights")
+MANIFEST_FILE = "artifacts.json"
+
+# Known artifacts: file name in ARTIFACT_DIR, download source and the pinned
+# SHA-256 and size of the published file. Downloads and local copies must match the pin.
+ARTIFACTS = {
+    "groundingdino_swint_ogc": {
+        "filename": "groundingdino_swint_ogc.pth",
+        "url": "https://github.com/IDEA-Research/GroundingDINO/releases/download/v0.1.0-alpha/groundingdino_swint_ogc.pth",
+        "sha256": "3b3ca2563c77c69f651d7bd133e97139c186df06231157a64c507099c52bc799",
+        "size": 693997677
+    },
+    # Text encoder of Grounding DINO (bert-base-uncased at a fixed Hugging Face revision)
+    "bert_base_uncased_vocab": {
+        "filename": "bert-base-uncased/vocab.txt",
+        "url": "https://huggingface.co/google-bert/bert-base-uncased/resolve/86b5e0934494bd15c9632b12f734a8a67f723594/vocab.txt",
+        "sha256": "07eced375cec144d27c900241f3e339478dec958f92fddbc551f295c992038a3",
+        "size": 231508
+    },
+    "bert_base_uncased_weights": {
+        "filename": "bert-base-uncased/model.safetensors",
+        "url": "https://huggingface.co/google-bert/bert-base-uncased/resolve/86b5e0934494bd15c9632b12f734a8a67f723594/model.safetensors",
+        "sha256": "68d45e234eb4a928074dfd868cead0219ab85354cc53d20e772753c6bb9169d3",
+        "size": 440449768
+    }
+}
+
+
+def sha256sum(path, chunk_size=1 << 20):
+    """SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(artifact_dir=ARTIFACT_DIR):
+    """Recorded checksums, {name: {"filename", "sha256", "size", "mtime"}}"""
+    path = os.path.join(artifact_dir, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, artifact_dir=ARTIFACT_DIR):
+    os.makedirs(artifact_dir, exist_ok=True)
+    path = os.path.join(artifact_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def verify_pinned(name, path):
+    """
+    Check a file against the pinned size and SHA-256 of an artifact.
+
+    Returns:
+        str: SHA-256 of the file
+
+    Raises:
+        RuntimeError: The file does not match the pin
+    """
+    artifact = ARTIFACTS[name]
+    size = os.path.getsize(path)
+    if size != artifact["size"]:
+        raise RuntimeError(f"Size mismatch for {name} at {path}: expected {artifact['size']} bytes, got {size}")
+
+    checksum = sha256sum(path)
+    if checksum != artifact["sha256"]:
+        raise RuntimeError(f"Checksum mismatch for {name} at {path}: expected {artifact['sha256']}, got {checksum}")
+    return checksum
+
+
+def fetch_artifact(name, artifact_dir=ARTIFACT_DIR):
+    """
+    Download an artifact (if not present), check it against the pinned
+    checksum and record it in the manifest.
+
+    A file already at the artifact path (e.g. left by an older downloader) is
+    checked against the pin too and never trusted as is.
+
+    Returns:
+        str: Path of the artifact
+
+    Raises:
+        RuntimeError: The downloaded or existing file does not match the pin
+    """
+    artifact = ARTIFACTS[name]
+    path = os.path.join(artifact_dir, artifact["filename"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if os.path.isfile(path):
+        try:
+            checksum = verify_pinned(name, path)
+        except RuntimeError as e:
+            raise RuntimeError(f"{e}. Delete {path} and run fetch_artifacts again") from None
+    else:
+        print(f"Downloading {name} from {artifact['url']}...")
+        urllib.request.urlretrieve(artifact["url"], path + ".part")
+        try:
+            checksum = verify_pinned(name, path + ".part")
+        except RuntimeError:
+            os.remove(path + ".part")
+            raise
+        os.replace(path + ".part", path)
+
+    manifest = load_manifest(artifact_dir)
+    stat = os.stat(path)
+    manifest[name] = {"filename": artifact["filename"], "sha256": checksum,
+                      "size": stat.st_size, "mtime": stat.st_mtime}
+    save_manifest(manifest, artifact_dir)
+    return path
+
+
+def resolve_artifact(name, artifact_dir=ARTIFACT_DIR):
+    """
+    Get the path of a local artifact verified against its pinned checksum. Never downloads.
+
+    The manifest only caches a verification: the file is hashed again when its
+    size or modification time differs from the manifest or the manifest entry
+    does not carry the pinned checksum, so repeated loads of a verified
+    artifact are cheap.
+
+    Returns:
+        str: Path of the artifact
+
+    Raises:
+        FileNotFoundError: The artifact is missing
+        RuntimeError: The artifact does not match the pinned checksum
+    """
+    artifact = ARTIFACTS[name]
+    path = os.path.join(artifact_dir, artifact["filename"])
+
+    if not os.path.isfile(path):
+        raise FileNotFoundError(
+            f"Model artifact '{name}' is missing ({path}). "
+            f"Run `python preprocess.py fetch_artifacts {name} --artifact_dir {artifact_dir}` on a machine with "
+            f"internet access and copy {artifact_dir} to this machine."
+        )
+
+    entry = load_manifest(artifact_dir).get(name) or {}
+    stat = os.stat(path)
+    if (entry.get("sha256") != artifact["sha256"] or stat.st_size != entry.get("size")
+            or stat.st_mtime != entry.get("mtime")):
+        checksum = verify_pinned(name, path)
+
+        # Copied files get new mtimes; remember them so the next load skips hashing
+        manifest = load_manifest(artifact_dir)
+        manifest[name] = {"filename": artifact["filename"], "sha256": checksum,
+                          "size": stat.st_size, "mtime": stat.st_mtime}
+        try:
+            save_manifest(manifest, artifact_dir)
+        except OSError:
+            pass
+
+    return path
@@ -0,0 +1,82 @@
+import numpy as np
+from functools import lru_cache
+from FlagEmbedding import BGEM3FlagModel
+
+
+def lexical_weights_to_arrays(lexical_weights):
+    """
+    Convert BGE-M3 lexical weights ({"token_id": weight}) to sorted index and
+    value arrays, keeping positive weights only.
+    """
+    if not lexical_weights:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    keys = np.array(list(lexical_weights.keys()))
+    values = np.fromiter(lexical_weights.values(), dtype=np.float32, count=len(lexical_weights))
+    try:
+        indices = keys.astype(np.int64)
+    except ValueError:
+        # Drop non-numeric keys
+        numeric = np.char.isdigit(keys.astype(str))
+        indices, values = keys[numeric].astype(np.int64), values[numeric]
+
+    keep = values > 0
+    indices, values = indices[keep], values[keep]
+    order = np.argsort(indices)
+    return indices[order], values[order]
+
+
+class BGEM3Encoder:
+    def __init__(self, model_name="BAAI/bge-m3", use_fp16=True, cache_size=1024):
+        self.model = BGEM3FlagModel(model_name, use_fp16=use_fp16)
+        self.encode_query = lru_cache(maxsize=cache_size)(self._encode_query)
+
+    def encode(self, texts, batch_size=32, return_dense=True, return_sparse=True, return_colbert_vecs=True):
+        """
+        Encode texts in one BGE-M3 call.
+
+        Returns:
+            dict: "dense_vecs" (n, 1024) array, "sparse_vecs" list of
+                  (indices, values) arrays and "colbert_vecs" list of
+                  (tokens, 1024) arrays, for the requested outputs
+        """
+        outputs = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            return_dense=return_dense,
+            return_sparse=return_sparse,
+            return_colbert_vecs=return_colbert_vecs
+        )
+
+        result = {}
+        if return_dense:
+            result["dense_vecs"] = np.asarray(outputs["dense_vecs"], dtype=np.float32)
+        if return_sparse:
+            result["sparse_vecs"] = [lexical_weights_to_arrays(weights) for weights in outputs["lexical_weights"]]
+        if return_colbert_vecs:
+            result["colbert_vecs"] = [np.asarray(vecs, dtype=np.float32) for vecs in outputs["colbert_vecs"]]
+        return result
+
+    def _encode_query(self, text, outputs=("dense", "sparse", "colbert")):
+        """
+        Encode one query, computing only the requested outputs (the sparse and
+        ColBERT heads are skipped when not needed). Results are cached per
+        (text, outputs) and read-only.
+
+        Returns:
+            dict: "dense" array, "sparse" (indices, values) arrays and/or
+                  "colbert" (tokens, 1024) array, for the requested outputs
+        """
+        encoded = self.encode([text], batch_size=1, return_dense="dense" in outputs,
+                              return_sparse="sparse" in outputs, return_colbert_vecs="colbert" in outputs)
+        result = {}
+        if "dense" in outputs:
+            result["dense"] = encoded["dense_vecs"][0]
+        if "sparse" in outputs:
+            result["sparse"] = encoded["sparse_vecs"][0]
+        if "colbert" in outputs:
+            result["colbert"] = encoded["colbert_vecs"][0]
+        for value in result.values():
+            for array in (value if isinstance(value, tuple) else (value,)):
+                array.setflags(write=False)
+        return result
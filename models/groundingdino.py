@@ -1,12 +1,35 @@
 import os
-import sys
-import subprocess
-import urllib.request
+import json
 import time
 import threading
 from typing import Dict, List, Union, Tuple
 from PIL import Image
 
+from models.artifacts import ARTIFACT_DIR, resolve_artifact
+
+# config.json and tokenizer_config.json of bert-base-uncased, written next to the
+# pinned vocabulary and weights so transformers loads the text encoder offline
+BERT_CONFIG = {
+    "architectures": ["BertForMaskedLM"],
+    "attention_probs_dropout_prob": 0.1,
+    "hidden_act": "gelu",
+    "hidden_dropout_prob": 0.1,
+    "hidden_size": 768,
+    "initializer_range": 0.02,
+    "intermediate_size": 3072,
+    "layer_norm_eps": 1e-12,
+    "max_position_embeddings": 512,
+    "model_type": "bert",
+    "num_attention_heads": 12,
+    "num_hidden_layers": 12,
+    "pad_token_id": 0,
+    "position_embedding_type": "absolute",
+    "type_vocab_size": 2,
+    "use_cache": True,
+    "vocab_size": 30522
+}
+BERT_TOKENIZER_CONFIG = {"do_lower_case": True, "model_max_length": 512}
+
 class TimeoutError(Exception):
     """Custom exception for timeouts"""
     pass
@@ -33,105 +56,93 @@ class KillableThread(threading.Thread):
         return self._result
 
 class GroundingDINO:
-    def __init__(self, device=None):
+    def __init__(self, device=None, text_cache_size=4096, artifact_dir=ARTIFACT_DIR):
         """
         Initialize Grounding DINO model
         Args:
             device: Device to run inference on ('cpu' or 'cuda')
+            text_cache_size: Phrases whose text-encoder features are cached, 0 disables the cache
+            artifact_dir: Directory of the checksum-verified model artifacts (see models/artifacts.py)
         """
-        # Set model paths and create directories
-        self._setup_model_paths()
-        
-        # Initialize model
+        # Initialize model; weights are resolved locally when the model is first loaded
         self.model = None
-        
-        # Install dependencies first (just like in the notebook)
-        self._install_dependencies()
+        self.artifact_dir = artifact_dir
+        self.text_cache_size = text_cache_size
+        self.text_cache = None
         
         # Set device
         import torch
         self.device = device if device is not None else ("cuda" if torch.cuda.is_available() else "cpu")
         print(f"Using device: {self.device}")
     
-    def _install_dependencies(self):
+    def _resolve_config(self):
+        """Path of the model config bundled with groundingdino-py (part of the verified package install)"""
+        import groundingdino
+        bundled = os.path.join(os.path.dirname(groundingdino.__file__), "config", "GroundingDINO_SwinT_OGC.py")
+        if not os.path.isfile(bundled):
+            raise FileNotFoundError(f"GroundingDINO config not found at {bundled}; reinstall groundingdino-py")
+        return bundled
+    
+    def _resolve_text_encoder(self):
         """
-        Simple dependency installation similar to Kaggle notebook
+        Local bert-base-uncased directory for the text encoder, built from the
+        pinned vocabulary and weights so nothing is fetched from the Hugging Face hub
         """
-        print("Installing required packages...")
-        try:
-            # Use specific commands similar to the Kaggle notebook
-            subprocess.check_call(
-                [sys.executable, "-m", "pip", "install", "groundingdino-py"],
-                stdout=subprocess.PIPE
-            )
-            print("✓ Dependencies installed")
-        except Exception as e:
-            print(f"Warning: Error installing dependencies: {e}")
-    
-    def _setup_model_paths(self):
-        """Set up paths for model configuration and checkpoint files"""
-        # Create directories if they don't exist
-        os.makedirs("GroundingDINO/groundingdino/config", exist_ok=True)
-        os.makedirs("weights", exist_ok=True)
-        
-        # Set file paths
-        self.config_path = "GroundingDINO/groundingdino/config/GroundingDINO_SwinT_OGC.py"
-        self.checkpoint_path = "weights/groundingdino_swint_ogc.pth"
-    
-    def _download_config(self):
-        """Download the model configuration file if not already present"""
-        if os.path.exists(self.config_path):
-            print(f"Config file already exists at {self.config_path}")
-            return
-        
-        print(f"Downloading config file to {self.config_path}...")
-        config_url = "https://github.com/IDEA-Research/GroundingDINO/raw/main/groundingdino/config/GroundingDINO_SwinT_OGC.py"
-        
-        try:
-            urllib.request.urlretrieve(config_url, self.config_path)
-            print("Config file downloaded successfully")
-        except Exception as e:
-            raise RuntimeError(f"Failed to download config file: {e}")
-    
-    def _download_checkpoint(self):
-        """Download the model checkpoint file if not already present"""
-        if os.path.exists(self.checkpoint_path):
-            print(f"Checkpoint file already exists at {self.checkpoint_path}")
-            return
-        
-        print(f"Downloading checkpoint file to {self.checkpoint_path}...")
-        checkpoint_url = "https://github.com/IDEA-Research/GroundingDINO/releases/download/v0.1.0-alpha/groundingdino_swint_ogc.pth"
+        resolve_artifact("bert_base_uncased_vocab", self.artifact_dir)
+        weights_path = resolve_artifact("bert_base_uncased_weights", self.artifact_dir)
+        text_encoder_dir = os.path.dirname(weights_path)
         
-        try:
-            urllib.request.urlretrieve(checkpoint_url, self.checkpoint_path)
-            print("Checkpoint downloaded successfully")
-        except Exception as e:
-            raise RuntimeError(f"Failed to download checkpoint file: {e}")
-    
-
+        for filename, config in (("config.json", BERT_CONFIG), ("tokenizer_config.json", BERT_TOKENIZER_CONFIG)):
+            path = os.path.join(text_encoder_dir, filename)
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    if json.load(f) == config:
+                        continue
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(config, f, indent=2)
+        return text_encoder_dir
     
     def load_model(self):
         """
-        Load the Grounding DINO model, downloading and setting up everything as needed
+        Load the Grounding DINO model from local, checksum-verified artifacts.
+        Nothing is installed or downloaded here; see `preprocess.py fetch_artifacts`.
         """
         # Check if model is already loaded
         if self.model is not None:
             return
         
-        # Download model config and checkpoint files
-        self._download_config()
-        self._download_checkpoint()
-        
-        print("\nLoading Grounding DINO model...")
+        try:
+            from groundingdino.models import build_model
+            from groundingdino.util.misc import clean_state_dict
+            from groundingdino.util.slconfig import SLConfig
+        except ImportError as e:
+            raise ImportError("groundingdino-py is not installed; install it with the other preprocess "
+                              "dependencies (see README) before running object detection") from e
         
-        # IMPORTANT: Use exactly the same import and load sequence as the notebook
-        from groundingdino.util.inference import load_model
+        config_path = self._resolve_config()
+        checkpoint_path = resolve_artifact("groundingdino_swint_ogc", self.artifact_dir)
+        text_encoder_dir = self._resolve_text_encoder()
         
-        # Load the model with exact same call as in notebook
-        self.model = load_model(self.config_path, self.checkpoint_path)
+        print("\nLoading Grounding DINO model...")
         
+        # Same steps as groundingdino.util.inference.load_model, with the text
+        # encoder read from the local directory instead of "bert-base-uncased" on the hub
         import torch
+        args = SLConfig.fromfile(config_path)
+        args.device = self.device
+        args.text_encoder_type = text_encoder_dir
+        self.model = build_model(args)
+        checkpoint = torch.load(checkpoint_path, map_location="cpu")
+        self.model.load_state_dict(clean_state_dict(checkpoint["model"]), strict=False)
+        self.model.eval()
         self.model = self.model.to(self.device)
+        
+        # Reuse text-encoder features of phrases repeated across keyframes and videos
+        if self.text_cache_size:
+            from models.text_cache import CachedTextEncoder
+            self.text_cache = CachedTextEncoder(self.model.bert, self.text_cache_size,
+                                                self.model.tokenizer.pad_token_id or 0)
+            self.model.bert = self.text_cache
             
         print(f"Model loaded successfully on {self.device}")
     
@@ -241,4 +252,138 @@ class GroundingDINO:
             print(f"Unexpected error in detect_objects: {e}")
             import traceback
             traceback.print_exc()
-            return empty_result
\ No newline at end of file
+            return empty_result
+    
+    def text_cache_report(self) -> str:
+        """Hit statistics of the text-feature cache, empty when it is disabled"""
+        return self.text_cache.report() if self.text_cache is not None else ""
+    
+    def build_captions(self, prompts: List[str]) -> List[Tuple[str, List[Tuple[int, int, int]]]]:
+        """
+        Merge prompts into dot-separated captions ("prompt a . prompt b .") that
+        fit in the text encoder.
+        
+        Args:
+            prompts: Prompts of one keyframe
+            
+        Returns:
+            List of (caption, spans), where spans holds (prompt index, first
+            token, end token) of every prompt in the tokenized caption
+        """
+        tokenizer = self.model.tokenizer
+        max_tokens = getattr(self.model, "max_text_len", 256)
+        
+        groups = []
+        for index, prompt in enumerate(prompts):
+            # "." separates phrases for GroundingDINO, so keep it out of the prompt itself
+            text = " ".join(prompt.lower().replace(".", " ").split())
+            if not text:
+                continue
+            candidate = groups[-1] + [(index, text)] if groups else None
+            if candidate and len(tokenizer(" . ".join(t for _, t in candidate) + " .")["input_ids"]) <= max_tokens:
+                groups[-1] = candidate
+            else:
+                groups.append([(index, text)])
+        
+        captions = []
+        for group in groups:
+            caption = " . ".join(text for _, text in group) + " ."
+            tokenized = tokenizer(caption)
+            spans = []
+            start = 0
+            for index, text in group:
+                first = tokenized.char_to_token(start)
+                last = tokenized.char_to_token(start + len(text) - 1)
+                if first is not None and last is not None:
+                    spans.append((index, first, last + 1))
+                start += len(text) + len(" . ")
+            captions.append((caption, spans))
+        return captions
+    
+    def detect_objects_batch(self,
+                             items: List[Tuple[Union[str, Image.Image], List[str]]],
+                             box_threshold: float = 0.35,
+                             text_threshold: float = 0.25,
+                             batch_size: int = 4) -> List[List[Dict]]:
+        """
+        Detect objects for several images, each with several prompts.
+        
+        The prompts of an image are merged into as few captions as possible,
+        every image is loaded and transformed once, and up to batch_size
+        (image, caption) pairs run in one forward pass. Each detected phrase is
+        mapped back to the prompt whose tokens it matched. An image that cannot
+        be loaded gets no detections; when a batch fails, its pairs are retried
+        one at a time and only the failing ones are skipped.
+        
+        Args:
+            items: (image path or PIL Image, prompts) per image
+            box_threshold: Threshold for box confidence
+            text_threshold: Threshold for text confidence
+            batch_size: (image, caption) pairs per forward pass
+            
+        Returns:
+            One list of detections per item, each {"prompt", "object", "box", "score"}
+            with the box as normalized (cx, cy, w, h)
+        """
+        if self.model is None:
+            self.load_model()
+        
+        import torch
+        from groundingdino.util.inference import load_image
+        from groundingdino.util.utils import get_phrases_from_posmap
+        
+        # Expand to (item, image tensor, caption, spans) pairs, loading each image once
+        pairs = []
+        for item_index, (image, prompts) in enumerate(items):
+            try:
+                if isinstance(image, str):
+                    _, image_tensor = load_image(image)
+                else:
+                    image_tensor = image
+            except Exception as e:
+                # An unreadable keyframe only loses its own detections
+                print(f"Error loading image {image if isinstance(image, str) else item_index}, skipped: {e}")
+                continue
+            for caption, spans in self.build_captions(prompts):
+                pairs.append((item_index, image_tensor, caption, spans))
+        
+        def forward(batch):
+            with torch.no_grad():
+                outputs = self.model([image_tensor.to(self.device) for _, image_tensor, _, _ in batch],
+                                     captions=[caption for _, _, caption, _ in batch])
+            return outputs["pred_logits"].sigmoid().cpu(), outputs["pred_boxes"].cpu()
+        
+        results = [[] for _ in items]
+        tokenizer = self.model.tokenizer
+        for start in range(0, len(pairs), batch_size):
+            batch = pairs[start:start + batch_size]
+            try:
+                chunks = [(batch, forward(batch))]
+            except Exception as e:
+                # Retry the pairs one at a time so one bad frame cannot fail the whole batch
+                print(f"Error running inference on a batch of {len(batch)}: {e}")
+                chunks = []
+                for pair in (batch if len(batch) > 1 else []):
+                    try:
+                        chunks.append(([pair], forward([pair])))
+                    except Exception as e:
+                        print(f"Error running inference on item {pair[0]}, skipped: {e}")
+            
+            for chunk, (batch_logits, batch_boxes) in chunks:
+                for (item_index, _, caption, spans), logits, boxes in zip(chunk, batch_logits, batch_boxes):
+                    tokenized = tokenizer(caption)
+                    for prompt_index, first, end in spans:
+                        # A query is a detection of this prompt when it matches the prompt's tokens
+                        span_logits = torch.zeros_like(logits)
+                        span_logits[:, first:end] = logits[:, first:end]
+                        scores = span_logits.max(dim=1)[0]
+                        for query in torch.nonzero(scores > box_threshold).flatten().tolist():
+                            phrase = get_phrases_from_posmap(span_logits[query] > text_threshold, tokenized, tokenizer)
+                            results[item_index].append({
+                                "prompt": items[item_index][1][prompt_index],
+                                "object": phrase.replace(".", "") or items[item_index][1][prompt_index],
+                                "box": boxes[query].tolist(),
+                                "score": float(scores[query])
+                            })
+        
+        return results
@@ -23,4 +23,21 @@ class OpenCLIP(BaseVLM):
         with torch.no_grad():
             text_features = self.model.encode_text(text)
         text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-        return text_features.cpu().numpy().astype(np.float32).reshape(-1)
\ No newline at end of file
+        return text_features.cpu().numpy().astype(np.float32).reshape(-1)
+
+    def encode_texts(self, texts, batch_size=256):
+        """Encode a list of texts in batches. Returns normalized (n, dim) features."""
+        features = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(texts[start:start + batch_size])
+            with torch.no_grad():
+                text_features = self.model.encode_text(tokens)
+            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+            features.append(text_features.cpu().numpy().astype(np.float32))
+        return np.concatenate(features)
+
+    def get_logit_scale_bias(self):
+        """Logit scale and bias of the image-text head; bias is None for non-SigLIP models."""
+        scale = float(self.model.logit_scale.exp().item())
+        bias = getattr(self.model, "logit_bias", None)
+        return scale, float(bias.item()) if bias is not None else None
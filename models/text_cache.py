@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+import torch
+
+
+class CachedTextEncoder(torch.nn.Module):
+    """
+    LRU cache of GroundingDINO text-encoder (BERT) features per phrase.
+
+    With sub-sentence masks, GroundingDINO encodes every phrase of a caption
+    ("a red car ." in "people walking . a red car .") in its own attention
+    block with position ids restarting at 0, so the features of a phrase only
+    depend on its own token ids. This wrapper replaces `model.bert`, splits
+    each caption into those blocks, encodes only the blocks not seen before
+    (in one batch) and assembles the output from the cache.
+    """
+
+    def __init__(self, bert, cache_size=4096, pad_token_id=0):
+        super().__init__()
+        self.bert = bert
+        self.cache_size = cache_size
+        self.pad_token_id = pad_token_id
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def forward(self, input_ids, attention_mask=None, token_type_ids=None, position_ids=None, **kwargs):
+        # Without sub-sentence masks the tokens of a caption attend to each other, so nothing can be reused
+        if position_ids is None or attention_mask is None or attention_mask.dim() != 3:
+            return self.bert(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids,
+                             position_ids=position_ids, **kwargs)
+
+        # Split every row into blocks; each block starts where the position ids restart
+        blocks = []
+        for row in range(input_ids.shape[0]):
+            starts = torch.nonzero(position_ids[row] == 0).flatten().tolist() + [input_ids.shape[1]]
+            for start, end in zip(starts[:-1], starts[1:]):
+                key = tuple(input_ids[row, start:end].tolist())
+                if key != (self.pad_token_id,):
+                    blocks.append((row, start, end, key))
+
+        missing = list(dict.fromkeys(key for _, _, _, key in blocks if key not in self.cache))
+        self.misses += sum(len(key) > 1 for key in missing)
+        self.hits += sum(len(key) > 1 for _, _, _, key in blocks) - sum(len(key) > 1 for key in missing)
+        for key, features in zip(missing, self.encode_blocks(missing, input_ids.device)):
+            self.cache[key] = features
+
+        first = self.cache[blocks[0][3]]
+        output = torch.zeros(*input_ids.shape, first.shape[-1], dtype=first.dtype, device=first.device)
+        for row, start, end, key in blocks:
+            output[row, start:end] = self.cache[key]
+            self.cache.move_to_end(key)
+
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return {"last_hidden_state": output}
+
+    def encode_blocks(self, keys, device):
+        """Encode phrase blocks as standalone sequences in one batch. Returns one (tokens, hidden) tensor per key."""
+        if not keys:
+            return []
+
+        length = max(len(key) for key in keys)
+        input_ids = torch.full((len(keys), length), self.pad_token_id, dtype=torch.long, device=device)
+        attention_mask = torch.zeros((len(keys), length), dtype=torch.long, device=device)
+        for i, key in enumerate(keys):
+            input_ids[i, :len(key)] = torch.tensor(key, device=device)
+            attention_mask[i, :len(key)] = 1
+        position_ids = torch.arange(length, device=device).expand(len(keys), -1)
+
+        with torch.no_grad():
+            hidden = self.bert(input_ids=input_ids, attention_mask=attention_mask,
+                               token_type_ids=torch.zeros_like(input_ids),
+                               position_ids=position_ids)["last_hidden_state"]
+        return [hidden[i, :len(key)].detach() for i, key in enumerate(keys)]
+
+    def report(self):
+        """Cache hit statistics over phrases (single special tokens are not counted)."""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"text cache {rate:.1f}% hits ({self.hits}/{total} phrases, {len(self.cache)} cached)"
@@ -61,6 +61,82 @@ def keyframe_extraction(argv):
     elif args.mode == "lesson":
         extract_keyframe(args.input_video_dir, args.input_shot_dir, args.output_keyframe_dir, args.mode, args.lesson_name)
 
+def thumbnail_generation(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", choices=["all", "lesson"])
+    parser.add_argument("input_keyframe_dir", type=str)
+    parser.add_argument("output_thumbnail_dir", type=str)
+    parser.add_argument("--lesson_name", type=str)
+    parser.add_argument("--size", type=int, default=320, help="Maximum width/height of a thumbnail")
+    parser.add_argument("--format", type=str, choices=["WEBP", "JPEG"], default="WEBP")
+    parser.add_argument("--quality", type=int, default=75)
+    
+    args = parser.parse_args(argv)
+    
+    # Check error
+    if not os.path.exists(args.input_keyframe_dir):
+        raise ValueError("Input keyframe directory does not exist")
+    
+    if args.mode == "lesson":
+        if not args.lesson_name:
+            raise ValueError("Lesson name is required when mode is lesson")
+        if not os.path.exists(os.path.join(args.input_keyframe_dir, args.lesson_name)):
+            raise ValueError("Lesson keyframe's directory does not exist")
+    
+    # Main process
+    from preprocess.thumbnail_generation import generate_thumbnails
+    result = generate_thumbnails(
+        args.input_keyframe_dir,
+        args.output_thumbnail_dir,
+        args.mode,
+        args.lesson_name,
+        size=(args.size, args.size),
+        image_format=args.format,
+        quality=args.quality
+    )
+    print(result["message"])
+
+def storyboard_generation(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mode", choices=["all", "lesson"])
+    parser.add_argument("input_video_dir", type=str)
+    parser.add_argument("output_storyboard_dir", type=str)
+    parser.add_argument("--lesson_name", type=str)
+    parser.add_argument("--interval", type=float, default=10.0, help="Seconds between two storyboard tiles")
+    parser.add_argument("--tile_width", type=int, default=160)
+    parser.add_argument("--tile_height", type=int, default=90)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=10)
+    
+    args = parser.parse_args(argv)
+    
+    # Check error
+    if not os.path.exists(args.input_video_dir):
+        raise ValueError("Input video directory does not exist")
+    
+    if args.interval <= 0:
+        raise ValueError("Interval must be positive")
+    
+    if args.mode == "lesson":
+        if not args.lesson_name:
+            raise ValueError("Lesson name is required when mode is lesson")
+        if not os.path.exists(os.path.join(args.input_video_dir, args.lesson_name)):
+            raise ValueError("Lesson video directory does not exist")
+    
+    # Main process
+    from preprocess.storyboard_generation import generate_storyboards
+    result = generate_storyboards(
+        args.input_video_dir,
+        args.output_storyboard_dir,
+        args.mode,
+        args.lesson_name,
+        interval=args.interval,
+        tile_size=(args.tile_width, args.tile_height),
+        columns=args.columns,
+        rows=args.rows
+    )
+    print(result["message"])
+
 def build_mapping_json(argv):
     parser = argparse.ArgumentParser()
     parser.add_argument("input_keyframe_dir", type=str, help="Directory containing keyframe images")
@@ -224,14 +300,19 @@ def object_detection(argv):
     parser.add_argument("output_detection_dir", type=str)
     parser.add_argument("--lesson_name", type=str)
     parser.add_argument("--video_name", type=str)
+    parser.add_argument("--batch_size", type=int, default=4)
+    parser.add_argument("--text_cache_size", type=int, default=4096)
+    # "closed" detects only the OBJECTS classes and ignores input_caption_dir
+    parser.add_argument("--vocabulary", choices=["captions", "closed"], default="captions")
     
     args = parser.parse_args(argv)
+    use_captions = args.vocabulary == "captions"
     
     # Check error
     if not os.path.exists(args.input_keyframe_dir):
         raise ValueError("Input keyframe directory does not exist")
     
-    if not os.path.exists(args.input_caption_dir):
+    if use_captions and not os.path.exists(args.input_caption_dir):
         raise ValueError("Input caption directory does not exist")
     
     if args.mode == "lesson":
@@ -239,7 +320,7 @@ def object_detection(argv):
             raise ValueError("Lesson name is required when mode is lesson")
         if not os.path.exists(os.path.join(args.input_keyframe_dir, args.lesson_name)):
             raise ValueError(f"Lesson keyframe directory does not exist: {os.path.join(args.input_keyframe_dir, args.lesson_name)}")
-        if not os.path.exists(os.path.join(args.input_caption_dir, args.lesson_name)):
+        if use_captions and not os.path.exists(os.path.join(args.input_caption_dir, args.lesson_name)):
             raise ValueError(f"Lesson caption directory does not exist: {os.path.join(args.input_caption_dir, args.lesson_name)}")
     
     elif args.mode == "single":
@@ -258,18 +339,26 @@ def object_detection(argv):
         
         caption_file = os.path.join(args.input_caption_dir, args.lesson_name, 
                                   f"{args.lesson_name}_{args.video_name}_caption.json")
-        if not os.path.exists(caption_file):
+        if use_captions and not os.path.exists(caption_file):
             raise ValueError(f"Caption file does not exist: {caption_file}")
     
     # Main process
     from preprocess.object_detection import detect_object
     
+    vocabulary = None
+    if not use_captions:
+        from app.config import OBJECTS
+        vocabulary = OBJECTS
+    
     if args.mode == "all":
-        detect_object(args.input_keyframe_dir, args.input_caption_dir, args.output_detection_dir, args.mode)
+        detect_object(args.input_keyframe_dir, args.input_caption_dir, args.output_detection_dir, args.mode,
+                      batch_size=args.batch_size, text_cache_size=args.text_cache_size, vocabulary=vocabulary)
     elif args.mode == "lesson":
-        detect_object(args.input_keyframe_dir, args.input_caption_dir, args.output_detection_dir, args.mode, args.lesson_name)
+        detect_object(args.input_keyframe_dir, args.input_caption_dir, args.output_detection_dir, args.mode, args.lesson_name,
+                      batch_size=args.batch_size, text_cache_size=args.text_cache_size, vocabulary=vocabulary)
     elif args.mode == "single":
-        detect_object(args.input_keyframe_dir, args.input_caption_dir, args.output_detection_dir, args.mode, args.lesson_name, args.video_name)
+        detect_object(args.input_keyframe_dir, args.input_caption_dir, args.output_detection_dir, args.mode, args.lesson_name, args.video_name,
+                      batch_size=args.batch_size, text_cache_size=args.text_cache_size, vocabulary=vocabulary)
 
 def image_captioning(argv):
     parser = argparse.ArgumentParser()
@@ -396,9 +485,14 @@ def ocr(argv):
         print(f"Success: {result['message']}")
     
 def save_detection_elasticsearch(argv):
+    from app.config import DETECTION_INDEX
+    
     parser = argparse.ArgumentParser()
     parser.add_argument("input_dir", type=str)
-    parser.add_argument("--index", type=str, default="groundingdino")
+    parser.add_argument("--index", type=str, default=DETECTION_INDEX)
+    parser.add_argument("--chunk_size", type=int, default=500)
+    parser.add_argument("--thread_count", type=int, default=4)
+    parser.add_argument("--max_failed", type=int, default=0)
     
     args = parser.parse_args(argv)
     
@@ -410,7 +504,7 @@ def save_detection_elasticsearch(argv):
     # Main process
     from preprocess.save_detection_elasticsearch import index_detection_results
     
-    result = index_detection_results(args.input_dir, args.index)
+    result = index_detection_results(args.input_dir, args.index, args.chunk_size, args.thread_count, args.max_failed)
     
     if result["status"] == "error":
         print(f"Error: {result['message']}")
@@ -419,9 +513,14 @@ def save_detection_elasticsearch(argv):
 
 
 def save_ocr_elasticsearch(argv):
+    from app.config import OCR_INDEX
+    
     parser = argparse.ArgumentParser()
     parser.add_argument("input_dir", type=str)
-    parser.add_argument("--index", type=str, default="ocr")
+    parser.add_argument("--index", type=str, default=OCR_INDEX)
+    parser.add_argument("--chunk_size", type=int, default=500)
+    parser.add_argument("--thread_count", type=int, default=4)
+    parser.add_argument("--max_failed", type=int, default=0)
     
     args = parser.parse_args(argv)
     
@@ -433,12 +532,164 @@ def save_ocr_elasticsearch(argv):
     # Main process
     from preprocess.save_ocr_elasticsearch import index_ocr_results
     
-    result = index_ocr_results(args.input_dir, args.index)
+    result = index_ocr_results(args.input_dir, args.index, args.chunk_size, args.thread_count, args.max_failed)
+    
+    if result["status"] == "error":
+        print(f"Error: {result['message']}")
+    else:
+        print(f"Success: {result['message']}")
+
+
+def build_object_index(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_detection_dir", type=str)
+    parser.add_argument("mapping_json", type=str)
+    parser.add_argument("output_file", type=str)
+    parser.add_argument("--classes", type=str, nargs="+")
+    parser.add_argument("--score_threshold", type=float, default=0.35)
+    
+    args = parser.parse_args(argv)
+    
+    # Check error
+    if not os.path.exists(args.input_detection_dir):
+        raise ValueError("Input detection directory does not exist")
+    
+    if not os.path.exists(args.mapping_json):
+        raise ValueError("Mapping JSON does not exist")
+    
+    # Main process
+    from database.object_index import build_object_index as run_build
+    
+    if args.classes:
+        classes = args.classes
+    else:
+        from app.config import OBJECTS
+        classes = OBJECTS
+    
+    result = run_build(args.input_detection_dir, args.mapping_json, classes, args.output_file, args.score_threshold)
+    
+    if result["status"] == "error":
+        print(f"Error: {result['message']}")
+        sys.exit(1)
+    else:
+        print(f"Success: {result['message']}")
+
+
+def build_box_index(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_detection_dir", type=str)
+    parser.add_argument("mapping_json", type=str)
+    parser.add_argument("output_file", type=str)
+    parser.add_argument("--ocr_dir", type=str, default=None)
+    parser.add_argument("--classes", type=str, nargs="+")
+    parser.add_argument("--score_threshold", type=float, default=0.35)
+    
+    args = parser.parse_args(argv)
+    
+    # Check error
+    if not os.path.exists(args.input_detection_dir):
+        raise ValueError("Input detection directory does not exist")
+    
+    if args.ocr_dir and not os.path.exists(args.ocr_dir):
+        raise ValueError("OCR directory does not exist")
+    
+    if not os.path.exists(args.mapping_json):
+        raise ValueError("Mapping JSON does not exist")
+    
+    # Main process
+    from database.box_index import build_box_index as run_build
+    
+    if args.classes:
+        classes = args.classes
+    else:
+        from app.config import OBJECTS
+        classes = OBJECTS
+    
+    result = run_build(args.input_detection_dir, args.ocr_dir, args.mapping_json, classes, args.output_file,
+                       args.score_threshold)
+    
+    if result["status"] == "error":
+        print(f"Error: {result['message']}")
+        sys.exit(1)
+    else:
+        print(f"Success: {result['message']}")
+
+
+def build_tag_index(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("embeddings_file", type=str)
+    parser.add_argument("output_file", type=str)
+    parser.add_argument("--backbone", type=str, default="ViT-B-16-SigLIP-512")
+    parser.add_argument("--pretrained", type=str, default="webli")
+    parser.add_argument("--chunk_size", type=int, default=65536)
+    
+    args = parser.parse_args(argv)
+    
+    # Check error
+    if not os.path.exists(args.embeddings_file):
+        raise ValueError("Embeddings file does not exist")
+    
+    # Main process
+    from models.openclip import OpenCLIP
+    from database.tag_index import build_tag_index as run_build
+    from app.config import OBJECTS, SCENES, TAG_PROMPT_TEMPLATES
+    
+    # Must be the model that produced the embeddings
+    model = OpenCLIP(backbone=args.backbone, pretrained=args.pretrained)
+    result = run_build(args.embeddings_file, model, OBJECTS, SCENES, TAG_PROMPT_TEMPLATES, args.output_file,
+                       args.chunk_size)
+    
+    if result["status"] == "error":
+        print(f"Error: {result['message']}")
+        sys.exit(1)
+    else:
+        print(f"Success: {result['message']}")
+
+
+def fetch_artifacts(argv):
+    from models.artifacts import ARTIFACTS, ARTIFACT_DIR
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", type=str, nargs="*")
+    parser.add_argument("--artifact_dir", type=str, default=ARTIFACT_DIR)
+    
+    args = parser.parse_args(argv)
+    
+    # Check error
+    unknown = [name for name in args.names if name not in ARTIFACTS]
+    if unknown:
+        raise ValueError(f"Unknown artifacts: {', '.join(unknown)}; available: {', '.join(ARTIFACTS)}")
+    
+    # Main process
+    from models.artifacts import fetch_artifact
+    
+    for name in args.names or list(ARTIFACTS):
+        try:
+            path = fetch_artifact(name, args.artifact_dir)
+        except Exception as e:
+            print(f"Error: {name}: {str(e)}")
+            sys.exit(1)
+        print(f"Success: {name} -> {path}")
+
+
+def rollback_elasticsearch(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("index", type=str)
+    
+    args = parser.parse_args(argv)
+    
+    # Main process
+    from database.my_elasticsearch import MyElasticsearch
+    
+    result = MyElasticsearch().rollback_alias(args.index)
     
     if result["status"] == "error":
         print(f"Error: {result['message']}")
+        sys.exit(1)
     else:
         print(f"Success: {result['message']}")
+
+
 def save_embedding_faiss(argv):
     parser = argparse.ArgumentParser()
     parser.add_argument("input_keyframe_dir", type=str)
@@ -472,6 +723,12 @@ def save_caption_qdrant(argv):
     parser.add_argument("keyframe_dir", type=str)
     parser.add_argument("output_dir", type=str)
     parser.add_argument("--collection_name", type=str, default="captions")
+    parser.add_argument("--encode_batch_size", type=int, default=32)
+    parser.add_argument("--upload_batch_size", type=int, default=256)
+    parser.add_argument("--parallel", type=int, default=2)
+    parser.add_argument("--colbert_pool_size", type=int, default=0)
+    parser.add_argument("--colbert_quantization", choices=["none", "int8", "binary"], default="none")
+    parser.add_argument("--colbert_on_disk", action="store_true")
     
     args = parser.parse_args(argv)
     
@@ -492,7 +749,13 @@ def save_caption_qdrant(argv):
         caption_dir=args.caption_dir,
         keyframe_dir=args.keyframe_dir, 
         output_dir=args.output_dir,
-        collection_name=args.collection_name
+        collection_name=args.collection_name,
+        encode_batch_size=args.encode_batch_size,
+        upload_batch_size=args.upload_batch_size,
+        parallel=args.parallel,
+        colbert_pool_size=args.colbert_pool_size,
+        colbert_quantization=None if args.colbert_quantization == "none" else args.colbert_quantization,
+        colbert_on_disk=args.colbert_on_disk
     )
     
     if result["status"] == "error":
@@ -501,22 +764,134 @@ def save_caption_qdrant(argv):
     else:
         print(f"Success: {result['message']}")
         sys.exit(0)
+
+
+def build_caption_index(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("caption_dir", type=str)
+    parser.add_argument("mapping_json", type=str)
+    parser.add_argument("output_dir", type=str)
+    parser.add_argument("--encode_batch_size", type=int, default=32)
+    
+    args = parser.parse_args(argv)
+    
+    # Check error
+    if not os.path.exists(args.caption_dir):
+        raise ValueError("Caption directory does not exist")
+    
+    if not os.path.exists(args.mapping_json):
+        raise ValueError("Mapping JSON does not exist")
+    
+    # Main process
+    from preprocess.build_caption_index import build_caption_index as run_build
+    
+    result = run_build(
+        caption_dir=args.caption_dir,
+        mapping_json=args.mapping_json,
+        output_dir=args.output_dir,
+        encode_batch_size=args.encode_batch_size
+    )
+    
+    if result["status"] == "error":
+        print(f"Error: {result['message']}")
+        sys.exit(1)
+    else:
+        print(f"Success: {result['message']}")
+
+
+def benchmark_caption_search(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("queries_file", type=str)
+    parser.add_argument("baseline_collection", type=str)
+    parser.add_argument("candidate_collections", type=str, nargs="+")
+    parser.add_argument("--output_file", type=str)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--overlap_k", type=int, default=10)
+    parser.add_argument("--host", type=str, default="localhost")
+    parser.add_argument("--port", type=int, default=6333)
+    parser.add_argument("--embedded_index", type=str)
+    
+    args = parser.parse_args(argv)
+    
+    # Check error
+    if not os.path.exists(args.queries_file):
+        raise ValueError("Queries file does not exist")
+    
+    # Main process
+    from preprocess.benchmark_caption_search import benchmark_caption_search as run_benchmark
+    
+    result = run_benchmark(
+        queries_file=args.queries_file,
+        baseline_collection=args.baseline_collection,
+        candidate_collections=args.candidate_collections,
+        output_file=args.output_file,
+        limit=args.limit,
+        overlap_k=args.overlap_k,
+        host=args.host,
+        port=args.port,
+        embedded_index=args.embedded_index
+    )
+    
+    if result["status"] == "error":
+        print(f"Error: {result['message']}")
+        sys.exit(1)
+    else:
+        print(f"Success: {result['message']}")
+
+
+def preflight(argv):
+    from preprocess.environment import STAGE_REQUIREMENTS, LOCK_FILE
+    
+    parser = argparse.ArgumentParser()
+    parser.add_argument("stages", type=str, nargs="*")
+    parser.add_argument("--install", action="store_true")
+    parser.add_argument("--lock_file", type=str, default=LOCK_FILE)
+    
+    args = parser.parse_args(argv)
+    
+    # Check error
+    unknown = [stage for stage in args.stages if stage not in STAGE_REQUIREMENTS]
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)}; available: {', '.join(STAGE_REQUIREMENTS)}")
+    
+    # Main process
+    from preprocess.environment import preflight as run_preflight
+    
+    result = run_preflight(args.stages, install=args.install, lock_file=args.lock_file)
+    
+    if result["status"] == "error":
+        print(f"Error: {result['message']}")
+        sys.exit(1)
+    else:
+        print(f"Success: {result['message']}")
+
+
 TASKS = {
     "shot_boundary_detection": shot_boundary_detection,
     "keyframe_extraction": keyframe_extraction,
+    "thumbnail_generation": thumbnail_generation,
+    "storyboard_generation": storyboard_generation,
     "build_mapping_json": build_mapping_json,
     "news_anchor_detection": news_anchor_detection,
     "news_segmentation": news_segmentation,
     "subvideo_extraction": subvideo_extraction,
     "remove_noise_keyframe": remove_noise_keyframe,
     "object_detection": object_detection,
+    "fetch_artifacts": fetch_artifacts,
     "image_captioning": image_captioning,
     "asr": asr,
     "ocr": ocr,
     "save_detection_elasticsearch": save_detection_elasticsearch,
     "save_ocr_elasticsearch": save_ocr_elasticsearch,
+    "rollback_elasticsearch": rollback_elasticsearch,
+    "build_object_index": build_object_index,
+    "build_box_index": build_box_index,
+    "build_tag_index": build_tag_index,
     "save_embedding_faiss": save_embedding_faiss,
     "save_caption_qdrant": save_caption_qdrant,
+    "build_caption_index": build_caption_index,
+    "benchmark_caption_search": benchmark_caption_search,
+    "preflight": preflight,
 }
 
 if __name__ == "__main__":
@@ -531,6 +906,13 @@ if __name__ == "__main__":
     argv = sys.argv[2:]
     
     if task in TASKS:
+        # Stages never install packages; `preflight` does that once and records a lock
+        from preprocess.environment import check_environment
+        try:
+            check_environment(task)
+        except ImportError as e:
+            print(f"Error: {str(e)}")
+            sys.exit(1)
         TASKS[task](argv)
     else:
         print(f"Task '{task}' not found. Available tasks:")
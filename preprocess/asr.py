@@ -1,42 +1,8 @@
 
 import os
-import sys
 import json
 from tqdm import tqdm
 
-def install_dependencies():
-    """Cài đặt các thư viện và phụ thuộc cần thiết cho ASR"""
-    import os
-    
-    print("Bắt đầu cài đặt thư viện cho ASR trên Google Colab...")
-    
-    # Sử dụng cách cài đặt đơn giản hơn, trực tiếp tương tự như notebook gốc
-    print("\n=== Cài đặt transformers và accelerate... ===\n")
-    os.system(f"{sys.executable} -m pip install transformers accelerate --quiet")
-    
-    print("\n=== Cài đặt WhisperX... ===\n") 
-    os.system(f"{sys.executable} -m pip install whisperx")
-    
-    os.system("apt-get update -qq")
-    os.system("apt-get install -qq libcudnn8")
-    
-    try:
-        import torch
-        print(f"\n=== Thông tin PyTorch và CUDA ===\n")
-        print(f"PyTorch phiên bản: {torch.__version__}")
-        print(f"CUDA khả dụng: {torch.cuda.is_available()}")
-        if torch.cuda.is_available():
-            print(f"CUDA phiên bản: {torch.version.cuda}")
-            print(f"Thiết bị CUDA: {torch.cuda.get_device_name(0)}")
-    except Exception as e:
-        print(f"Lỗi khi kiểm tra thông tin PyTorch: {str(e)}")
-    
-    print("\nHoàn tất cài đặt các thư viện cho ASR.")
-    print("\nLưu ý: Nếu gặp lỗi về CUDA/cuDNN, hãy thử sử dụng CPU thay thế:")
-    print("  model = whisperx.load_model('large-v2', device='cpu')")
-    
-    return True
-
 def correct_transcript(corrector, transcript):
     """
     Sửa lỗi trong bản ghi âm sử dụng mô hình hiệu chỉnh tiếng Việt
@@ -93,7 +59,6 @@ def process_lesson_asr(lesson_path, transcript_folder, lesson_name=None):
         if not os.path.exists(lesson_path):
             return {"status": "error", "message": f"Không tìm thấy thư mục bài học: {lesson_path}"}
         
-        install_dependencies()
         import torch
         
         # Tạo thư mục đầu ra
@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+from tqdm import tqdm
+
+
+def load_queries(queries_file):
+    """Load benchmark queries from a JSON list or a text file with one query per line."""
+    with open(queries_file, 'r', encoding='utf-8') as f:
+        if queries_file.endswith(".json"):
+            return [query for query in json.load(f) if query]
+        return [line.strip() for line in f if line.strip()]
+
+
+class PrecomputedQueryEncoder:
+    """
+    Query encoder serving encodings computed before the benchmark, so every
+    backend and collection is timed on the search alone and sees identical
+    query vectors, whatever order they run in.
+    """
+
+    def __init__(self, encoder, queries):
+        self.encodings = {query: encoder.encode_query(query) for query in tqdm(queries, desc="Đang mã hóa truy vấn")}
+
+    def encode_query(self, text, outputs=("dense", "sparse", "colbert")):
+        encoding = self.encodings[text]
+        return {output: encoding[output] for output in outputs}
+
+
+def run_queries(search_fn, queries, desc):
+    """
+    Run every query through search_fn and time it.
+
+    Returns:
+        tuple: (results, latencies) - result paths and latency in ms per query
+    """
+    # Warm up the connection before timing (query encodings are precomputed)
+    search_fn(queries[0])
+
+    results = []
+    latencies = []
+    for query in tqdm(queries, desc=desc):
+        start_time = time.perf_counter()
+        results.append(list(search_fn(query)))
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+    return results, latencies
+
+
+def overlap_at_k(reference, candidate, k):
+    """Mean fraction of the reference top-k found in the candidate top-k."""
+    overlaps = []
+    for reference_paths, candidate_paths in zip(reference, candidate):
+        expected = set(reference_paths[:k])
+        if expected:
+            overlaps.append(len(expected & set(candidate_paths[:k])) / len(expected))
+    return float(np.mean(overlaps)) if overlaps else 0.0
+
+
+def summarize(name, results, latencies, reference, overlap_k):
+    return {
+        "name": name,
+        f"overlap@{overlap_k}": overlap_at_k(reference, results, overlap_k),
+        "overlap@all": overlap_at_k(reference, results, max(len(paths) for paths in reference) if reference else 0),
+        "mean_ms": float(np.mean(latencies)),
+        "p95_ms": float(np.percentile(latencies, 95))
+    }
+
+
+def benchmark_caption_search(queries_file, baseline_collection, candidate_collections, output_file=None,
+                             limit=100, overlap_k=10, host="localhost", port=6333, embedded_index=None):
+    """
+    Compare caption search quality and latency of compressed collections or
+    cheaper search modes against a baseline collection (full float32 ColBERT
+    multivectors, 'colbert' mode).
+
+    Quality is the overlap of each candidate's top-k with the baseline top-k,
+    so no relevance labels are needed. Collections are given as "name" or
+    "name:mode" (mode defaults to 'colbert'). The name "embedded" refers to
+    the in-process caption index in embedded_index, which makes the benchmark
+    a parity check between the Qdrant and embedded backends.
+
+    Args:
+        queries_file (str): Queries as JSON list or text file (one per line)
+        baseline_collection (str): Reference collection
+        candidate_collections (list): Collections to compare with the reference
+        output_file (str): Optional JSON report path
+        limit (int): Number of results per query
+        overlap_k (int): Cut-off for the overlap metric
+        host (str): Qdrant host
+        port (int): Qdrant port
+        embedded_index (str): Embedded caption index directory
+
+    Returns:
+        dict: Status, message and per-collection report
+    """
+    try:
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from database.my_qdrant import Qdrant
+        from models.bge_m3 import BGEM3Encoder
+        from app.config import CAPTION_ENCODER_MODEL
+
+        queries = load_queries(queries_file)
+        if not queries:
+            return {"status": "error", "message": "Không có truy vấn nào trong file"}
+
+        # Encode every query before any timing starts; all backends share the encodings
+        encoder = PrecomputedQueryEncoder(BGEM3Encoder(CAPTION_ENCODER_MODEL, use_fp16=True), queries)
+        qdrant = Qdrant(host=host, port=port, model=encoder)
+        embedded = None
+        if embedded_index:
+            from database.caption_index import CaptionIndex
+            embedded = CaptionIndex(embedded_index, model=encoder)
+
+        def collection_search(spec):
+            collection_name, _, mode = spec.partition(":")
+            backend = embedded if collection_name == "embedded" else qdrant
+            if backend is None:
+                raise ValueError("--embedded_index is required to benchmark the embedded caption index")
+            return lambda query: backend.search(search_query=query, collection_name=collection_name,
+                                                limit=limit, mode=mode or "colbert")[2]
+
+        reference, reference_latencies = run_queries(collection_search(baseline_collection), queries, baseline_collection)
+        report = [summarize(baseline_collection, reference, reference_latencies, reference, overlap_k)]
+
+        for collection_name in candidate_collections:
+            results, latencies = run_queries(collection_search(collection_name), queries, collection_name)
+            report.append(summarize(collection_name, results, latencies, reference, overlap_k))
+
+        print(f"{'collection':<30} {'overlap@' + str(overlap_k):>12} {'overlap@all':>12} {'mean ms':>10} {'p95 ms':>10}")
+        for row in report:
+            print(f"{row['name']:<30} {row[f'overlap@{overlap_k}']:>12.3f} {row['overlap@all']:>12.3f} "
+                  f"{row['mean_ms']:>10.1f} {row['p95_ms']:>10.1f}")
+
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                json.dump({"queries": len(queries), "limit": limit, "report": report}, f, ensure_ascii=False, indent=2)
+
+        return {"status": "success", "message": f"Đã đánh giá {len(report)} collection trên {len(queries)} truy vấn", "report": report}
+
+    except Exception as e:
+        print(f"Lỗi khi đánh giá caption search: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"Lỗi: {str(e)}"}
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+from tqdm import tqdm
+from .save_caption_qdrant import load_caption_files, resolve_caption_point_ids
+
+
+def build_caption_index(caption_dir, mapping_json, output_dir, encode_batch_size=32):
+    """
+    Build the embedded caption index (FAISS dense + CSR inverted sparse index)
+    from the same caption JSON files used by save_caption_qdrant.
+
+    Args:
+        caption_dir (str): Caption JSON directory
+        mapping_json (str): The id2path.json the app loads (MAPPING_JSON); point ids
+                            are resolved against it so they match every other index
+        output_dir (str): Index directory (dense.index, sparse.npz, ids.npy, keyframes.npy)
+        encode_batch_size (int): Captions per BGE-M3 forward pass
+
+    Returns:
+        dict: Status and message
+    """
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+
+        sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from models.bge_m3 import BGEM3Encoder
+        from database.caption_index import build_caption_index as write_caption_index
+
+        try:
+            with open(mapping_json, 'r', encoding='utf-8') as f:
+                mapping_data = json.load(f)
+            items = mapping_data.get("items", [])
+            id2path = {item["id"]: item["path"] for item in items}
+        except Exception as e:
+            return {"status": "error", "message": f"Lỗi khi đọc file mapping: {str(e)}"}
+
+        print("Tải file caption...")
+        captions_data = load_caption_files(caption_dir)
+        print(f"Đã tải {len(captions_data)} captions từ {caption_dir}")
+
+        resolved_captions = resolve_caption_point_ids(captions_data, id2path, output_dir)
+        if len(resolved_captions) == 0:
+            return {"status": "error", "message": "Không có caption nào khớp với mapping"}
+
+        encoder = BGEM3Encoder()
+        dense_vectors = []
+        sparse_vectors = []
+        start_time = time.perf_counter()
+        for start in tqdm(range(0, len(resolved_captions), encode_batch_size), desc="Đang mã hóa caption"):
+            batch = resolved_captions[start:start + encode_batch_size]
+            outputs = encoder.encode([caption_data['caption'] for caption_data in batch],
+                                     batch_size=encode_batch_size, return_colbert_vecs=False)
+            dense_vectors.append(outputs["dense_vecs"])
+            sparse_vectors.extend(outputs["sparse_vecs"])
+
+        write_caption_index(np.concatenate(dense_vectors), sparse_vectors,
+                            [caption_data['point_id'] for caption_data in resolved_captions],
+                            [caption_data['keyframe'] for caption_data in resolved_captions], output_dir)
+        elapsed = time.perf_counter() - start_time
+
+        return {"status": "success", "message": f"Đã xây dựng caption index với {len(resolved_captions)} caption "
+                                                f"({len(resolved_captions) / max(elapsed, 1e-9):.1f} captions/s) tại {output_dir}"}
+
+    except Exception as e:
+        print(f"Lỗi khi xây dựng caption index: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"Lỗi: {str(e)}"}
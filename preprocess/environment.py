@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import platform
+import importlib
+import importlib.util
+import subprocess
+from importlib import metadata
+
+# Lock of the package versions verified by `preprocess.py preflight`
+LOCK_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "environment.lock.json")
+
+# Packages of each stage: (pip requirement, distribution names, import name). A
+# package counts as installed when its import name resolves; the distribution
+# names ("|"-separated alternatives) are only used to read versions for the lock.
+# "==" pins an exact version, ">=" sets the minimum version a stage needs.
+TRANSFORMERS_INTERNVL = "transformers>=4.52.0"  # InternVL3 "-hf" checkpoints (InternVLForConditionalGeneration)
+
+STAGE_REQUIREMENTS = {
+    "image_captioning": [
+        (TRANSFORMERS_INTERNVL, "transformers", "transformers"),
+        ("bitsandbytes", "bitsandbytes", "bitsandbytes"),
+        ("accelerate", "accelerate", "accelerate")
+    ],
+    "news_anchor_detection": [
+        (TRANSFORMERS_INTERNVL, "transformers", "transformers"),
+        ("accelerate", "accelerate", "accelerate")
+    ],
+    "asr": [
+        ("transformers", "transformers", "transformers"),
+        ("accelerate", "accelerate", "accelerate"),
+        ("whisperx", "whisperx", "whisperx")
+    ],
+    "ocr": [
+        ("paddlepaddle==2.6.1", "paddlepaddle|paddlepaddle-gpu", "paddle"),
+        ("paddleocr==2.8.1", "paddleocr", "paddleocr")
+    ],
+    "object_detection": [
+        ("groundingdino-py", "groundingdino-py", "groundingdino")
+    ],
+    "save_embedding_faiss": [
+        ("faiss-cpu==1.11.0", "faiss-cpu|faiss-gpu", "faiss"),
+        ("open_clip_torch", "open_clip_torch", "open_clip")
+    ],
+    "build_tag_index": [
+        ("faiss-cpu==1.11.0", "faiss-cpu|faiss-gpu", "faiss"),
+        ("open_clip_torch", "open_clip_torch", "open_clip")
+    ],
+    "save_caption_qdrant": [
+        ("qdrant-client", "qdrant-client", "qdrant_client"),
+        ("FlagEmbedding", "FlagEmbedding", "FlagEmbedding")
+    ],
+    "build_caption_index": [
+        ("faiss-cpu==1.11.0", "faiss-cpu|faiss-gpu", "faiss"),
+        ("FlagEmbedding", "FlagEmbedding", "FlagEmbedding")
+    ],
+    "benchmark_caption_search": [
+        ("qdrant-client", "qdrant-client", "qdrant_client"),
+        ("FlagEmbedding", "FlagEmbedding", "FlagEmbedding")
+    ],
+    "save_detection_elasticsearch": [
+        ("elasticsearch", "elasticsearch", "elasticsearch")
+    ],
+    "save_ocr_elasticsearch": [
+        ("elasticsearch", "elasticsearch", "elasticsearch")
+    ],
+    "rollback_elasticsearch": [
+        ("elasticsearch", "elasticsearch", "elasticsearch")
+    ]
+}
+
+# System packages installed with apt-get by `preflight --install`
+STAGE_SYSTEM_PACKAGES = {
+    "asr": ["libcudnn8"]
+}
+
+
+def installed_version(distributions):
+    """Installed version of the first installed of "|"-separated distributions, None if there is no pip metadata"""
+    for distribution in distributions.split("|"):
+        try:
+            return metadata.version(distribution)
+        except metadata.PackageNotFoundError:
+            continue
+    return None
+
+
+def is_installed(module):
+    """Whether a top-level module can be imported, without importing it (covers conda installs without pip metadata)"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def requirement_conflict(requirement):
+    """Installed version of a distribution when it does not satisfy a "==" or ">=" requirement, else None"""
+    for operator in ("==", ">="):
+        if operator not in requirement:
+            continue
+        distribution, required = requirement.split(operator)
+        version = installed_version(distribution)
+        if version is None:
+            return None
+        if operator == "==":
+            return version if version != required else None
+        from packaging.version import Version
+        return version if Version(version) < Version(required) else None
+    return None
+
+
+def requirement_name(requirement):
+    return requirement.split("==")[0].split(">=")[0]
+
+
+def install_requirements(stage):
+    """Install the packages of a stage. Only called by preflight, never at stage startup."""
+    in_kaggle = 'KAGGLE_KERNEL_RUN_TYPE' in os.environ
+    for requirement, _, module in STAGE_REQUIREMENTS[stage]:
+        if is_installed(module) and requirement_conflict(requirement) is None:
+            continue
+        if requirement_name(requirement) == "transformers" and in_kaggle:
+            # Kaggle images ship an old transformers without InternVL3 support
+            requirement = "git+https://github.com/huggingface/transformers"
+        print(f"Đang cài đặt {requirement}...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", requirement, "-q"])
+
+    for package in STAGE_SYSTEM_PACKAGES.get(stage, []):
+        print(f"Đang cài đặt {package} (apt-get)...")
+        subprocess.check_call(["apt-get", "install", "-qq", "-y", package])
+
+
+def verify_requirements(stage):
+    """
+    Import every package of a stage.
+
+    Returns:
+        tuple: (versions, errors) - {distributions: version} of the packages
+               with pip metadata and error messages
+    """
+    versions = {}
+    errors = []
+    for requirement, distributions, module in STAGE_REQUIREMENTS[stage]:
+        if not is_installed(module):
+            errors.append(f"{module} chưa được cài đặt ({requirement})")
+            continue
+        conflict = requirement_conflict(requirement)
+        if conflict is not None:
+            errors.append(f"{requirement_name(requirement)} {conflict} không đáp ứng phiên bản yêu cầu ({requirement})")
+            continue
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            errors.append(f"Không thể import {module}: {str(e)}")
+            continue
+        version = installed_version(distributions)
+        if version is not None:
+            versions[distributions] = version
+    return versions, errors
+
+
+def preflight(stages, install=False, lock_file=LOCK_FILE):
+    """
+    Check (and optionally install) the packages of the given stages once, and
+    record the verified versions in the lock file.
+
+    Args:
+        stages (list): Stage names, all stages with requirements when empty
+        install (bool): Install missing packages first
+        lock_file (str): Lock file to write
+
+    Returns:
+        dict: Status and message
+    """
+    stages = stages or list(STAGE_REQUIREMENTS)
+    unknown = [stage for stage in stages if stage not in STAGE_REQUIREMENTS]
+    if unknown:
+        return {"status": "error", "message": f"Không có yêu cầu cho stage: {', '.join(unknown)}"}
+
+    lock = load_lock(lock_file) or {"packages": {}, "stages": []}
+    errors = []
+    for stage in stages:
+        if install:
+            install_requirements(stage)
+        versions, stage_errors = verify_requirements(stage)
+        if stage_errors:
+            errors.extend(f"{stage}: {error}" for error in stage_errors)
+            continue
+        lock["packages"].update(versions)
+        if stage not in lock["stages"]:
+            lock["stages"].append(stage)
+
+    lock.update(python=platform.python_version(), platform=platform.platform(),
+                created_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    with open(lock_file, "w", encoding="utf-8") as f:
+        json.dump(lock, f, ensure_ascii=False, indent=2)
+
+    if errors:
+        return {"status": "error", "message": "Môi trường chưa sẵn sàng:\n" + "\n".join(errors)}
+    return {"status": "success", "message": f"Đã kiểm tra {len(stages)} stage, lưu phiên bản tại {lock_file}"}
+
+
+def load_lock(lock_file=LOCK_FILE):
+    if not os.path.isfile(lock_file):
+        return None
+    with open(lock_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_environment(stage, lock_file=LOCK_FILE):
+    """
+    Cheap startup check of a stage against the lock: looks up the modules of
+    the stage and compares installed versions with the locked ones, without
+    importing or installing anything.
+
+    Raises:
+        ImportError: A package of the stage is not installed or older than
+                     the minimum version the stage needs
+    """
+    if stage not in STAGE_REQUIREMENTS:
+        return
+
+    missing = [requirement for requirement, _, module in STAGE_REQUIREMENTS[stage] if not is_installed(module)]
+    if missing:
+        raise ImportError(f"Thiếu thư viện cho {stage}: {', '.join(missing)}. "
+                          f"Chạy `python preprocess.py preflight {stage} --install` một lần để cài đặt")
+
+    outdated = [f"{requirement_name(requirement)} {requirement_conflict(requirement)} ({requirement})"
+                for requirement, _, _ in STAGE_REQUIREMENTS[stage]
+                if ">=" in requirement and requirement_conflict(requirement) is not None]
+    if outdated:
+        raise ImportError(f"Thư viện quá cũ cho {stage}: {', '.join(outdated)}. "
+                          f"Chạy `python preprocess.py preflight {stage} --install` để nâng cấp")
+
+    lock = load_lock(lock_file)
+    if lock is None or stage not in lock.get("stages", []):
+        print(f"Cảnh báo: {stage} chưa được kiểm tra bằng `python preprocess.py preflight {stage}`")
+        return
+
+    # Versions only drive the drift warning; packages without pip metadata are not compared
+    changed = []
+    for _, distributions, _ in STAGE_REQUIREMENTS[stage]:
+        locked, version = lock["packages"].get(distributions), installed_version(distributions)
+        if locked is not None and locked != version:
+            changed.append(f"{distributions} {locked} -> {version}")
+    if changed:
+        print(f"Cảnh báo: phiên bản khác với lock ({', '.join(changed)}); chạy lại preflight để xác nhận")
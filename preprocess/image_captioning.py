@@ -1,52 +1,8 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-# Auto-install dependencies
-import sys
-import os
-import subprocess
-import importlib.util
-
-
-def _ensure_dependencies():
-    """Ensure all required dependencies are installed with latest versions."""
-    # Check if running in Kaggle environment
-    in_kaggle = 'google.colab' in sys.modules or 'KAGGLE_KERNEL_RUN_TYPE' in os.environ
-    
-    # Required packages
-    required_packages = [
-        "transformers",  # For model loading
-        "bitsandbytes",  # For quantization
-        "accelerate",   # For optimized inference
-        "torch"         # PyTorch
-    ]
-    
-    for package in required_packages:
-        # Skip torch installation as it's pre-installed in most environments with correct CUDA versions
-        if package == "torch":
-            continue
-            
-        try:
-            if package == "transformers" and in_kaggle:
-                # On Kaggle, always install latest transformers from source
-                print(f"Installing {package} from source (required for latest InternVL3 support)...")
-                subprocess.check_call([sys.executable, "-m", "pip", "install", 
-                                      "--upgrade", "git+https://github.com/huggingface/transformers"])
-            else:
-                # For other packages, install latest version
-                print(f"Installing/upgrading {package}...")
-                subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", package])
-                
-        except Exception as e:
-            print(f"Warning: Failed to install/upgrade {package}. Error: {e}")
-            # Continue anyway, as the package might already be installed
-
-
-# Install dependencies first
-_ensure_dependencies()
-
-# Now import required modules
 import os
+import sys
 import json
 import glob
 import shutil
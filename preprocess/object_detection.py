@@ -2,7 +2,9 @@ import os
 import json
 import glob
 import shutil
+import time
 from typing import Dict, List, Any
+import numpy as np
 from PIL import Image
 
 from models.groundingdino import GroundingDINO
@@ -83,36 +85,81 @@ def calculate_iou(box1, box2):
     
     return iou
 
-def filter_objects(objects, iou_threshold=0.6, confidence_threshold=0.5):
-    # If there are no objects, return empty list
-    if not objects:
-        return []
-    
-    # Filter objects based on confidence threshold
-    objects = [obj for obj in objects if obj["score"] >= confidence_threshold]
-    
-    # Sort objects by score in descending order
-    sorted_objects = sorted(objects, key=lambda x: x["score"], reverse=True)
-    
-    # List to store filtered objects
-    filtered_objects = []
-    
-    # Iterate through each object
-    for obj in sorted_objects:
-        # Check if current object overlaps with any object in filtered_objects
-        duplicate = False
-        for filtered_obj in filtered_objects:
-            # If same object name and IoU greater than threshold
-            if obj["object"] == filtered_obj["object"] and \
-               calculate_iou(obj["box"], filtered_obj["box"]) > iou_threshold:
-                duplicate = True
-                break
+def pairwise_iou(boxes1, boxes2):
+    # Element-wise calculate_iou over two (n, 4) arrays of boxes
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    
+    # Intersection, zero when the boxes do not overlap
+    x1_i = np.maximum(boxes1[:, 0], boxes2[:, 0])
+    y1_i = np.maximum(boxes1[:, 1], boxes2[:, 1])
+    x2_i = np.minimum(boxes1[:, 2], boxes2[:, 2])
+    y2_i = np.minimum(boxes1[:, 3], boxes2[:, 3])
+    overlap = (x2_i >= x1_i) & (y2_i >= y1_i)
+    area_intersection = np.where(overlap, (x2_i - x1_i) * (y2_i - y1_i), 0.0)
+    
+    union = area1 + area2 - area_intersection
+    return np.divide(area_intersection, union, out=np.zeros_like(union), where=union != 0)
+
+def filter_objects_batch(keyframe_objects, iou_threshold=0.6, confidence_threshold=0.5):
+    """
+    Class-aware greedy NMS over the objects of many keyframes at once.
+    
+    Keeps exactly what filter_objects keeps for each keyframe: objects below
+    confidence_threshold are dropped, and an object is removed when it
+    overlaps (IoU > iou_threshold) a higher scoring kept object with the same
+    label in the same keyframe. IoUs are computed only between objects of
+    the same (keyframe, label) group, in one vectorized pass.
+    
+    Args:
+        keyframe_objects: One list of objects ({"object", "box", "score", ...}) per keyframe
         
-        # If not duplicate, add to filtered list
-        if not duplicate:
-            filtered_objects.append(obj)
-    
-    return filtered_objects
+    Returns:
+        One list of kept objects per keyframe, sorted by score in descending order
+    """
+    objects = [(k, obj) for k, frame_objects in enumerate(keyframe_objects)
+               for obj in frame_objects if obj["score"] >= confidence_threshold]
+    results = [[] for _ in keyframe_objects]
+    if not objects:
+        return results
+    
+    keyframes = np.array([k for k, _ in objects], dtype=np.int64)
+    scores = np.array([obj["score"] for _, obj in objects], dtype=np.float64)
+    boxes = np.array([obj["box"] for _, obj in objects], dtype=np.float64).reshape(-1, 4)
+    _, labels = np.unique([obj["object"] for _, obj in objects], return_inverse=True)
+    
+    # Sort by group, then by score in descending order (stable, like sorted())
+    order = np.lexsort((-scores, labels, keyframes))
+    groups = keyframes[order] * (labels.max() + 1) + labels[order]
+    group_starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    group_ends = np.r_[group_starts[1:], len(order)]
+    
+    # Every pair (i, j), i before j, inside the same group
+    positions = np.arange(len(order))
+    partners = np.repeat(group_ends, np.diff(np.r_[group_starts, len(order)])) - positions - 1
+    first = np.repeat(positions, partners)
+    second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(partners) - partners, partners)
+    duplicate = pairwise_iou(boxes[order[first]], boxes[order[second]]) > iou_threshold
+    first, second = first[duplicate], second[duplicate]
+    
+    # Greedy pass: an object suppresses its duplicates only if it is kept itself
+    suppressed = np.zeros(len(order), dtype=bool)
+    edge_starts = np.searchsorted(first, positions)
+    edge_ends = np.searchsorted(first, positions, side="right")
+    for i in np.unique(first):
+        if not suppressed[i]:
+            suppressed[second[edge_starts[i]:edge_ends[i]]] = True
+    
+    kept = np.zeros(len(objects), dtype=bool)
+    kept[order[~suppressed]] = True
+    for index in np.lexsort((-scores, keyframes)):
+        if kept[index]:
+            results[keyframes[index]].append(objects[index][1])
+    return results
+
+def filter_objects(objects, iou_threshold=0.6, confidence_threshold=0.5):
+    # Remove low-confidence objects and duplicates of the same label (class-aware NMS)
+    return filter_objects_batch([objects], iou_threshold, confidence_threshold)[0]
 
 # Function to visualize detection results on an image
 def visualize_detection(image_path, detection_results):
@@ -143,23 +190,32 @@ def process_video_keyframes(
     video_dir: str,
     caption_file: str,
     grounding_dino: GroundingDINO,
-    output_file: str = None
+    output_file: str = None,
+    batch_size: int = 4,
+    vocabulary: List[str] = None
 ) -> Dict[str, Any]:
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
-    # Load captions
-    try:
-        with open(caption_file, 'r', encoding='utf-8') as f:
-            captions = json.load(f)
-        print(f"Processing {len(captions)} keyframes from {os.path.basename(caption_file)}")
-    except Exception as e:
-        print(f"Error reading caption file {caption_file}: {e}")
-        return {"total": 0, "items": []}
+    if vocabulary:
+        # Closed vocabulary: every keyframe of the video, no captions needed
+        captions = [{"keyframe": os.path.basename(path), "caption": ""}
+                    for path in sorted(glob.glob(os.path.join(video_dir, "*.jpg")))]
+        print(f"Processing {len(captions)} keyframes from {video_dir} with {len(vocabulary)} classes")
+    else:
+        # Load captions
+        try:
+            with open(caption_file, 'r', encoding='utf-8') as f:
+                captions = json.load(f)
+            print(f"Processing {len(captions)} keyframes from {os.path.basename(caption_file)}")
+        except Exception as e:
+            print(f"Error reading caption file {caption_file}: {e}")
+            return {"total": 0, "items": []}
     
     # Initialize list to store results
     detection_results = []
     
-    # Process each keyframe
+    # Collect the keyframes and their prompts
+    pending = []
     for item in captions:
         keyframe_name = item["keyframe"]
         caption = item["caption"]
@@ -171,58 +227,42 @@ def process_video_keyframes(
             print(f"Warning: Keyframe file not found at {keyframe_path}")
             continue
         
-        # Extract prompt segments from caption
-        prompts = extract_objects_from_caption(caption)
-        print(f"Generated prompts for {keyframe_name}: {prompts}")
-        
-        # Initialize results for current keyframe
-        keyframe_results = {
+        # One prompt per class, or prompt segments extracted from the caption
+        prompts = list(vocabulary) if vocabulary else extract_objects_from_caption(caption)
+        pending.append((keyframe_name, caption, keyframe_path, prompts))
+    
+    # Detect objects for batch_size keyframes at a time; the prompts of each
+    # keyframe are merged into one caption and share one loaded image
+    start_time = time.perf_counter()
+    keyframe_objects = []
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        keyframe_objects.extend(grounding_dino.detect_objects_batch(
+            [(keyframe_path, prompts) for _, _, keyframe_path, prompts in batch],
+            box_threshold=0.35,
+            text_threshold=0.25,
+            batch_size=batch_size
+        ))
+    
+    # In closed vocabulary mode the label is the class the phrase was matched to
+    if vocabulary:
+        for objects in keyframe_objects:
+            for obj in objects:
+                obj["object"] = obj["prompt"]
+    
+    # Remove duplicate objects and filter by score for all keyframes of the video at once
+    for (keyframe_name, caption, _, _), objects in zip(pending, filter_objects_batch(keyframe_objects)):
+        detection_results.append({
             "keyframe": keyframe_name,
             "caption": caption,
-            "objects": []
-        }
-        
-        # Detect objects using each prompt
-        for prompt in prompts:
-            # Detect objects
-            print(f"Detecting objects with prompt: 'Find {prompt}'")
-            results = grounding_dino.detect_objects(
-                keyframe_path, 
-                f"Find {prompt}",
-                box_threshold=0.35,
-                text_threshold=0.25
-            )
-            print(f"Detection results: {len(results['boxes'])} boxes, {len(results['scores'])} scores, {len(results.get('labels', []))} labels")
-            
-            # Add results to the list
-            for i, (box, score) in enumerate(zip(results["boxes"], results["scores"])):
-                label = results["labels"][i] if i < len(results["labels"]) else prompt
-                
-                # Ensure box is JSON serializable (convert numpy array if needed)
-                if hasattr(box, 'tolist'):
-                    box = box.tolist()
-                elif isinstance(box, tuple) or isinstance(box, list):
-                    # Convert nested numpy arrays if present
-                    box = [float(b) if hasattr(b, 'item') else b for b in box]
-                    
-                # Ensure score is JSON serializable
-                if hasattr(score, 'item'):
-                    score = score.item()
-                
-                keyframe_results["objects"].append({
-                    "prompt": prompt,
-                    "object": label,
-                    "box": box,
-                    "score": float(score) if isinstance(score, (int, float)) else score
-                })
-        
-        # Apply filter_objects to remove duplicate objects and filter by score
-        keyframe_results["objects"] = filter_objects(keyframe_results["objects"])
-        
-        print(f"Keyframe {keyframe_name}: {len(keyframe_results['objects'])} objects after filtering")
-        
-        # Add keyframe results to the main list
-        detection_results.append(keyframe_results)
+            "objects": objects
+        })
+    
+    elapsed = time.perf_counter() - start_time
+    cache_report = grounding_dino.text_cache_report()
+    print(f"Detected objects in {len(detection_results)} keyframes of {os.path.basename(video_dir)} "
+          f"({len(detection_results) / max(elapsed, 1e-9):.2f} keyframes/s"
+          f"{', ' + cache_report if cache_report else ''})")
     
     # Save results to JSON file if output_file is provided
     if output_file:
@@ -237,7 +277,9 @@ def process_lesson(
     lesson_keyframe_dir: str,
     lesson_caption_dir: str,
     lesson_output_dir: str,
-    grounding_dino: GroundingDINO
+    grounding_dino: GroundingDINO,
+    batch_size: int = 4,
+    vocabulary: List[str] = None
 ) -> Dict[str, Any]:
     # Create output directory
     os.makedirs(lesson_output_dir, exist_ok=True)
@@ -262,7 +304,9 @@ def process_lesson(
             video_dir,
             caption_file,
             grounding_dino,
-            output_file
+            output_file,
+            batch_size,
+            vocabulary
         )
         
         all_results.extend(video_results.get("items", []))
@@ -275,13 +319,16 @@ def detect_object(
     output_detection_dir: str,
     mode: str,
     lesson_name: str = None,
-    video_name: str = None
+    video_name: str = None,
+    batch_size: int = 4,
+    text_cache_size: int = 4096,
+    vocabulary: List[str] = None
 ) -> Dict[str, Any]:
     # Create output directory
     os.makedirs(output_detection_dir, exist_ok=True)
     
-    # Initialize GroundingDINO model
-    grounding_dino = GroundingDINO()
+    # Initialize GroundingDINO model; the text-feature cache is shared by all videos
+    grounding_dino = GroundingDINO(text_cache_size=text_cache_size)
     
     # Initialize results
     all_results = []
@@ -296,7 +343,9 @@ def detect_object(
                 os.path.join(input_keyframe_dir, lesson),
                 os.path.join(input_caption_dir, lesson),
                 os.path.join(output_detection_dir, lesson),
-                grounding_dino
+                grounding_dino,
+                batch_size,
+                vocabulary
             )
             all_results.extend(lesson_results.get("items", []))
             
@@ -306,7 +355,9 @@ def detect_object(
             os.path.join(input_keyframe_dir, lesson_name),
             os.path.join(input_caption_dir, lesson_name),
             os.path.join(output_detection_dir, lesson_name),
-            grounding_dino
+            grounding_dino,
+            batch_size,
+            vocabulary
         )
         all_results = lesson_results.get("items", [])
         
@@ -326,7 +377,9 @@ def detect_object(
             video_dir,
             caption_file,
             grounding_dino,
-            output_file
+            output_file,
+            batch_size,
+            vocabulary
         )
         all_results = video_results.get("items", [])
     
@@ -1,5 +1,4 @@
 import os
-import sys
 import json
 import glob
 import shutil
@@ -23,19 +22,10 @@ def extract_text(
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
-        # Initialize PaddleOCR
-        try:
-            from paddleocr import PaddleOCR
-            ocr = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=False)
-            print("PaddleOCR initialized successfully.")
-        except ImportError:
-            print("PaddleOCR not installed. Installing required dependencies...")
-            import subprocess
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "paddlepaddle==2.6.1", "-q"])
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "paddleocr==2.8.1", "-q"])
-            from paddleocr import PaddleOCR
-            ocr = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=False)
-            print("PaddleOCR installed and initialized successfully.")
+        # Initialize PaddleOCR (installed once by `python preprocess.py preflight ocr --install`)
+        from paddleocr import PaddleOCR
+        ocr = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=False)
+        print("PaddleOCR initialized successfully.")
         
         # Define regions to mask (banner and logo)
         target_size = (1280, 720)
@@ -2,24 +2,9 @@ import os
 import sys
 import json
 import glob
+import time
 from tqdm import tqdm
 
-def ensure_qdrant_dependencies():
-
-    dependencies = ["qdrant-client", "FlagEmbedding"]
-    
-    for dep in dependencies:
-        try:
-            if dep == "qdrant-client":
-                from qdrant_client import QdrantClient, models
-            elif dep == "FlagEmbedding":
-                from FlagEmbedding import BGEM3FlagModel
-        except ImportError:
-            print(f"Đang cài đặt {dep}...")
-            import subprocess
-            subprocess.check_call([sys.executable, "-m", "pip", "install", dep])
-            print(f"Đã cài đặt {dep}")
-
 def load_caption_files(caption_folder):
     all_captions = []
     
@@ -70,9 +55,70 @@ def create_mapping_file(keyframe_dir, output_path):
     except Exception as e:
         print(f"Lỗi khi tạo mapping: {str(e)}")
 
-def save_captions_qdrant(caption_dir, keyframe_dir, output_dir, collection_name="captions"):
+def resolve_caption_point_ids(captions_data, id2path, output_dir):
+    """
+    Attach the mapping point id to every caption. Captions whose keyframe is
+    not in the mapping are skipped, reported once and listed in
+    unresolved_keyframes.json in output_dir.
+    """
+    # Reverse index keyframe name -> point id, built once
+    name2id = {os.path.basename(path): pid for pid, path in id2path.items()}
+    
+    resolved_captions = []
+    unresolved_keyframes = []
+    for caption_data in captions_data:
+        point_id = name2id.get(caption_data['keyframe'])
+        if point_id is None:
+            unresolved_keyframes.append(caption_data['keyframe'])
+            continue
+        
+        resolved_captions.append({**caption_data, "point_id": point_id})
+    
+    if unresolved_keyframes:
+        unresolved_path = os.path.join(output_dir, "unresolved_keyframes.json")
+        with open(unresolved_path, "w", encoding="utf-8") as f:
+            json.dump(unresolved_keyframes, f, ensure_ascii=False, indent=2)
+        print(f"Cảnh báo: {len(unresolved_keyframes)} keyframe không có trong mapping, bỏ qua "
+              f"(ví dụ: {', '.join(unresolved_keyframes[:5])}). Danh sách đầy đủ: {unresolved_path}")
+    
+    return resolved_captions
+
+def iter_caption_points(qdrant, captions, encode_batch_size, stats, colbert_pool_size=0):
+    """
+    Encode captions batch by batch with BGE-M3 and yield Qdrant points.
+    Batches that fail to encode are skipped and counted in stats["failed"].
+    With colbert_pool_size > 0 the ColBERT token vectors of each caption are
+    pooled to at most that many vectors.
+    """
+    from database.my_qdrant import pool_colbert_vectors
+    
+    for start in range(0, len(captions), encode_batch_size):
+        batch = captions[start:start + encode_batch_size]
+        try:
+            embedding_output = qdrant.generate_embeddings_batch(
+                [caption_data['caption'] for caption_data in batch],
+                batch_size=encode_batch_size
+            )
+        except Exception as e:
+            print(f"Lỗi khi tạo embeddings cho batch {start}-{start + len(batch)}: {str(e)}")
+            stats["failed"] += len(batch)
+            continue
+        
+        for i, caption_data in enumerate(batch):
+            stats["count"] += 1
+            yield qdrant.build_point({
+                "point_id": caption_data['point_id'],
+                "keyframe": caption_data['keyframe'],
+                "caption": caption_data['caption'],
+                "dense_vector": embedding_output["dense_vecs"][i],
+                "colbert_vectors": pool_colbert_vectors(embedding_output["colbert_vecs"][i], colbert_pool_size),
+                "sparse_weights": embedding_output["sparse_vecs"][i]
+            })
+
+def save_captions_qdrant(caption_dir, keyframe_dir, output_dir, collection_name="captions",
+                         encode_batch_size=32, upload_batch_size=256, parallel=2,
+                         colbert_pool_size=0, colbert_quantization=None, colbert_on_disk=False):
     try:
-        ensure_qdrant_dependencies()
         os.makedirs(output_dir, exist_ok=True)
         
         sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -82,7 +128,7 @@ def save_captions_qdrant(caption_dir, keyframe_dir, output_dir, collection_name=
         
         if not qdrant.is_collection_exists(collection_name):
             print(f"Tạo collection '{collection_name}'...")
-            qdrant.create_qdrant_collection(collection_name)
+            qdrant.create_qdrant_collection(collection_name, colbert_quantization, colbert_on_disk)
         else:
             print(f"Collection '{collection_name}' đã tồn tại.")
         
@@ -106,47 +152,28 @@ def save_captions_qdrant(caption_dir, keyframe_dir, output_dir, collection_name=
         if len(captions_data) == 0:
             return {"status": "error", "message": "Không tìm thấy dữ liệu caption nào"}
         
+        resolved_captions = resolve_caption_point_ids(captions_data, id2path, output_dir)
+        
         print("Xử lý embeddings và lưu vào Qdrant...")
-        count = 0
+        stats = {"count": 0, "failed": 0}
         
-        for caption_data in tqdm(captions_data, desc="Đang lưu vào Qdrant"):
-            keyframe = caption_data['keyframe']
-            caption = caption_data['caption']
-            
-            point_id = None
-            for pid, path in id2path.items():
-                if os.path.basename(path) == keyframe:
-                    point_id = pid
-                    break
-            
-            if point_id is None:
-                print(f"Cảnh báo: Không tìm thấy keyframe {keyframe} trong mapping, bỏ qua...")
-                continue
-            
-            try:
-                embedding_output = qdrant.generate_embeddings(caption)
-                
-                dense_vector = embedding_output["dense_vecs"][0]
-                colbert_vectors = embedding_output["colbert_vecs"][0]
-                sparse_weights = embedding_output["lexical_weights"][0]
-
-                embedding_data = {
-                    "point_id": point_id,
-                    "keyframe": keyframe,
-                    "caption": caption,
-                    "dense_vector": dense_vector,
-                    "colbert_vectors": colbert_vectors,
-                    "sparse_weights": sparse_weights
-                }
-                
-                qdrant.insert_to_qdrant([embedding_data], collection_name)
-                count += 1
-            except Exception as e:
-                print(f"Lỗi khi xử lý caption cho keyframe {keyframe}: {str(e)}")
-                continue
+        # Defer HNSW indexing until all points are uploaded
+        previous_threshold = qdrant.set_indexing_threshold(collection_name, 0)
+        start_time = time.perf_counter()
+        try:
+            points = tqdm(iter_caption_points(qdrant, resolved_captions, encode_batch_size, stats, colbert_pool_size),
+                          total=len(resolved_captions), desc="Đang lưu vào Qdrant")
+            qdrant.upload_points(points, collection_name, batch_size=upload_batch_size, parallel=parallel)
+        finally:
+            qdrant.set_indexing_threshold(collection_name, previous_threshold or 20000)
+        elapsed = time.perf_counter() - start_time
+        
+        count = stats["count"]
+        if stats["failed"] > 0:
+            print(f"Cảnh báo: {stats['failed']} caption không tạo được embeddings")
         
         if count > 0:
-            return {"status": "success", "message": f"Đã lưu thành công {count} caption vào Qdrant"}
+            return {"status": "success", "message": f"Đã lưu thành công {count} caption vào Qdrant ({count / max(elapsed, 1e-9):.1f} points/s)"}
         else:
             return {"status": "error", "message": "Không có dữ liệu nào được lưu vào Qdrant"}
         
@@ -6,30 +6,8 @@ import glob
 import importlib
 from tqdm import tqdm
 
-def ensure_faiss_dependencies():
-    dependencies = ["faiss-cpu", "open_clip_torch", "numpy"]
-    
-    for dep in dependencies:
-        try:
-            if dep == "faiss-cpu":
-                import faiss
-            elif dep == "open_clip_torch":
-                import open_clip
-            elif dep == "numpy":
-                import numpy
-        except ImportError:
-            print(f"Đang cài đặt {dep}...")
-            import subprocess
-            if dep == "faiss-cpu":
-                subprocess.check_call([sys.executable, "-m", "pip", "install", "faiss-cpu==1.11.0"])
-            else:
-                subprocess.check_call([sys.executable, "-m", "pip", "install", dep])
-            print(f"Đã cài đặt {dep}")
-
 def load_model(backbone="ViT-B-16", pretrained="dfn2b"):
     try:
-        ensure_faiss_dependencies()
-        
         sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         from models.openclip import OpenCLIP
         
@@ -44,8 +22,6 @@ def load_model(backbone="ViT-B-16", pretrained="dfn2b"):
 
 def save_embeddings_faiss(keyframe_dir, output_dir, backbone="ViT-B-16", pretrained="dfn2b"):
     try:
-        ensure_faiss_dependencies()
-        
         os.makedirs(output_dir, exist_ok=True)
         
         model = load_model(backbone, pretrained)
@@ -3,17 +3,16 @@ import json
 import glob
 import sys
 from tqdm import tqdm
-from database.my_elasticsearch import MyElasticsearch, ensure_elasticsearch_dependencies
+from database.my_elasticsearch import MyElasticsearch
+from app.config import OCR_INDEX
 
-def index_ocr_results(ocr_dir, index_name="ocr_results"):
+def index_ocr_results(ocr_dir, index_name=OCR_INDEX, chunk_size=500, thread_count=4, max_failed=0):
     try:
-        ensure_elasticsearch_dependencies()
-        
         es_client = MyElasticsearch()
         if not es_client.connect():
             return {"status": "error", "message": "Không thể kết nối đến Elasticsearch"}
 
-        result = es_client.index_ocr_results(ocr_dir, index_name)
+        result = es_client.index_ocr_results(ocr_dir, index_name, chunk_size, thread_count, max_failed)
         return result
         
     except Exception as e:
@@ -0,0 +1,205 @@
+import os
+import json
+import cv2
+import numpy as np
+from .utils import seconds_to_frame, get_lesson_directories
+
+
+def format_vtt_timestamp(seconds):
+    """
+    Format seconds as a WebVTT timestamp.
+
+    Args:
+        seconds (float): Time in seconds.
+
+    Returns:
+        str: Timestamp in format HH:MM:SS.mmm
+    """
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{milliseconds:03d}"
+
+
+def write_storyboard_vtt(vtt_path, sheet_names, count, duration, interval, tile_width, tile_height, columns, rows):
+    """
+    Write a WebVTT thumbnail track where each cue points to a tile of a sheet
+    using the `#xywh=` media fragment.
+    """
+    tiles_per_sheet = columns * rows
+    lines = ["WEBVTT", ""]
+    for index in range(count):
+        start = index * interval
+        end = min((index + 1) * interval, duration)
+        sheet_name = sheet_names[index // tiles_per_sheet]
+        position = index % tiles_per_sheet
+        x = (position % columns) * tile_width
+        y = (position // columns) * tile_height
+
+        lines.append(f"{format_vtt_timestamp(start)} --> {format_vtt_timestamp(end)}")
+        lines.append(f"{sheet_name}#xywh={x},{y},{tile_width},{tile_height}")
+        lines.append("")
+
+    with open(vtt_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def process_video(video_path, output_storyboard_path, interval=10.0, tile_size=(160, 90), columns=10, rows=10, quality=70):
+    """
+    Build fixed-interval storyboard sheets, a WebVTT index and a JSON manifest
+    for one video.
+
+    Args:
+        video_path (str): Path to the video file.
+        output_storyboard_path (str): Output directory of the lesson.
+        interval (float): Seconds between two storyboard tiles.
+        tile_size (tuple): (width, height) of a tile.
+        columns (int): Tiles per row of a sheet.
+        rows (int): Rows per sheet.
+        quality (int): JPEG quality of the sheets.
+
+    Returns:
+        dict or None: Manifest of the storyboard, None on error.
+    """
+    cap = None
+    try:
+        os.makedirs(output_storyboard_path, exist_ok=True)
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print(f"Cannot open video: {video_path}")
+            return None
+
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if not fps or total_frames <= 0:
+            print(f"Invalid FPS or frame count for video: {video_path}")
+            return None
+
+        duration = total_frames / fps
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+        tile_width, tile_height = tile_size
+        tiles_per_sheet = columns * rows
+
+        sheet_names = []
+        sheet = None
+        count = 0
+        last_frame = None
+
+        def flush_sheet(position):
+            used_rows = position // columns + 1
+            sheet_name = f"{video_name}_storyboard_{len(sheet_names):03d}.jpg"
+            cv2.imwrite(os.path.join(output_storyboard_path, sheet_name),
+                        sheet[:used_rows * tile_height], [cv2.IMWRITE_JPEG_QUALITY, quality])
+            sheet_names.append(sheet_name)
+
+        for seconds in np.arange(0, duration, interval):
+            frame_idx = min(seconds_to_frame(seconds, fps), total_frames - 1)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if not ret:
+                # Keep the timeline continuous by repeating the last readable frame
+                if last_frame is None:
+                    continue
+                frame = last_frame
+            last_frame = frame
+
+            position = count % tiles_per_sheet
+            if position == 0:
+                sheet = np.full((rows * tile_height, columns * tile_width, 3), 0, dtype=np.uint8)
+
+            x = (position % columns) * tile_width
+            y = (position // columns) * tile_height
+            sheet[y:y + tile_height, x:x + tile_width] = cv2.resize(frame, tile_size, interpolation=cv2.INTER_AREA)
+            count += 1
+
+            if position == tiles_per_sheet - 1:
+                flush_sheet(position)
+
+        # Flush the last, partially filled sheet
+        if count % tiles_per_sheet:
+            flush_sheet(count % tiles_per_sheet - 1)
+
+        if count == 0:
+            print(f"No frames could be read from video: {video_path}")
+            return None
+
+        vtt_name = f"{video_name}_storyboard.vtt"
+        write_storyboard_vtt(os.path.join(output_storyboard_path, vtt_name), sheet_names, count,
+                             duration, interval, tile_width, tile_height, columns, rows)
+
+        manifest = {
+            "video": video_name,
+            "fps": fps,
+            "duration": duration,
+            "interval": interval,
+            "count": count,
+            "tile_width": tile_width,
+            "tile_height": tile_height,
+            "columns": columns,
+            "rows": rows,
+            "sheets": sheet_names,
+            "vtt": vtt_name
+        }
+        with open(os.path.join(output_storyboard_path, f"{video_name}_storyboard.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        print(f"{video_name}: {count} tiles in {len(sheet_names)} sheets")
+        return manifest
+
+    except Exception as e:
+        print(f"Error building storyboard for {video_path}: {e}")
+        return None
+    finally:
+        if cap is not None:
+            cap.release()
+
+
+def generate_storyboards(input_video_dir, output_storyboard_dir, mode, lesson_name=None,
+                         interval=10.0, tile_size=(160, 90), columns=10, rows=10):
+    """
+    Generate storyboard sprite sheets for every video.
+
+    Output layout: <output>/Lxx/Lxx_Vyyy_storyboard_000.jpg, plus
+    Lxx_Vyyy_storyboard.vtt and Lxx_Vyyy_storyboard.json per video.
+
+    Args:
+        input_video_dir (str): Video root directory (<root>/Lxx/Lxx_Vyyy.mp4).
+        output_storyboard_dir (str): Storyboard root directory.
+        mode (str): 'all' or 'lesson'.
+        lesson_name (str): Lesson to process when mode is 'lesson'.
+        interval (float): Seconds between two storyboard tiles.
+        tile_size (tuple): (width, height) of a tile.
+        columns (int): Tiles per row of a sheet.
+        rows (int): Rows per sheet.
+
+    Returns:
+        dict: Status and number of processed videos.
+    """
+    os.makedirs(output_storyboard_dir, exist_ok=True)
+
+    if mode == "lesson":
+        lessons = [(lesson_name, os.path.join(input_video_dir, lesson_name))]
+    else:
+        lessons = [(name, path) for _, name, path in get_lesson_directories(input_video_dir)]
+
+    processed = 0
+    failed = 0
+    for name, path in lessons:
+        lesson_output_dir = os.path.join(output_storyboard_dir, name)
+        for video_file in sorted(os.listdir(path)):
+            if not video_file.endswith(".mp4"):
+                continue
+
+            manifest = process_video(os.path.join(path, video_file), lesson_output_dir,
+                                     interval, tile_size, columns, rows)
+            if manifest:
+                processed += 1
+            else:
+                failed += 1
+
+    return {
+        "status": "success" if processed > 0 else "error",
+        "message": f"Built storyboards for {processed} videos ({failed} failed) in {output_storyboard_dir}"
+    }
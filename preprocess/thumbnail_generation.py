@@ -0,0 +1,140 @@
+import os
+import threading
+from PIL import Image
+from .utils import get_lesson_directories
+
+
+def get_thumbnail_name(keyframe_name, image_format="WEBP"):
+    """
+    Get the thumbnail filename for a keyframe.
+
+    Args:
+        keyframe_name (str): Keyframe filename, e.g. 'L01_V001_000260.jpg'
+        image_format (str): Thumbnail format ('WEBP' or 'JPEG')
+
+    Returns:
+        str: Thumbnail filename, e.g. 'L01_V001_000260.webp'
+    """
+    extension = ".webp" if image_format.upper() == "WEBP" else ".jpg"
+    return os.path.splitext(os.path.basename(keyframe_name))[0] + extension
+
+
+def create_thumbnail(keyframe_path, thumbnail_path, size=(320, 320), image_format="WEBP", quality=75):
+    """
+    Create a downscaled thumbnail for a keyframe image.
+
+    The image keeps its aspect ratio and fits inside `size`. The file is written
+    to a temporary name first so that readers never see a partial thumbnail.
+
+    Args:
+        keyframe_path (str): Path to the full-resolution keyframe.
+        thumbnail_path (str): Output thumbnail path.
+        size (tuple): Maximum (width, height) of the thumbnail.
+        image_format (str): 'WEBP' or 'JPEG'.
+        quality (int): Encoder quality.
+
+    Returns:
+        str: Thumbnail path.
+    """
+    os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+    tmp_path = f"{thumbnail_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+    save_kwargs = {"quality": quality}
+    if image_format.upper() == "WEBP":
+        save_kwargs["method"] = 4
+    else:
+        save_kwargs["optimize"] = True
+
+    with Image.open(keyframe_path) as img:
+        img = img.convert("RGB")
+        img.thumbnail(size, Image.LANCZOS)
+        img.save(tmp_path, format=image_format.upper(), **save_kwargs)
+
+    os.replace(tmp_path, thumbnail_path)
+    return thumbnail_path
+
+
+def process_video(keyframe_video_dir, output_thumbnail_dir, size, image_format, quality):
+    os.makedirs(output_thumbnail_dir, exist_ok=True)
+
+    created = 0
+    skipped = 0
+    for keyframe_name in sorted(os.listdir(keyframe_video_dir)):
+        if not keyframe_name.lower().endswith((".jpg", ".jpeg", ".png")):
+            continue
+
+        keyframe_path = os.path.join(keyframe_video_dir, keyframe_name)
+        thumbnail_path = os.path.join(output_thumbnail_dir, get_thumbnail_name(keyframe_name, image_format))
+
+        # Skip thumbnails that are already newer than their keyframe
+        if os.path.exists(thumbnail_path) and os.path.getmtime(thumbnail_path) >= os.path.getmtime(keyframe_path):
+            skipped += 1
+            continue
+
+        try:
+            create_thumbnail(keyframe_path, thumbnail_path, size, image_format, quality)
+            created += 1
+        except Exception as e:
+            print(f"Error creating thumbnail for {keyframe_path}: {e}")
+
+    return created, skipped
+
+
+def process_lesson(lesson_keyframe_dir, lesson_output_dir, size, image_format, quality):
+    created = 0
+    skipped = 0
+    for video_name in sorted(os.listdir(lesson_keyframe_dir)):
+        video_dir = os.path.join(lesson_keyframe_dir, video_name)
+        if not os.path.isdir(video_dir):
+            continue
+
+        video_created, video_skipped = process_video(
+            video_dir, os.path.join(lesson_output_dir, video_name), size, image_format, quality
+        )
+        created += video_created
+        skipped += video_skipped
+        print(f"{os.path.basename(lesson_keyframe_dir)}/{video_name}: {video_created} created, {video_skipped} up to date")
+
+    return created, skipped
+
+
+def generate_thumbnails(input_keyframe_dir, output_thumbnail_dir, mode, lesson_name=None,
+                        size=(320, 320), image_format="WEBP", quality=75):
+    """
+    Generate thumbnails for keyframes, mirroring the keyframe folder layout
+    (<output>/Lxx/Vyyy/Lxx_Vyyy_frame.webp).
+
+    Args:
+        input_keyframe_dir (str): Keyframe root directory.
+        output_thumbnail_dir (str): Thumbnail root directory.
+        mode (str): 'all' or 'lesson'.
+        lesson_name (str): Lesson to process when mode is 'lesson'.
+        size (tuple): Maximum (width, height) of each thumbnail.
+        image_format (str): 'WEBP' or 'JPEG'.
+        quality (int): Encoder quality.
+
+    Returns:
+        dict: Status and number of created/skipped thumbnails.
+    """
+    os.makedirs(output_thumbnail_dir, exist_ok=True)
+
+    if mode == "lesson":
+        lessons = [(lesson_name, os.path.join(input_keyframe_dir, lesson_name))]
+    else:
+        lessons = [(name, path) for _, name, path in get_lesson_directories(input_keyframe_dir)]
+
+    created = 0
+    skipped = 0
+    for name, path in lessons:
+        lesson_created, lesson_skipped = process_lesson(
+            path, os.path.join(output_thumbnail_dir, name), size, image_format, quality
+        )
+        created += lesson_created
+        skipped += lesson_skipped
+
+    return {
+        "status": "success",
+        "message": f"Created {created} thumbnails ({skipped} already up to date) in {output_thumbnail_dir}",
+        "created": created,
+        "skipped": skipped
+    }
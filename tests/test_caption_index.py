@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+qdrant_client = pytest.importorskip("qdrant_client")
+
+import database.caption_index as caption_index
+import database.my_qdrant as my_qdrant
+
+VOCABULARY = ["person", "car", "street", "news", "anchor", "studio", "flag", "crowd", "river", "bridge",
+              "night", "rain", "fire", "police", "boat", "market", "school", "child", "farmer", "field",
+              "building", "storm", "road", "bus", "bicycle", "tree", "mountain", "beach", "stadium", "ball"]
+DIMENSION = 1024
+TOP_K = 10
+
+
+class StubEncoder:
+    """
+    Deterministic stand-in for BGE-M3: every word has a fixed random dense
+    vector and lexical id; a text is the normalized sum of its word vectors,
+    its lexical weights and its word vectors as ColBERT tokens. Captions get
+    contextual lexical weights (jittered per caption) like BGE-M3, so sparse
+    scores are not tied across captions sharing the same words.
+    """
+
+    def __init__(self, seed=0):
+        rng = np.random.default_rng(seed)
+        self.word_vectors = rng.standard_normal((len(VOCABULARY), DIMENSION)).astype(np.float32)
+        self.word_weights = rng.uniform(0.1, 0.4, len(VOCABULARY)).astype(np.float32)
+        self.word_ids = {word: i for i, word in enumerate(VOCABULARY)}
+
+    def encode_query(self, text, outputs=("dense", "sparse", "colbert")):
+        ids = [self.word_ids[word] for word in text.split()]
+        dense = self.word_vectors[ids].sum(axis=0)
+        dense /= np.linalg.norm(dense)
+        indices, counts = np.unique(ids, return_counts=True)
+        values = (self.word_weights[indices] * counts).astype(np.float32)
+        encoding = {"dense": dense, "sparse": (indices.astype(np.int64), values), "colbert": self.word_vectors[ids]}
+        return {output: encoding[output] for output in outputs}
+
+    def encode_caption(self, text, rng):
+        encoding = self.encode_query(text)
+        indices, values = encoding["sparse"]
+        encoding["sparse"] = (indices, (values * rng.uniform(0.5, 1.5, len(values))).astype(np.float32))
+        return encoding
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("captions")
+    rng = np.random.default_rng(1)
+    captions = [" ".join(rng.choice(VOCABULARY, rng.integers(4, 10))) for _ in range(300)]
+    queries = [" ".join(rng.choice(VOCABULARY, rng.integers(2, 4), replace=False)) for _ in range(30)]
+
+    mapping_json = str(directory / "id2path.json")
+    with open(mapping_json, "w", encoding="utf-8") as f:
+        json.dump({"items": [{"id": i, "path": f"keyframes/L01_V001_{i:05d}.jpg"} for i in range(len(captions))]}, f)
+
+    return directory, mapping_json, captions, queries
+
+
+@pytest.fixture(scope="module")
+def backends(corpus):
+    directory, mapping_json, captions, queries = corpus
+    encoder = StubEncoder()
+    rng = np.random.default_rng(2)
+    encodings = [encoder.encode_caption(caption, rng) for caption in captions]
+    keyframes = [f"L01_V001_{i:05d}.jpg" for i in range(len(captions))]
+
+    patch = pytest.MonkeyPatch()
+    patch.setattr(my_qdrant, "MAPPING_JSON", mapping_json)
+    patch.setattr(caption_index, "MAPPING_JSON", mapping_json)
+
+    qdrant = my_qdrant.Qdrant(model=encoder)
+    qdrant.client = qdrant_client.QdrantClient(":memory:")
+    qdrant.create_qdrant_collection("captions")
+    qdrant.insert_to_qdrant([{
+        "point_id": i,
+        "keyframe": keyframes[i],
+        "caption": captions[i],
+        "dense_vector": encoding["dense"].tolist(),
+        "colbert_vectors": encoding["colbert"].tolist(),
+        "sparse_weights": encoding["sparse"]
+    } for i, encoding in enumerate(encodings)], "captions")
+
+    index_dir = str(directory / "caption_index")
+    caption_index.build_caption_index(np.stack([encoding["dense"] for encoding in encodings]),
+                                      [encoding["sparse"] for encoding in encodings],
+                                      list(range(len(captions))), keyframes, index_dir)
+    embedded = caption_index.CaptionIndex(index_dir, model=encoder)
+
+    yield qdrant, embedded, queries
+    patch.undo()
+
+
+def mean_overlap(qdrant, embedded, queries, mode, allowed_ids=None):
+    overlaps = []
+    for query in queries:
+        _, _, expected = qdrant.search(query, "captions", limit=TOP_K, mode=mode, allowed_ids=allowed_ids)
+        _, _, paths = embedded.search(query, "captions", limit=TOP_K, mode=mode, allowed_ids=allowed_ids)
+        if expected:
+            overlaps.append(len(set(expected) & set(paths)) / len(expected))
+    return float(np.mean(overlaps))
+
+
+@pytest.mark.parametrize("mode, threshold", [("dense", 0.99), ("sparse", 0.9), ("rrf", 0.8)])
+def test_embedded_index_matches_qdrant(backends, mode, threshold):
+    qdrant, embedded, queries = backends
+
+    assert mean_overlap(qdrant, embedded, queries, mode) >= threshold
+
+
+@pytest.mark.parametrize("mode, threshold", [("dense", 0.99), ("sparse", 0.9), ("rrf", 0.8)])
+def test_embedded_index_matches_qdrant_with_allowed_ids(backends, mode, threshold):
+    qdrant, embedded, queries = backends
+    allowed_ids = list(range(0, 300, 3))
+
+    assert mean_overlap(qdrant, embedded, queries, mode, allowed_ids) >= threshold
+
+
+@pytest.mark.parametrize("mode, threshold", [("dense", 0.99), ("sparse", 0.9), ("rrf", 0.8)])
+def test_large_allowed_ids_are_filtered_after_search(backends, monkeypatch, mode, threshold):
+    qdrant, embedded, queries = backends
+    monkeypatch.setattr(my_qdrant, "QDRANT_FILTER_MAX_IDS", 10)
+    allowed_ids = list(range(0, 300, 3))
+
+    assert mean_overlap(qdrant, embedded, queries, mode, allowed_ids) >= threshold
+    for query in queries:
+        _, indices, _ = qdrant.search(query, "captions", limit=TOP_K, mode=mode, allowed_ids=allowed_ids)
+        assert len(indices) == TOP_K and set(indices) <= set(allowed_ids)
@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preprocess.object_detection import calculate_iou, filter_objects, filter_objects_batch
+
+# Pre-filter objects of every keyframe and the objects the nested-loop NMS kept
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "L01_V001_detection.json")
+
+
+def load_fixture():
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def nested_loop_filter_objects(objects, iou_threshold=0.6, confidence_threshold=0.5):
+    # The original filter_objects, kept as the oracle for the vectorized NMS
+    if not objects:
+        return []
+
+    objects = [obj for obj in objects if obj["score"] >= confidence_threshold]
+    sorted_objects = sorted(objects, key=lambda x: x["score"], reverse=True)
+
+    filtered_objects = []
+    for obj in sorted_objects:
+        duplicate = False
+        for filtered_obj in filtered_objects:
+            if obj["object"] == filtered_obj["object"] and \
+               calculate_iou(obj["box"], filtered_obj["box"]) > iou_threshold:
+                duplicate = True
+                break
+
+        if not duplicate:
+            filtered_objects.append(obj)
+
+    return filtered_objects
+
+
+def test_recorded_detections_match_expected():
+    frames = load_fixture()
+
+    kept = filter_objects_batch([frame["objects"] for frame in frames])
+
+    assert kept == [frame["expected"] for frame in frames]
+
+
+def test_batch_matches_nested_loop_oracle():
+    frames = load_fixture()
+
+    for iou_threshold in (0.3, 0.6, 0.9):
+        for confidence_threshold in (0.0, 0.5, 0.8):
+            kept = filter_objects_batch([frame["objects"] for frame in frames], iou_threshold, confidence_threshold)
+            expected = [nested_loop_filter_objects(frame["objects"], iou_threshold, confidence_threshold)
+                        for frame in frames]
+            assert kept == expected, (iou_threshold, confidence_threshold)
+
+
+def test_single_keyframe_matches_nested_loop_oracle():
+    for frame in load_fixture():
+        assert filter_objects(frame["objects"]) == nested_loop_filter_objects(frame["objects"])